@@ -2,7 +2,19 @@
 from rest_access_policy import AccessPolicy
 
 
-class AccountRegistrationAccessPolicy(AccessPolicy):
+class CargosAccessPolicy(AccessPolicy):
+    """AccessPolicy que resolve os principals "group:" pela máscara de cargos.
+
+    Evita consultar auth_group a cada requisição (ver CustomUser.cargos_mascara).
+    """
+
+    def get_user_group_values(self, user) -> list:
+        if user.is_anonymous:
+            return []
+        return user.cargos
+
+
+class AccountRegistrationAccessPolicy(CargosAccessPolicy):
     """Define o controle de acesso para a view de cadastro do usuário."""
 
     statements = [
@@ -11,7 +23,7 @@ class AccountRegistrationAccessPolicy(AccessPolicy):
     ]
 
 
-class UserViewAccessPolicy(AccessPolicy):
+class UserViewAccessPolicy(CargosAccessPolicy):
     """Define o controle de acesso para UserViewSet"""
 
     statements = [
@@ -27,10 +39,15 @@ class UserViewAccessPolicy(AccessPolicy):
             "effect": "allow",
         },
         {
-            "action": ["ativar", "list", "retrieve", "mudar"],
+            "action": ["ativar", "list", "retrieve", "mudar", "diretorio"],
             "principal": "authenticated",
             "effect": "allow",
         },
+        {
+            "action": ["importar", "importacao"],
+            "principal": ["admin", "staff"],
+            "effect": "allow",
+        },
         {
             "action": [
                 "solicitar_redefinicao_senha",
@@ -1,15 +1,22 @@
 """Este módulo contem ações de gerenciamento de contas de Usuário."""
 
-from django.core.mail import send_mail
-from django.forms.models import model_to_dict
-
 from django.conf import settings
+from django.core import signing
 from django.db import transaction
-from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
 from rest_framework.authtoken.models import Token
 
-from accounts import errors
-from accounts.models import CustomUser, EmailActivationToken, Perfil
+from accounts import errors, photo_service, search, token_store
+from accounts.authentication import invalidate_user_tokens
+from accounts.models import (
+    CARGOS,
+    CustomUser,
+    Perfil,
+    nomes_cargos,
+)
+from core import email_service
+from utils.cache import LRUCache
+from utils.conditional import bump_model_generation
 
 
 def create_account(sanitized_email_str: str, unsafe_password_str: str):
@@ -51,29 +58,194 @@ def create_account(sanitized_email_str: str, unsafe_password_str: str):
     return user_model
 
 
+# Perfis projetados por id de usuário. Invalidado por update_user_profile e
+# pelos sinais de accounts.signals; o TTL limita a defasagem entre processos.
+_perfis_cache = LRUCache(maxsize=512, ttl=60)
+
+
+def _projetar_perfil(perfil: Perfil, cargos: list) -> dict:
+    """Monta o dicionário público do perfil de um usuário.
+
+    ``fotos`` traz a URL de cada miniatura; ``foto`` é a maior delas.
+    """
+    fotos = photo_service.urls_foto(perfil)
+    return {
+        "id": perfil.usuario_id,
+        "foto": fotos.get(photo_service.maior_tamanho()),
+        "fotos": fotos,
+        "nome_completo": perfil.nome_completo,
+        "nome_exibicao": perfil.nome_exibicao,
+        "curso": perfil.curso.nome if perfil.curso_id else None,
+        "entrada": perfil.entrada,
+        "cargos": cargos,
+    }
+
+
+def get_user_profiles(ids) -> dict:
+    """Retorna os perfis de vários usuários, indexados pelo id do usuário.
+
+    Os perfis que não estão em cache são buscados com uma única consulta
+    (perfil, curso e cargos), independente da quantidade de usuários.
+    Usuários sem perfil ficam de fora do resultado.
+    """
+    ids = set(ids)
+    perfis = _perfis_cache.get_many(ids)
+    faltando = ids - perfis.keys()
+    if faltando:
+        novos = {
+            perfil.usuario_id: _projetar_perfil(
+                perfil, nomes_cargos(perfil.usuario.cargos_mascara)
+            )
+            for perfil in Perfil.objects.filter(usuario_id__in=faltando)
+            .select_related("curso", "usuario")
+            .only(
+                "usuario_id",
+                "foto",
+                "foto_variantes",
+                "nome_completo",
+                "nome_exibicao",
+                "entrada",
+                "curso__nome",
+                "usuario__cargos_mascara",
+            )
+        }
+        _perfis_cache.set_many(novos)
+        perfis.update(novos)
+
+    # Cópias, para que quem chama possa alterar o resultado sem afetar o cache.
+    return {
+        user_id: {**perfil, "cargos": list(perfil["cargos"])}
+        for user_id, perfil in perfis.items()
+    }
+
+
 def get_user_profile(user_instance: CustomUser) -> dict:
-    """Retorna o perfil de um usuário."""
-    profile = model_to_dict(user_instance.perfil)
-    profile["foto"] = "https://res.cloudinary.com/dlvmqmqcn/image/upload/v1/" + str(
-        user_instance.perfil.foto
+    """Retorna o perfil de um usuário.
+
+    Raises:
+        Perfil.DoesNotExist: o usuário não tem perfil.
+    """
+    try:
+        return get_user_profiles([user_instance.id])[user_instance.id]
+    except KeyError as exc:
+        raise Perfil.DoesNotExist("Usuário sem perfil.") from exc
+
+
+def list_directory(busca: str = "", limite: int = 10, com_email=False) -> list:
+    """Lista usuários ativos para o diretório, em uma única consulta.
+
+    Cada item traz apenas id, nome de exibição, miniatura da foto e cargos
+    (e o e-mail, se ``com_email``). A busca é feita por ``accounts.search``;
+    sem ela, a lista segue a ordem alfabética dos nomes de exibição. Não há
+    contagem do total, para manter a resposta rápida no autocompletar.
+    """
+    queryset = search.buscar_usuarios(
+        CustomUser.objects.filter(is_active=True, perfil__isnull=False), busca
     )
-    profile["cargos"] = user_instance.cargos
-    if profile["curso"]:
-        profile["curso"] = user_instance.perfil.curso.nome
-    allowed_fields = [
+    ordem = ("perfil__nome_exibicao", "id")
+    if "relevancia" in queryset.query.annotations:
+        ordem = ("-relevancia",) + ordem
+    linhas = queryset.order_by(*ordem).values(
         "id",
-        "nome_completo",
-        "nome_exibicao",
-        "entrada",
-        "curso",
-        "cargos",
-        "foto",
+        "email",
+        "cargos_mascara",
+        "perfil__nome_exibicao",
+        "perfil__foto",
+        "perfil__foto_variantes",
+    )[:limite]
+
+    tamanho = photo_service.menor_tamanho()
+    diretorio = []
+    for linha in linhas:
+        fotos = photo_service.urls_variantes(
+            linha["perfil__foto"], linha["perfil__foto_variantes"]
+        )
+        item = {
+            "id": linha["id"],
+            "nome_exibicao": linha["perfil__nome_exibicao"],
+            "foto": fotos.get(tamanho),
+            "cargos": nomes_cargos(linha["cargos_mascara"]),
+        }
+        if com_email:
+            item["email"] = linha["email"]
+        diretorio.append(item)
+    return diretorio
+
+
+def invalidate_user_profiles(*ids) -> None:
+    """Remove perfis do cache local após alterações."""
+    _perfis_cache.invalidate(*ids)
+
+
+def _gravar_mascaras(atuais: dict, mascaras: dict) -> list:
+    """Grava as máscaras que mudaram, em um único UPDATE por lote.
+
+    ``bulk_update`` não dispara post_save: as gerações das respostas de
+    usuários e os tokens em cache são invalidados aqui.
+
+    Returns:
+        Ids dos usuários alterados.
+    """
+    alterados = [
+        CustomUser(pk=user_id, cargos_mascara=mascara)
+        for user_id, mascara in mascaras.items()
+        if user_id in atuais and atuais[user_id] != mascara
     ]
-    for key in list(profile.keys()):
-        if key not in allowed_fields:
-            profile.pop(key)
-    profile["id"] = user_instance.id
-    return profile
+    if alterados:
+        CustomUser.objects.bulk_update(alterados, ["cargos_mascara"])
+        ids = [user.pk for user in alterados]
+        bump_model_generation(CustomUser)
+        invalidate_user_tokens(*ids)
+        return ids
+    return []
+
+
+def sync_user_roles(*user_ids) -> dict:
+    """Recalcula CustomUser.cargos_mascara a partir dos grupos dos usuários.
+
+    Returns:
+        Dicionário id do usuário -> nova máscara.
+    """
+    atuais = dict(
+        CustomUser.objects.filter(pk__in=user_ids).values_list("pk", "cargos_mascara")
+    )
+    mascaras = dict.fromkeys(user_ids, 0)
+    for user_id, nome in CustomUser.groups.through.objects.filter(
+        customuser_id__in=user_ids, group__name__in=CARGOS
+    ).values_list("customuser_id", "group__name"):
+        mascaras[user_id] |= CARGOS[nome]
+    _gravar_mascaras(atuais, mascaras)
+    return mascaras
+
+
+def backfill_user_roles(tamanho_lote: int = 1000) -> int:
+    """Recalcula a máscara de cargos de todos os usuários, em lotes de ids.
+
+    Returns:
+        Quantidade de usuários corrigidos.
+    """
+    corrigidos = 0
+    ultimo_id = 0
+    while True:
+        lote = dict(
+            CustomUser.objects.filter(pk__gt=ultimo_id)
+            .order_by("pk")
+            .values_list("pk", "cargos_mascara")[:tamanho_lote]
+        )
+        if not lote:
+            return corrigidos
+        mascaras = dict.fromkeys(lote, 0)
+        for user_id, nome in CustomUser.groups.through.objects.filter(
+            customuser_id__in=lote, group__name__in=CARGOS
+        ).values_list("customuser_id", "group__name"):
+            mascaras[user_id] |= CARGOS[nome]
+        corrigidos += len(_gravar_mascaras(lote, mascaras))
+        ultimo_id = max(lote)
+
+
+def clear_user_profiles_cache() -> None:
+    """Esvazia o cache local de perfis."""
+    _perfis_cache.clear()
 
 
 def update_user_profile(perfil: Perfil, data: dict) -> dict:
@@ -85,17 +257,13 @@ def update_user_profile(perfil: Perfil, data: dict) -> dict:
         "matricula",
         "entrada",
         "curso",
-        "foto",
     ]
     cargo_para_id = {"aluno": 1, "monitor": 2, "professor": 3}
     with transaction.atomic():
 
         if "cargos" in data.keys():
-
-            perfil.usuario.groups.remove(1)
-            perfil.usuario.groups.remove(2)
-            perfil.usuario.groups.remove(3)
-
+            # A máscara de cargos é atualizada pelo sinal m2m_changed.
+            perfil.usuario.groups.remove(*cargo_para_id.values())
             perfil.usuario.groups.add(cargo_para_id[(data["cargos"][0])])
 
         if "curso" in allowed_keys:
@@ -109,59 +277,109 @@ def update_user_profile(perfil: Perfil, data: dict) -> dict:
                 setattr(perfil, key, value)
 
         perfil.full_clean()
+        if data.get("foto"):
+            # As miniaturas são geradas em segundo plano, após o commit.
+            photo_service.receber_foto(perfil, data["foto"])
         perfil.save()
 
-    return get_user_profile(perfil.usuario)
+    invalidate_user_profiles(perfil.usuario_id)
+    return get_user_profiles([perfil.usuario_id])[perfil.usuario_id]
 
 
+@transaction.atomic
 def send_email_confirmation_token(user_instance):
     """Envia token de confirmação do e-mail para o usuário."""
-    existing_token = EmailActivationToken.objects.filter(
-        user=user_instance, email=user_instance.email
-    ).first()
-
-    if existing_token:
-        if existing_token.expires_at > timezone.now():
-
-            token_instance = existing_token
-        else:
-            existing_token.delete()
-            token_instance = EmailActivationToken.generate_token(user=user_instance)
-    else:
-        token_instance = EmailActivationToken.generate_token(user=user_instance)
+    token = token_store.get_token_store().emitir(user_instance)
 
     subject = "Ativação do cadastro - Ambiente de Monitoria Online"
-    body = f"Seu código de ativação: {token_instance.token}"
-
-    send_mail(
-        subject,
-        body,
-        settings.DEFAULT_FROM_EMAIL,
-        [user_instance.email],
-        fail_silently=False,
-    )
+    body = f"Seu código de ativação: {token}"
+
+    email_service.enfileirar_email(subject, body, [user_instance.email])
 
 
-def confirm_email(user, token):
+def confirm_email(token):
     """
     Função para autenticação do código enviado para o email do usuário.
+
+    Returns:
+        A chave do Token de autenticação do usuário.
+
+    Raises:
+        EmailConfirmationCodeInactive: o código não existe ou expirou.
     """
-    try:
-        token_instance = EmailActivationToken.objects.get(
-            user=user, token=token, expires_at__gt=timezone.now()
-        )
-    except EmailActivationToken.DoesNotExist as exc:
-        raise errors.EmailConfirmationCodeInactive() from exc
+    user_id = token_store.get_token_store().consumir(token)
+    if user_id is None:
+        raise errors.EmailConfirmationCodeInactive()
 
+    user = CustomUser.objects.get(pk=user_id)
     user.is_email_active = True
     user.save()
 
-    token_instance.delete()
-
     auth_token = get_user_token(user)
     return auth_token.key
 
 
+# Sal das autorizações de redefinição de senha, para que a assinatura não
+# sirva em outros usos de SECRET_KEY.
+_SAL_REDEFINICAO = "accounts.redefinicao_senha"
+
+
+def _impressao_senha(user: CustomUser) -> str:
+    # Muda quando a senha muda, invalidando as autorizações já emitidas.
+    return salted_hmac(_SAL_REDEFINICAO, user.password).hexdigest()[:16]
+
+
+def issue_password_reset_grant(token) -> str:
+    """Troca um código de recuperação de senha por uma autorização assinada.
+
+    O código é consumido. A autorização identifica o usuário, vale por
+    ``settings.PASSWORD_RESET_GRANT_TTL`` segundos e é verificada por
+    ``reset_password`` sem estado no servidor (nem sessão, nem banco).
+
+    Raises:
+        EmailConfirmationCodeInactive: o código não existe ou expirou.
+    """
+    user_id = token_store.get_token_store().consumir(token)
+    if user_id is None:
+        raise errors.EmailConfirmationCodeInactive()
+    user = CustomUser.objects.only("password").get(pk=user_id)
+    return signing.dumps(
+        {"u": user.pk, "s": _impressao_senha(user)}, salt=_SAL_REDEFINICAO
+    )
+
+
+def reset_password(concessao: str, senha: str) -> CustomUser:
+    """Redefine a senha do usuário de uma autorização de ``issue_password_reset_grant``.
+
+    Cada autorização só pode ser usada uma vez: após a troca, a impressão da
+    senha antiga deixa de conferir. Como o código foi recebido por e-mail, a
+    conta é ativada, se ainda não estava (primeiro acesso dos alunos
+    importados por accounts.import_service).
+
+    Raises:
+        PasswordResetGrantInvalid: a autorização é inválida, expirou ou já foi usada.
+    """
+    try:
+        dados = signing.loads(
+            concessao,
+            salt=_SAL_REDEFINICAO,
+            max_age=settings.PASSWORD_RESET_GRANT_TTL,
+        )
+    except signing.BadSignature as exc:
+        raise errors.PasswordResetGrantInvalid() from exc
+
+    user = CustomUser.objects.filter(pk=dados.get("u")).first()
+    if user is None or not constant_time_compare(
+        dados.get("s", ""), _impressao_senha(user)
+    ):
+        raise errors.PasswordResetGrantInvalid()
+    user.set_password(senha)
+    user.is_email_active = True
+    user.save()
+    get_user_token(user)
+    return user
+
+
 def get_user_token(user):
     """Busca ou cria um Token de autenticação do usuário.
 
@@ -175,29 +393,12 @@ def get_user_token(user):
     return token_model
 
 
+@transaction.atomic
 def password_reset_email(user):
     """Resetar senha"""
-    existing_token = EmailActivationToken.objects.filter(
-        user=user, email=user.email
-    ).first()
-
-    if existing_token:
-        if existing_token.expires_at > timezone.now():
-
-            token_instance = existing_token
-        else:
-            existing_token.delete()
-            token_instance = EmailActivationToken.generate_token(user=user)
-    else:
-        token_instance = EmailActivationToken.generate_token(user=user)
+    token = token_store.get_token_store().emitir(user)
 
     subject = "Recuperação de senha - Ambiente de Monitoria Online"
-    body = f"Seu token de recuperação de senha: {token_instance.token}"
-
-    send_mail(
-        subject,
-        body,
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=False,
-    )
+    body = f"Seu token de recuperação de senha: {token}"
+
+    email_service.enfileirar_email(subject, body, [user.email])
@@ -7,3 +7,7 @@ class AccountsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel, unused-import
+        from accounts import signals  # noqa: F401
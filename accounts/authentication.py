@@ -0,0 +1,83 @@
+"""Autenticação por token com cache compartilhado entre os workers."""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from accounts.models import CustomUser
+
+# O hash da senha nunca vai para o cache; o campo fica adiado e só é lido do
+# banco se alguém o acessar.
+_CAMPOS_OMITIDOS = {"password"}
+
+
+def _chave_token(key: str) -> str:
+    # O token não é usado diretamente como chave para não aparecer no cache.
+    return f"auth:token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _campos_usuario() -> list:
+    return [
+        field.attname
+        for field in CustomUser._meta.concrete_fields
+        if field.attname not in _CAMPOS_OMITIDOS
+    ]
+
+
+def invalidate_tokens(*keys) -> None:
+    """Remove do cache os tokens informados.
+
+    A remoção é repetida após o commit da transação atual, como em
+    utils.cache.bump_generation: uma requisição que leia o usuário antes do
+    commit não deixa no cache os dados antigos.
+    """
+    chaves = [_chave_token(key) for key in keys]
+    if not chaves:
+        return
+    cache.delete_many(chaves)
+    transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+def invalidate_user_tokens(*user_ids) -> None:
+    """Remove do cache os tokens dos usuários, após alterações nas contas."""
+    invalidate_tokens(
+        *Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication que guarda token -> usuário no cache.
+
+    Evita a consulta ao token e ao usuário em todas as requisições. O cache
+    guarda só os campos do usuário (sem o hash da senha) e do token; os
+    objetos são remontados a partir deles como se viessem do banco. As
+    entradas expiram após ``AUTH_TOKEN_CACHE_TIMEOUT`` segundos e são
+    removidas pelos sinais de accounts.signals quando o token é apagado
+    (logout) ou o usuário muda (senha, desativação, cargos).
+    """
+
+    def authenticate_credentials(self, key):
+        chave = _chave_token(key)
+        campos = _campos_usuario()
+        credenciais = cache.get(chave)
+        if credenciais is not None:
+            valores_usuario, criado_em = credenciais
+            db = router.db_for_read(CustomUser)
+            user = CustomUser.from_db(db, campos, valores_usuario)
+            token = Token.from_db(
+                db, ["key", "user_id", "created"], [key, user.pk, criado_em]
+            )
+            token.user = user
+            return user, token
+
+        user, token = super().authenticate_credentials(key)
+        valores_usuario = [getattr(user, campo) for campo in campos]
+        cache.set(
+            chave,
+            (valores_usuario, token.created),
+            timeout=settings.AUTH_TOKEN_CACHE_TIMEOUT,
+        )
+        return user, token
@@ -21,3 +21,10 @@ class EmailConfirmationConflict(Exception):
 
     message = "Não foi possível processar a confirmação."
     internal_error_code = 4009003
+
+
+class PasswordResetGrantInvalid(Exception):
+    """A autorização de redefinição de senha é inválida, expirou ou já foi usada."""
+
+    message = "Autorização de redefinição de senha inválida ou expirada."
+    internal_error_code = 409004
@@ -0,0 +1,294 @@
+"""Importação em lote de alunos a partir de planilhas (CSV ou XLSX).
+
+Usada no início de cada semestre, no lugar de ``create_account`` usuário a
+usuário. As contas são criadas sem senha utilizável (nenhum hash é
+calculado) e cada aluno recebe por e-mail um código de primeiro acesso, com
+o qual define a própria senha pelo fluxo de redefinição de senha
+(verificar-token e redefinir-senha), o que também ativa a conta. Usuários,
+perfis, grupos, códigos e e-mails são gravados com ``bulk_create``, em
+poucas consultas por lote.
+
+Pela API, a requisição apenas enfileira a importação (``ImportacaoAlunos``),
+que é processada pelo comando ``processar_importacoes`` em um worker, como
+os e-mails da fila de saída.
+"""
+import logging
+import csv
+import io
+import re
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from accounts import token_store
+from accounts.models import CARGOS, CustomUser, ImportacaoAlunos, Perfil
+from core import email_service
+from core.models import Curso
+from utils.conditional import bump_model_generation
+
+logger = logging.getLogger(__name__)
+
+COLUNAS = ("email", "nome", "matricula", "curso", "entrada")
+
+_FORMATO_ENTRADA = re.compile(r"^\d{4}\.[12]$")
+
+
+def ler_planilha(arquivo, nome_arquivo: str) -> list:
+    """Lê as linhas de uma planilha CSV (vírgula ou ponto e vírgula) ou XLSX.
+
+    Returns:
+        Lista de dicionários com as colunas de ``COLUNAS``.
+
+    Raises:
+        ValidationError: o arquivo não pôde ser lido ou faltam colunas.
+    """
+    if nome_arquivo.lower().endswith(".xlsx"):
+        linhas = _ler_xlsx(arquivo)
+    else:
+        linhas = _ler_csv(arquivo)
+
+    try:
+        cabecalho = [str(coluna or "").strip().lower() for coluna in next(linhas)]
+    except StopIteration as exc:
+        raise ValidationError("A planilha está vazia.") from exc
+    faltando = [coluna for coluna in COLUNAS if coluna not in cabecalho]
+    if faltando:
+        raise ValidationError(f"Colunas ausentes na planilha: {', '.join(faltando)}.")
+
+    return [
+        {
+            coluna: str(valor).strip() if valor is not None else ""
+            for coluna, valor in zip(cabecalho, linha)
+            if coluna in COLUNAS
+        }
+        for linha in linhas
+        if any(valor not in (None, "") for valor in linha)
+    ]
+
+
+def _ler_csv(arquivo):
+    conteudo = arquivo.read()
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            # Planilhas exportadas pelo Excel em português.
+            conteudo = conteudo.decode("cp1252")
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo[:4096], delimiters=",;")
+    except csv.Error:
+        dialeto = csv.excel
+    return csv.reader(io.StringIO(conteudo), dialeto)
+
+
+def _ler_xlsx(arquivo):
+    try:
+        import openpyxl  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise ValidationError(
+            "A leitura de planilhas XLSX requer o pacote openpyxl; envie um CSV."
+        ) from exc
+    try:
+        planilha = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    except Exception as exc:  # pylint: disable=broad-except
+        raise ValidationError("Não foi possível ler a planilha XLSX.") from exc
+    return planilha.active.iter_rows(values_only=True)
+
+
+def _nome_exibicao(nome: str) -> str:
+    partes = nome.split()
+    nome_exibicao = " ".join(partes[:1] + partes[-1:]) if len(partes) > 1 else nome
+    return nome_exibicao[:32]
+
+
+def _validar(linhas: list, cursos: dict) -> tuple:
+    """Separa as linhas válidas das inválidas.
+
+    Returns:
+        Par (alunos válidos, erros), em que cada erro traz o número da linha
+        na planilha (contando o cabeçalho) e as mensagens.
+    """
+    validos = []
+    erros = []
+    vistos = set()
+    for numero, linha in enumerate(linhas, start=2):
+        mensagens = []
+        email = linha.get("email", "").lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            mensagens.append("E-mail inválido.")
+        if email in vistos:
+            mensagens.append("E-mail repetido na planilha.")
+        nome = linha.get("nome", "")
+        if not nome or len(nome) > 255:
+            mensagens.append("Nome vazio ou maior que 255 caracteres.")
+        matricula = linha.get("matricula", "")
+        if len(matricula) > 6:
+            mensagens.append("Matrícula maior que 6 caracteres.")
+        entrada = linha.get("entrada", "")
+        if entrada and not _FORMATO_ENTRADA.match(entrada):
+            mensagens.append("Entrada deve estar no formato 2022.1.")
+        curso = linha.get("curso", "").lower()
+        if curso and curso not in cursos:
+            mensagens.append("Curso não encontrado.")
+
+        if mensagens:
+            erros.append({"linha": numero, "email": email, "erros": mensagens})
+            continue
+        vistos.add(email)
+        validos.append(
+            {
+                "email": email,
+                "nome": nome,
+                "matricula": matricula or None,
+                "curso_id": cursos.get(curso),
+                "entrada": entrada or None,
+            }
+        )
+    return validos, erros
+
+
+def _mensagem_boas_vindas(aluno: dict, codigo: str) -> tuple:
+    assunto = "Bem-vindo(a) ao Ambiente de Monitoria Online"
+    corpo = (
+        f"Olá, {aluno['nome']}!\n\n"
+        "Sua conta foi criada. Para ativá-la, use o código abaixo na opção "
+        '"Esqueci minha senha" e cadastre a sua senha. Se o código expirar, '
+        "peça um novo pela mesma opção, informando este e-mail.\n\n"
+        f"Código de primeiro acesso: {codigo}\n"
+    )
+    return assunto, corpo, [aluno["email"]]
+
+
+def importar_alunos(linhas: list, tamanho_lote=500) -> dict:
+    """Cria as contas dos alunos de uma planilha já lida por ``ler_planilha``.
+
+    Linhas inválidas e e-mails já cadastrados são ignorados e relatados; as
+    demais contas são criadas em uma única transação.
+
+    Returns:
+        Relatório com a quantidade de contas criadas, os e-mails já
+        existentes e os erros por linha.
+    """
+    cursos = {}
+    for curso_id, nome in Curso.objects.values_list("id", "nome"):
+        cursos[nome.lower()] = curso_id
+        cursos[str(curso_id)] = curso_id
+    alunos, erros = _validar(linhas, cursos)
+
+    existentes = set()
+    emails = [aluno["email"] for aluno in alunos]
+    for inicio in range(0, len(emails), tamanho_lote):
+        existentes.update(
+            CustomUser.objects.filter(
+                email__in=emails[inicio : inicio + tamanho_lote]
+            ).values_list("email", flat=True)
+        )
+    alunos = [aluno for aluno in alunos if aluno["email"] not in existentes]
+
+    with transaction.atomic():
+        usuarios = CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    email=aluno["email"],
+                    # Senha inutilizável (equivale a set_unusable_password):
+                    # o aluno cadastra a sua com o código de primeiro acesso.
+                    password=make_password(None),
+                    is_email_active=False,
+                    # bulk_create não dispara os sinais que mantêm a máscara.
+                    cargos_mascara=CARGOS["aluno"],
+                )
+                for aluno in alunos
+            ],
+            batch_size=tamanho_lote,
+        )
+        grupo, _ = Group.objects.get_or_create(name="aluno")
+        CustomUser.groups.through.objects.bulk_create(
+            [
+                CustomUser.groups.through(customuser_id=usuario.pk, group_id=grupo.pk)
+                for usuario in usuarios
+            ],
+            batch_size=tamanho_lote,
+        )
+        Perfil.objects.bulk_create(
+            [
+                Perfil(
+                    usuario_id=usuario.pk,
+                    nome_completo=aluno["nome"],
+                    nome_exibicao=_nome_exibicao(aluno["nome"]),
+                    matricula=aluno["matricula"],
+                    curso_id=aluno["curso_id"],
+                    entrada=aluno["entrada"],
+                )
+                for usuario, aluno in zip(usuarios, alunos)
+            ],
+            batch_size=tamanho_lote,
+        )
+        # Os e-mails saem pela fila e podem demorar: o código de primeiro acesso
+        # vale por IMPORT_TOKEN_TTL, bem mais que os códigos comuns.
+        codigos = token_store.get_token_store().emitir_varios(
+            usuarios, ttl=settings.IMPORT_TOKEN_TTL
+        )
+        email_service.enfileirar_emails(
+            [
+                _mensagem_boas_vindas(aluno, codigos[usuario.pk])
+                for usuario, aluno in zip(usuarios, alunos)
+            ]
+        )
+        for model in (CustomUser, Perfil, Group, CustomUser.groups.through):
+            bump_model_generation(model)
+
+    return {
+        "criados": len(usuarios),
+        "existentes": sorted(existentes),
+        "erros": erros,
+    }
+
+
+def enfileirar_importacao(linhas: list, solicitante=None) -> ImportacaoAlunos:
+    """Grava uma importação na fila, com as linhas lidas por ``ler_planilha``."""
+    return ImportacaoAlunos.objects.create(linhas=linhas, solicitante=solicitante)
+
+
+def processar_importacoes(limite: int = 1) -> int:
+    """Processa as importações pendentes, da mais antiga para a mais nova.
+
+    Cada importação fica bloqueada (``SKIP LOCKED``) enquanto é processada,
+    para que vários workers possam rodar ao mesmo tempo. As linhas da
+    planilha são descartadas ao final; fica só o relatório.
+
+    Returns:
+        Quantidade de importações processadas.
+    """
+    processadas = 0
+    while processadas < limite:
+        with transaction.atomic():
+            importacao = (
+                ImportacaoAlunos.objects.select_for_update(skip_locked=True)
+                .filter(status="pendente")
+                .order_by("criado_em", "id")
+                .first()
+            )
+            if importacao is None:
+                break
+            try:
+                # Ponto de salvamento: uma falha desfaz só a importação, e o
+                # status ainda pode ser gravado.
+                with transaction.atomic():
+                    importacao.relatorio = importar_alunos(importacao.linhas)
+                importacao.status = "concluida"
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("Falha na importação %s.", importacao.pk)
+                importacao.status = "falhou"
+                importacao.erro = str(exc)
+            importacao.linhas = []
+            importacao.concluido_em = timezone.now()
+            importacao.save()
+        processadas += 1
+    return processadas
@@ -0,0 +1,43 @@
+"""Comando para importar as contas dos alunos de uma planilha."""
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import import_service
+
+
+class Command(BaseCommand):
+    """Cria em lote as contas dos alunos de uma planilha CSV ou XLSX."""
+
+    help = (
+        "Importa alunos de uma planilha CSV ou XLSX com as colunas "
+        "email, nome, matricula, curso e entrada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho da planilha (.csv ou .xlsx).")
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=500,
+            help="Quantidade de linhas por INSERT (padrão: 500).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["arquivo"], "rb") as arquivo:
+                linhas = import_service.ler_planilha(arquivo, options["arquivo"])
+            relatorio = import_service.importar_alunos(
+                linhas, tamanho_lote=options["lote"]
+            )
+        except (OSError, ValidationError) as exc:
+            raise CommandError(exc) from exc
+
+        self.stdout.write(
+            f"{relatorio['criados']} aluno(s) criado(s), "
+            f"{len(relatorio['existentes'])} já cadastrado(s), "
+            f"{len(relatorio['erros'])} linha(s) com erro."
+        )
+        for erro in relatorio["erros"]:
+            self.stderr.write(json.dumps(erro, ensure_ascii=False))
@@ -0,0 +1,43 @@
+"""Comando que remove os códigos de e-mail expirados."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.token_store import get_token_store
+
+
+class Command(BaseCommand):
+    """Remove em lotes os códigos de ativação e recuperação de senha expirados.
+
+    Deve rodar periodicamente (por exemplo, pelo agendador da plataforma) ou
+    continuamente com ``--continuo``.
+    """
+
+    help = "Remove os códigos de e-mail expirados, em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=1000,
+            help="Quantidade de códigos removidos por lote (padrão: 1000).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Continua rodando e removendo os expirados periodicamente.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=3600,
+            help="Segundos entre as execuções com --continuo (padrão: 3600).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            removidos = get_token_store().purgar_expirados(options["lote"])
+            self.stdout.write(f"{removidos} código(s) expirado(s) removido(s).")
+            if not options["continuo"]:
+                return
+            time.sleep(options["intervalo"])
@@ -0,0 +1,34 @@
+"""Comando que processa as importações de alunos enfileiradas pela API."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import import_service
+
+
+class Command(BaseCommand):
+    """Worker das importações de alunos pendentes."""
+
+    help = "Processa as importações de alunos pendentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Continua rodando e verificando a fila periodicamente.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5,
+            help="Segundos de espera quando a fila está vazia (padrão: 5).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if import_service.processar_importacoes():
+                self.stdout.write("1 importação processada.")
+                continue
+            if not options["continuo"]:
+                return
+            time.sleep(options["intervalo"])
@@ -0,0 +1,24 @@
+"""Comando para preencher a máscara de cargos dos usuários."""
+from django.core.management.base import BaseCommand
+
+from accounts import account_management_service
+
+
+class Command(BaseCommand):
+    """Recalcula CustomUser.cargos_mascara a partir dos grupos."""
+
+    help = "Recalcula a máscara de cargos dos usuários a partir dos grupos, em lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=1000,
+            help="Quantidade de usuários processados por lote (padrão: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        corrigidos = account_management_service.backfill_user_roles(
+            tamanho_lote=options["lote"]
+        )
+        self.stdout.write(f"{corrigidos} usuário(s) corrigido(s).")
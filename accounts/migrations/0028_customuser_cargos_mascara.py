@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+CARGOS = {"aluno": 1, "monitor": 2, "professor": 4}
+
+
+def preencher_cargos(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    mascaras = {}
+    for user_id, nome in CustomUser.groups.through.objects.filter(
+        group__name__in=CARGOS
+    ).values_list("customuser_id", "group__name"):
+        mascaras[user_id] = mascaras.get(user_id, 0) | CARGOS[nome]
+    usuarios = [
+        CustomUser(pk=user_id, cargos_mascara=mascara)
+        for user_id, mascara in mascaras.items()
+    ]
+    CustomUser.objects.bulk_update(usuarios, ["cargos_mascara"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0027_alter_emailactivationtoken_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="cargos_mascara",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_cargos, migrations.RunPython.noop),
+    ]
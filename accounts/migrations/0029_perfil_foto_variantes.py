@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0028_customuser_cargos_mascara"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="perfil",
+            name="foto_pendente",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="perfil",
+            name="foto_variantes",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:45
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0029_perfil_foto_variantes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="emailactivationtoken",
+            name="expires_at",
+            field=models.DateTimeField(default=accounts.models.expiracao_token),
+        ),
+        migrations.AddIndex(
+            model_name="emailactivationtoken",
+            index=models.Index(
+                fields=["token", "expires_at"], name="email_token_validade_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="emailactivationtoken",
+            index=models.Index(fields=["expires_at"], name="email_token_expiracao_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="emailactivationtoken",
+            index=models.Index(
+                fields=["user", "email"], name="email_token_usuario_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Colunas com índice de trigramas, por tabela (ver accounts.search).
+COLUNAS_TRIGRAMAS = {
+    "accounts_perfil": ("nome_completo", "nome_exibicao", "matricula"),
+    "accounts_customuser": ("email",),
+}
+
+
+def instalar(apps, schema_editor):  # pylint: disable=unused-argument
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for tabela, colunas in COLUNAS_TRIGRAMAS.items():
+        for coluna in colunas:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {tabela}_{coluna}_trgm "
+                f"ON {tabela} USING gin ({coluna} gin_trgm_ops)"
+            )
+
+
+def desinstalar(apps, schema_editor):  # pylint: disable=unused-argument
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for tabela, colunas in COLUNAS_TRIGRAMAS.items():
+        for coluna in colunas:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {tabela}_{coluna}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0030_emailactivationtoken_indices"),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
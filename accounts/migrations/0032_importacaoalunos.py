@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0031_indices_trigramas"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportacaoAlunos",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("linhas", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pendente", "Pendente"),
+                            ("concluida", "Concluída"),
+                            ("falhou", "Falhou"),
+                        ],
+                        default="pendente",
+                        max_length=9,
+                    ),
+                ),
+                ("relatorio", models.JSONField(blank=True, null=True)),
+                ("erro", models.TextField(blank=True)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("concluido_em", models.DateTimeField(blank=True, null=True)),
+                (
+                    "solicitante",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "criado_em"], name="importacao_fila_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0032_importacaoalunos"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="agenda_segredo",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0033_customuser_agenda_segredo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="perfil",
+            name="foto_pendente_desde",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="perfil",
+            index=models.Index(
+                condition=models.Q(("foto_pendente__isnull", False)),
+                fields=["foto_pendente_desde"],
+                name="perfil_foto_pendente_idx",
+            ),
+        ),
+    ]
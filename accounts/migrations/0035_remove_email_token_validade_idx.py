@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0034_perfil_foto_pendente_desde"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="emailactivationtoken",
+            name="email_token_validade_idx",
+        ),
+    ]
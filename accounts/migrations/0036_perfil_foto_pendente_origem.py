@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0035_remove_email_token_validade_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="perfil",
+            name="foto_pendente_origem",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
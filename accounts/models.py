@@ -1,9 +1,9 @@
 """Este módulo define os modelos do aplicativo 'accounts'."""
 
-from datetime import timedelta, datetime
-import secrets
+from datetime import timedelta
 from django.utils import timezone
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager, Group
 from django.core import validators
 from django.db import models
@@ -45,6 +45,23 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
+# Bit de cada cargo em CustomUser.cargos_mascara, na ordem de exibição.
+CARGOS = {"aluno": 1, "monitor": 2, "professor": 4}
+
+
+def mascara_cargos(nomes) -> int:
+    """Converte nomes de grupos na máscara de cargos."""
+    mascara = 0
+    for nome in nomes:
+        mascara |= CARGOS.get(nome, 0)
+    return mascara
+
+
+def nomes_cargos(mascara: int) -> list:
+    """Converte a máscara de cargos na lista de nomes."""
+    return [nome for nome, bit in CARGOS.items() if mascara & bit]
+
+
 class CustomUser(AbstractUser):
     """Define um usuário customizado para utilizar o email para autenticação."""
 
@@ -53,6 +70,12 @@ class CustomUser(AbstractUser):
     last_name = None
     email = models.EmailField(_("email address"), blank=False, unique=True)
     is_email_active = models.BooleanField(default=False)
+    # Cópia dos grupos aluno/monitor/professor (ver CARGOS), mantida pelos
+    # sinais de accounts.signals, para checar cargos sem consultar auth_group.
+    cargos_mascara = models.PositiveSmallIntegerField(default=0)
+    # Segredo das URLs de assinatura das agendas .ics (ver core.calendar_feed);
+    # trocá-lo invalida as URLs já distribuídas.
+    agenda_segredo = models.CharField(max_length=32, blank=True, default="")
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
@@ -61,7 +84,11 @@ class CustomUser(AbstractUser):
     @property
     def cargos(self):
         """Retorna a lista de cargos do usuário."""
-        return [group.name for group in self.groups.all()]
+        return nomes_cargos(self.cargos_mascara)
+
+    def tem_cargo(self, *nomes) -> bool:
+        """Verifica se o usuário tem algum dos cargos informados."""
+        return bool(self.cargos_mascara & mascara_cargos(nomes))
 
     def __str__(self):
         return self.email
@@ -78,12 +105,23 @@ class Perfil(models.Model):
         matricula: Número de matrícula do usuário. Para alunos e no SIGAA, professores no SIGEP.
         curso: Curso em que o aluno está matriculado. Este campo é ignorado para professores.
         entrada: Ano e semestre de entrada do aluno no curso. Exemplo: 2022.1
+        foto_variantes: Nomes das miniaturas da foto no backend de fotos, por tamanho.
+        foto_pendente: Upload ainda não processado. A foto atual continua sendo
+            exibida até as miniaturas do novo upload ficarem prontas.
+        foto_pendente_desde: Momento do upload pendente, usado para recuperar
+            processamentos perdidos (ver photo_service.recuperar_pendentes).
+        foto_pendente_origem: Máquina em cujo disco está o upload pendente
+            (settings.FOTOS_ORIGEM); só ela pode reprocessá-lo.
     """
 
     usuario = models.OneToOneField(
         CustomUser, on_delete=models.CASCADE, related_name="perfil"
     )
     foto = models.ImageField(blank=True, null=True, upload_to=MEDIA_ROOT)
+    foto_variantes = models.JSONField(default=dict, blank=True)
+    foto_pendente = models.CharField(max_length=255, blank=True, null=True)
+    foto_pendente_desde = models.DateTimeField(blank=True, null=True)
+    foto_pendente_origem = models.CharField(max_length=64, blank=True, default="")
     nome_completo = models.CharField(max_length=255)
     nome_exibicao = models.CharField(max_length=32)
     data_nascimento = models.DateField(null=True)
@@ -100,31 +138,74 @@ class Perfil(models.Model):
         ],
     )
 
+    class Meta:
+        indexes = [
+            # Uploads pendentes, percorridos por recuperar_pendentes; a condição
+            # mantém no índice apenas os poucos perfis com upload pendente.
+            models.Index(
+                fields=["foto_pendente_desde"],
+                name="perfil_foto_pendente_idx",
+                condition=models.Q(foto_pendente__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         return self.usuario.email
 
 
+def expiracao_token():
+    """Expiração padrão dos códigos enviados por e-mail."""
+    return timezone.now() + timedelta(seconds=settings.EMAIL_TOKEN_TTL)
+
+
 class EmailActivationToken(models.Model):
-    """Token enviado ao usuário para ativação de seu email e recuperação da senha."""
+    """Token enviado ao usuário para ativação de seu email e recuperação da senha.
+
+    Os tokens são criados e consumidos por accounts.token_store.
+    """
 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     email = models.EmailField(blank=False)
     token = models.CharField(unique=True, blank=False, max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(
-        default=timezone.make_aware(datetime.now() + timedelta(minutes=15))
+    expires_at = models.DateTimeField(default=expiracao_token)
+
+    class Meta:
+        indexes = [
+            # Remoção em lotes dos tokens expirados (limpar_tokens).
+            models.Index(fields=["expires_at"], name="email_token_expiracao_idx"),
+            # Reenvio do token atual de um usuário.
+            models.Index(fields=["user", "email"], name="email_token_usuario_idx"),
+        ]
+
+
+class ImportacaoAlunos(models.Model):
+    """Importação de alunos na fila, processada pelo comando 'processar_importacoes'.
+
+    A requisição só grava as linhas lidas da planilha; a criação das contas
+    roda em um worker separado, fora do ciclo das requisições.
+    """
+
+    STATUS = [
+        ("pendente", "Pendente"),
+        ("concluida", "Concluída"),
+        ("falhou", "Falhou"),
+    ]
+
+    solicitante = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True
     )
+    linhas = models.JSONField()
+    status = models.CharField(max_length=9, choices=STATUS, default="pendente")
+    relatorio = models.JSONField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "criado_em"], name="importacao_fila_idx"),
+        ]
 
-    @staticmethod
-    def generate_token(user):
-        """Gerar token (código para o e-mail)
-        OBS: Não confundir com o token de autenticação!
-        """
-        EmailActivationToken.objects.filter(user=user, email=user.email).delete()
-
-        token = secrets.token_hex(3)
-        expiration_date = timezone.now() + timedelta(minutes=15)
-        token_instance = EmailActivationToken.objects.create(
-            user=user, email=user.email, token=token, expires_at=expiration_date
-        )
-        return token_instance
+    def __str__(self):
+        return f"Importação {self.pk} ({self.status})"
@@ -0,0 +1,326 @@
+"""Pipeline assíncrono das fotos de perfil.
+
+O upload é validado e gravado em disco local durante a requisição, que
+termina sem esperar o CDN. Após o commit, um pool de threads gera com Pillow
+as miniaturas configuradas em ``settings.FOTOS_TAMANHOS`` e as grava no
+backend ``settings.FOTOS_STORAGE`` (Cloudinary em produção, sistema de
+arquivos local nos demais ambientes). Até lá, o perfil continua exibindo a
+foto anterior.
+
+O pool vive no processo da requisição: um upload cujo processamento se perdeu
+(reinício do processo, por exemplo) é reprocessado ou descartado por
+``recuperar_pendentes`` depois de ``settings.FOTOS_PENDENTE_TIMEOUT``
+segundos. Como o upload está no disco local, a recuperação roda nos próprios
+processos web (``iniciar_recuperacao``, chamada em monitorias.wsgi), e cada
+máquina só trata os uploads que recebeu.
+"""
+import io
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent import futures
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from accounts.models import Perfil
+
+logger = logging.getLogger(__name__)
+
+URL_FOTOS = "https://res.cloudinary.com/dlvmqmqcn/image/upload/v1/"
+
+_storage = None
+_executor = None
+_pendentes = set()
+_lock = threading.Lock()
+_recuperacao = None
+
+
+def get_storage():
+    """Retorna o backend em que as miniaturas são gravadas."""
+    global _storage  # pylint: disable=global-statement
+    if _storage is None:
+        config = settings.FOTOS_STORAGE
+        _storage = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _storage
+
+
+@receiver(setting_changed)
+def _recarregar_configuracao(setting, **kwargs):  # pylint: disable=unused-argument
+    global _storage  # pylint: disable=global-statement
+    if setting == "FOTOS_STORAGE":
+        _storage = None
+
+
+def _get_executor() -> futures.ThreadPoolExecutor:
+    global _executor  # pylint: disable=global-statement
+    with _lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.FOTOS_WORKERS, thread_name_prefix="fotos"
+            )
+        return _executor
+
+
+def maior_tamanho() -> str:
+    """Nome do maior tamanho configurado, usado como foto principal."""
+    return max(settings.FOTOS_TAMANHOS, key=settings.FOTOS_TAMANHOS.get)
+
+
+def menor_tamanho() -> str:
+    """Nome do menor tamanho configurado, usado em listagens."""
+    return min(settings.FOTOS_TAMANHOS, key=settings.FOTOS_TAMANHOS.get)
+
+
+def urls_foto(perfil: Perfil) -> dict:
+    """Retorna a URL da foto do perfil em cada tamanho configurado.
+
+    Fotos enviadas antes das miniaturas existirem usam a imagem original em
+    todos os tamanhos. Perfis sem foto retornam um dicionário vazio.
+    """
+    return urls_variantes(perfil.foto, perfil.foto_variantes)
+
+
+def urls_variantes(foto, variantes: dict) -> dict:
+    """Como ``urls_foto``, a partir dos valores dos campos ``foto`` e
+    ``foto_variantes`` (por exemplo, de uma consulta com ``values()``)."""
+    if variantes:
+        storage = get_storage()
+        return {tamanho: storage.url(nome) for tamanho, nome in variantes.items()}
+    if foto:
+        return dict.fromkeys(settings.FOTOS_TAMANHOS, URL_FOTOS + str(foto))
+    return {}
+
+
+def receber_foto(perfil: Perfil, arquivo) -> None:
+    """Recebe o upload de uma foto e agenda a geração das miniaturas.
+
+    Apenas lê o cabeçalho da imagem para validá-la e a grava em
+    ``settings.FOTOS_UPLOAD_DIR``; ``perfil.foto_pendente`` é preenchido, mas
+    quem chama deve salvar o perfil. O processamento começa após o commit.
+
+    Raises:
+        ValidationError: o arquivo não é uma imagem válida.
+    """
+    try:
+        with Image.open(arquivo) as imagem:
+            imagem.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as exc:
+        raise ValidationError(
+            {"foto": ["Envie uma imagem válida."]}, code="invalid_image"
+        ) from exc
+
+    os.makedirs(settings.FOTOS_UPLOAD_DIR, exist_ok=True)
+    nome = f"{perfil.usuario_id}-{secrets.token_hex(8)}"
+    arquivo.seek(0)
+    with open(os.path.join(settings.FOTOS_UPLOAD_DIR, nome), "wb") as destino:
+        for pedaco in arquivo.chunks():
+            destino.write(pedaco)
+
+    perfil.foto_pendente = nome
+    perfil.foto_pendente_desde = timezone.now()
+    perfil.foto_pendente_origem = settings.FOTOS_ORIGEM
+    transaction.on_commit(lambda: agendar_processamento(perfil.pk, nome))
+
+
+def agendar_processamento(perfil_id: int, nome: str):
+    """Envia o upload para o pool de threads.
+
+    Com ``settings.FOTOS_WORKERS`` igual a 0, processa imediatamente.
+    """
+    if settings.FOTOS_WORKERS <= 0:
+        processar_foto(perfil_id, nome)
+        return None
+
+    future = _get_executor().submit(_processar_em_thread, perfil_id, nome)
+    _pendentes.add(future)
+    future.add_done_callback(_pendentes.discard)
+    return future
+
+
+def aguardar_processamento(timeout=None) -> None:
+    """Espera as fotos enviadas ao pool de threads terminarem de processar."""
+    futures.wait(list(_pendentes), timeout=timeout)
+
+
+def _processar_em_thread(perfil_id: int, nome: str) -> None:
+    close_old_connections()
+    try:
+        processar_foto(perfil_id, nome)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Falha ao processar a foto %s do perfil %s", nome, perfil_id)
+    finally:
+        close_old_connections()
+
+
+def gerar_miniaturas(conteudo) -> dict:
+    """Gera as miniaturas JPEG de uma imagem, por tamanho configurado.
+
+    Returns:
+        Dicionário tamanho -> bytes da miniatura.
+    """
+    miniaturas = {}
+    with Image.open(conteudo) as imagem:
+        imagem = ImageOps.exif_transpose(imagem).convert("RGB")
+        for tamanho, lado in settings.FOTOS_TAMANHOS.items():
+            miniatura = imagem.copy()
+            miniatura.thumbnail((lado, lado), Image.LANCZOS)
+            buffer = io.BytesIO()
+            miniatura.save(buffer, format="JPEG", quality=85, optimize=True)
+            miniaturas[tamanho] = buffer.getvalue()
+    return miniaturas
+
+
+def processar_foto(perfil_id: int, nome: str) -> bool:
+    """Gera e grava as miniaturas de um upload e as publica no perfil.
+
+    Se outro upload do mesmo perfil chegou nesse meio tempo, as miniaturas
+    geradas são descartadas. As miniaturas da foto anterior são removidas do
+    backend após o commit.
+
+    Returns:
+        Se a foto foi publicada no perfil.
+    """
+    caminho = os.path.join(settings.FOTOS_UPLOAD_DIR, nome)
+    storage = get_storage()
+    try:
+        with open(caminho, "rb") as arquivo:
+            miniaturas = gerar_miniaturas(arquivo)
+        variantes = {
+            tamanho: storage.save(f"fotos/{nome}-{tamanho}.jpg", ContentFile(conteudo))
+            for tamanho, conteudo in miniaturas.items()
+        }
+    except Exception:
+        with transaction.atomic():
+            Perfil.objects.filter(pk=perfil_id, foto_pendente=nome).update(
+                foto_pendente=None, foto_pendente_desde=None, foto_pendente_origem=""
+            )
+        raise
+    finally:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+    with transaction.atomic():
+        perfil = (
+            Perfil.objects.select_for_update()
+            .filter(pk=perfil_id, foto_pendente=nome)
+            .first()
+        )
+        if perfil is None:
+            obsoletas = list(variantes.values())
+        else:
+            obsoletas = list(perfil.foto_variantes.values())
+            perfil.foto = variantes[maior_tamanho()]
+            perfil.foto_variantes = variantes
+            perfil.foto_pendente = None
+            perfil.foto_pendente_desde = None
+            perfil.foto_pendente_origem = ""
+            # save() dispara os sinais que invalidam os caches de perfis.
+            perfil.save(
+                update_fields=[
+                    "foto",
+                    "foto_variantes",
+                    "foto_pendente",
+                    "foto_pendente_desde",
+                    "foto_pendente_origem",
+                ]
+            )
+        transaction.on_commit(lambda: _remover_arquivos(obsoletas))
+    return perfil is not None
+
+
+def recuperar_pendentes(lote: int = 100) -> tuple:
+    """Reprocessa ou descarta uploads pendentes há mais que o tempo limite.
+
+    O processamento de um upload se perde se o processo que o recebeu for
+    reiniciado antes de terminar. Só são considerados os uploads recebidos
+    nesta máquina (``settings.FOTOS_ORIGEM``), já que o arquivo fica no disco
+    local: os que ainda estão em ``settings.FOTOS_UPLOAD_DIR`` são processados
+    de novo, neste processo; os demais são descartados e o perfil continua com
+    a foto anterior.
+
+    Returns:
+        (reprocessados, descartados)
+    """
+    agora = timezone.now()
+    limite = agora - timedelta(seconds=settings.FOTOS_PENDENTE_TIMEOUT)
+    with transaction.atomic():
+        pendentes = list(
+            Perfil.objects.select_for_update(skip_locked=True)
+            .filter(
+                foto_pendente__isnull=False,
+                foto_pendente_desde__lte=limite,
+                # Sem origem: uploads anteriores ao campo, que ninguém localiza.
+                foto_pendente_origem__in=[settings.FOTOS_ORIGEM, ""],
+            )
+            .values_list("pk", "foto_pendente")[:lote]
+        )
+        existentes, perdidos = [], []
+        for perfil_id, nome in pendentes:
+            if os.path.exists(os.path.join(settings.FOTOS_UPLOAD_DIR, nome)):
+                existentes.append((perfil_id, nome))
+            else:
+                perdidos.append(perfil_id)
+        # Quem reprocessa renova o prazo, para que outro worker não repita.
+        Perfil.objects.filter(pk__in=[pk for pk, _ in existentes]).update(
+            foto_pendente_desde=agora
+        )
+        Perfil.objects.filter(pk__in=perdidos).update(
+            foto_pendente=None, foto_pendente_desde=None, foto_pendente_origem=""
+        )
+
+    for perfil_id, nome in existentes:
+        try:
+            processar_foto(perfil_id, nome)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(
+                "Falha ao processar a foto %s do perfil %s", nome, perfil_id
+            )
+    for perfil_id in perdidos:
+        logger.warning("Upload pendente do perfil %s descartado", perfil_id)
+    return len(existentes), len(perdidos)
+
+
+def iniciar_recuperacao() -> None:
+    """Inicia, uma vez por processo, a thread que chama ``recuperar_pendentes``
+    a cada ``settings.FOTOS_RECUPERACAO_INTERVALO`` segundos (0 desativa)."""
+    global _recuperacao  # pylint: disable=global-statement
+    if settings.FOTOS_RECUPERACAO_INTERVALO <= 0:
+        return
+    with _lock:
+        if _recuperacao is None:
+            _recuperacao = threading.Thread(
+                target=_recuperar_periodicamente, name="fotos-recuperacao", daemon=True
+            )
+            _recuperacao.start()
+
+
+def _recuperar_periodicamente() -> None:
+    while True:
+        time.sleep(settings.FOTOS_RECUPERACAO_INTERVALO)
+        close_old_connections()
+        try:
+            recuperar_pendentes()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Falha ao recuperar as fotos pendentes")
+        finally:
+            close_old_connections()
+
+
+def _remover_arquivos(nomes) -> None:
+    storage = get_storage()
+    for nome in nomes:
+        try:
+            storage.delete(nome)
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Não foi possível remover a miniatura %s", nome)
@@ -0,0 +1,116 @@
+"""Busca de usuários para o diretório (autocompletar).
+
+Cada termo digitado precisa casar com o início de uma palavra do nome
+completo ou do nome de exibição, ou com o início da matrícula ou do e-mail.
+No PostgreSQL essas colunas têm índices GIN de trigramas (``pg_trgm``, ver a
+migração 0031), que atendem os ``ILIKE`` da busca e permitem também
+encontrar nomes digitados com erros (``word_similarity``), ordenando pelos
+mais parecidos. Nos demais bancos a busca usa apenas os ``LIKE``, sem
+índices próprios.
+
+Para que os índices sejam usados:
+
+- os lookups ``istartswith``/``icontains`` do Django geram, no PostgreSQL,
+  ``UPPER(coluna::text) LIKE UPPER(...)``, que não usa índices sobre a
+  coluna; a busca usa os lookups ``trgm_istartswith``/``trgm_icontains``
+  registrados aqui, que geram ``coluna ILIKE ...`` no PostgreSQL e se
+  comportam como os originais nos demais bancos;
+- um ``OR`` entre colunas de tabelas diferentes (após o JOIN com o perfil)
+  impede o uso de índices; cada termo vira ``id IN (perfis UNION e-mails)``,
+  em que cada lado combina os índices da própria tabela (``BitmapOr``).
+"""
+from django.db import NotSupportedError, connections
+from django.db.models import CharField, FloatField, Lookup, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import IContains, IStartsWith
+
+from accounts.models import CustomUser, Perfil
+
+# Termos mais curtos que isso não usam a busca aproximada, que com poucos
+# caracteres casaria com quase tudo. O limiar de semelhança é o do pg_trgm
+# (``pg_trgm.word_similarity_threshold``, 0.6 por padrão).
+MINIMO_APROXIMADO = 3
+
+
+class _ILikeMixin:
+    """Gera ``ILIKE`` sobre a coluna sem transformação no PostgreSQL."""
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = compiler.compile(self.lhs)
+        # O padrão já vem escapado e com os curingas (ver PatternLookup).
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+class TrigramIStartsWith(_ILikeMixin, IStartsWith):
+    """``istartswith`` que usa os índices de trigramas no PostgreSQL."""
+
+
+class TrigramIContains(_ILikeMixin, IContains):
+    """``icontains`` que usa os índices de trigramas no PostgreSQL."""
+
+
+class TrigramWordSimilar(Lookup):
+    """Termo parecido com alguma palavra da coluna (operador ``<%``).
+
+    Só existe no PostgreSQL, com a extensão pg_trgm.
+    """
+
+    lookup_name = "trgm_word_similar"
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError("trgm_word_similar requer o PostgreSQL (pg_trgm).")
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{rhs} <%% {lhs}", [*rhs_params, *lhs_params]
+
+
+CharField.register_lookup(TrigramIStartsWith, "trgm_istartswith")
+CharField.register_lookup(TrigramIContains, "trgm_icontains")
+CharField.register_lookup(TrigramWordSimilar)
+
+
+def _usuarios_do_termo(termo: str, aproximado: bool):
+    """Ids dos usuários cujo perfil ou e-mail casam com o termo."""
+    perfis = Q(matricula__trgm_istartswith=termo)
+    for campo in ("nome_completo", "nome_exibicao"):
+        perfis |= Q(**{f"{campo}__trgm_istartswith": termo})
+        perfis |= Q(**{f"{campo}__trgm_icontains": f" {termo}"})
+        if aproximado:
+            perfis |= Q(**{f"{campo}__trgm_word_similar": termo})
+    return (
+        Perfil.objects.filter(perfis)
+        .values("usuario_id")
+        .union(CustomUser.objects.filter(email__trgm_istartswith=termo).values("id"))
+    )
+
+
+def buscar_usuarios(queryset, busca: str):
+    """Filtra os usuários pelos termos de ``busca``.
+
+    No PostgreSQL a consulta é anotada com ``relevancia`` (a maior semelhança
+    entre os termos e os nomes) e também traz nomes parecidos.
+    """
+    termos = busca.split()
+    if not termos:
+        return queryset
+
+    postgresql = connections[queryset.db].vendor == "postgresql"
+    for termo in termos:
+        aproximado = postgresql and len(termo) >= MINIMO_APROXIMADO
+        queryset = queryset.filter(pk__in=_usuarios_do_termo(termo, aproximado))
+
+    if postgresql:
+        texto = " ".join(termos)
+        queryset = queryset.annotate(
+            relevancia=RawSQL(
+                'SELECT greatest(word_similarity(%s, "nome_completo"), '
+                'word_similarity(%s, "nome_exibicao")) FROM "accounts_perfil" '
+                'WHERE "usuario_id" = "accounts_customuser"."id"',
+                [texto, texto],
+                output_field=FloatField(),
+            )
+        )
+    return queryset
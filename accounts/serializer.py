@@ -8,6 +8,7 @@ from drf_spectacular.utils import (
 from drf_writable_nested.serializers import WritableNestedModelSerializer
 from rest_framework import serializers
 
+from accounts import photo_service
 from accounts.models import CustomUser, EmailActivationToken, Perfil
 from core.models import Curso
 
@@ -58,6 +59,14 @@ class PerfilSerializer(WritableNestedModelSerializer):
             "foto",
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # URLs das miniaturas geradas por photo_service; listagens devem usar
+        # as menores em vez da foto original.
+        data["fotos"] = photo_service.urls_foto(instance)
+        data["foto"] = data["fotos"].get(photo_service.maior_tamanho())
+        return data
+
 
 @extend_schema_serializer(
     examples=[
@@ -101,7 +110,7 @@ class UserSerializer(WritableNestedModelSerializer, serializers.ModelSerializer)
 
     email = serializers.EmailField(read_only=True)
     perfil = PerfilSerializer()
-    cargos = serializers.StringRelatedField(many=True, source="groups", read_only=True)
+    cargos = serializers.ListField(child=serializers.CharField(), read_only=True)
 
     class Meta:
         model = CustomUser
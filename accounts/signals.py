@@ -0,0 +1,75 @@
+"""Sinais que mantêm os caches de contas consistentes."""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from accounts import account_management_service
+from accounts.authentication import invalidate_tokens, invalidate_user_tokens
+from accounts.models import CustomUser, Perfil
+from core.models import Curso
+
+
+@receiver(post_save, sender=Perfil)
+@receiver(post_delete, sender=Perfil)
+def invalidar_perfil(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Remove do cache o perfil alterado."""
+    account_management_service.invalidate_user_profiles(instance.usuario_id)
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidar_usuario(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Remove do cache o perfil do usuário removido."""
+    account_management_service.invalidate_user_profiles(instance.pk)
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def sincronizar_cargos(
+    sender, instance, action, reverse, pk_set, **kwargs
+):  # pylint: disable=unused-argument
+    """Mantém CustomUser.cargos_mascara e os caches em dia com os grupos."""
+    if reverse and action == "pre_clear":
+        # Depois do clear não há como saber quais usuários estavam no grupo.
+        instance._usuarios_removidos = list(  # pylint: disable=protected-access
+            instance.user_set.values_list("pk", flat=True)
+        )
+        return
+    if not action.startswith("post_"):
+        return
+
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == "post_clear":
+        user_ids = instance.__dict__.pop("_usuarios_removidos", [])
+    else:
+        user_ids = list(pk_set or [])
+
+    mascaras = account_management_service.sync_user_roles(*user_ids)
+    if not reverse:
+        instance.cargos_mascara = mascaras[instance.pk]
+    # sync_user_roles invalida os tokens em cache dos usuários alterados.
+    account_management_service.invalidate_user_profiles(*user_ids)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidar_autenticacao(
+    sender, instance, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    """Troca de senha, desativação ou qualquer alteração no usuário.
+
+    A remoção do cache é repetida após o commit (ver invalidate_tokens).
+    """
+    if not raw:
+        invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Logout ou remoção do token."""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=Curso)
+@receiver(post_delete, sender=Curso)
+def invalidar_curso(sender, **kwargs):  # pylint: disable=unused-argument
+    """O nome do curso faz parte dos perfis em cache."""
+    account_management_service.clear_user_profiles_cache()
@@ -1,7 +1,13 @@
 """Testes de autenticação do aplicativo 'accounts'."""
 
+from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
+
+from accounts.authentication import CachedTokenAuthentication, _chave_token
 from accounts.models import CustomUser, EmailActivationToken
 
 PASSWORD = "M@vr8RjZS8LqrjhV"
@@ -37,3 +43,63 @@ class UserAuthTest(APITestCase):
         data = {"username": "test@user.com", "password": PASSWORD}
         response = self.client.post(reverse("obtain-api-token"), data, format="json")
         self.assertEqual(response.data["token"], self.user_auth_token)
+
+    def test_autenticacao_em_cache(self):
+        """O token é autenticado sem consultas e invalidado ao mudar a conta."""
+        url = reverse("cursos-list")
+        headers = {"HTTP_AUTHORIZATION": f"Token {self.user_auth_token}"}
+        self.client.get(url, **headers)
+
+        # Apenas a listagem de cursos.
+        with self.assertNumQueries(1):
+            self.client.get(url, **headers)
+
+        with self.subTest("Desativação"):
+            self.user.is_active = False
+            self.user.save()
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.user.is_active = True
+            self.user.save()
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.subTest("Logout"):
+            Token.objects.filter(key=self.user_auth_token).delete()
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_sem_senha(self):
+        """O cache não guarda o hash da senha, que é lido do banco se usado."""
+        url = reverse("cursos-list")
+        headers = {"HTTP_AUTHORIZATION": f"Token {self.user_auth_token}"}
+        self.client.get(url, **headers)
+
+        credenciais = cache.get(_chave_token(self.user_auth_token))
+        self.assertIsNotNone(credenciais)
+        self.assertNotIn(self.user.password, repr(credenciais))
+
+        user, token = CachedTokenAuthentication().authenticate_credentials(
+            self.user_auth_token
+        )
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.user_auth_token))
+        self.assertEqual(user.get_deferred_fields(), {"password"})
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password(PASSWORD))
+
+    def test_remocao_de_todos_do_grupo(self):
+        """Esvaziar um grupo invalida os tokens dos usuários que estavam nele."""
+        url = reverse("cursos-list")
+        headers = {"HTTP_AUTHORIZATION": f"Token {self.user_auth_token}"}
+        grupo = Group.objects.get(name="aluno")
+        self.client.get(url, **headers)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            grupo.user_set.clear()
+        self.assertIsNone(cache.get(_chave_token(self.user_auth_token)))
+        # A remoção é repetida após o commit.
+        self.assertTrue(callbacks)
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            self.user_auth_token
+        )
+        self.assertEqual(user.cargos_mascara, 0)
@@ -1,8 +1,15 @@
 """Testes do modelo de usuário customizado do aplicativo 'accounts'."""
+import io
 
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from accounts.models import CustomUser
+from accounts.models import CARGOS, CustomUser
+from utils import cache as cache_utils
+from utils import conditional
 
 PASSWORD = "M@vr8RjZS8LqrjhV"
 
@@ -27,3 +34,65 @@ class CustomUserTest(TestCase):
         user = CustomUser.objects.first()
         self.assertEqual(user.email, "usuario@test.com")
         self.assertTrue(user.is_superuser)
+
+    def test_cargos_mascara(self):
+        """Verifica a sincronização da máscara de cargos com os grupos."""
+        user = CustomUser.objects.create_user(
+            email="usuario@test.com", password=PASSWORD
+        )
+        self.assertEqual(user.cargos, ["aluno"])
+
+        monitor = Group.objects.get(name="monitor")
+        with self.subTest("Adição pelo usuário"):
+            user.groups.add(monitor)
+            self.assertTrue(user.tem_cargo("monitor"))
+            user.refresh_from_db()
+            self.assertEqual(user.cargos, ["aluno", "monitor"])
+
+        with self.subTest("Remoção pelo grupo"):
+            monitor.user_set.remove(user)
+            user.refresh_from_db()
+            self.assertFalse(user.tem_cargo("monitor"))
+
+        with self.subTest("Limpeza pelo grupo"):
+            Group.objects.get(name="aluno").user_set.clear()
+            user.refresh_from_db()
+            self.assertEqual(user.cargos, [])
+
+        with self.subTest("Comando de preenchimento"):
+            user.groups.add(monitor)
+            CustomUser.objects.update(cargos_mascara=0)
+            saida = io.StringIO()
+            call_command("sincronizar_cargos", stdout=saida)
+            self.assertIn("1 usuário(s) corrigido(s).", saida.getvalue())
+            user.refresh_from_db()
+            self.assertEqual(user.cargos, ["monitor"])
+
+    def test_cargos_em_lote(self):
+        """Os cargos de vários usuários são gravados em um único UPDATE"""
+        usuarios = [
+            CustomUser.objects.create_user(
+                email=f"usuario{i}@test.com", password=PASSWORD
+            )
+            for i in range(3)
+        ]
+        monitor = Group.objects.get(name="monitor")
+        with CaptureQueriesContext(connection) as consultas:
+            monitor.user_set.add(*usuarios)
+        atualizacoes = [
+            consulta
+            for consulta in consultas.captured_queries
+            if consulta["sql"].startswith('UPDATE "accounts_customuser"')
+        ]
+        self.assertEqual(len(atualizacoes), 1)
+        self.assertEqual(
+            set(CustomUser.objects.values_list("cargos_mascara", flat=True)),
+            {CARGOS["aluno"] | CARGOS["monitor"]},
+        )
+
+        # Sem post_save, a geração de CustomUser é trocada explicitamente.
+        namespace = conditional._namespace("accounts.CustomUser")
+        (antes,) = cache_utils.get_generations(namespace)
+        CustomUser.objects.update(cargos_mascara=0)
+        call_command("sincronizar_cargos", stdout=io.StringIO())
+        self.assertNotEqual(cache_utils.get_generations(namespace), [antes])
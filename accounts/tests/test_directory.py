@@ -0,0 +1,114 @@
+"""Testes do diretório de usuários."""
+from unittest import skipUnless
+
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service, search
+from accounts.models import CustomUser, Perfil
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+
+class DiretorioTest(APITestCase):
+    """Verifica a listagem compacta e a busca do diretório."""
+
+    def setUp(self):
+        self.usuarios = {}
+        for email, nome, matricula, cargo in (
+            ("ana@alu.ufc.br", "Ana Beatriz Souza", "400100", "aluno"),
+            ("bruno@alu.ufc.br", "Bruno Lima", "400200", "aluno"),
+            ("carla@ufc.br", "Carla Andrade", "100300", "professor"),
+            ("inativo@alu.ufc.br", "Ana Inativa", "400400", "aluno"),
+        ):
+            usuario = CustomUser.objects.create_user(
+                email=email,
+                password=PASSWORD,
+                is_email_active=True,
+                is_active=email != "inativo@alu.ufc.br",
+            )
+            usuario.groups.set([Group.objects.get_or_create(name=cargo)[0]])
+            Perfil.objects.create(
+                usuario=usuario,
+                nome_completo=nome,
+                nome_exibicao=" ".join(nome.split()[::2]),
+                matricula=matricula,
+            )
+            self.usuarios[email] = usuario
+
+    def ids(self, busca):
+        return [item["id"] for item in account_management_service.list_directory(busca)]
+
+    def test_busca_por_prefixo(self):
+        """Termos casam com o início das palavras do nome, da matrícula ou do e-mail"""
+        ana = self.usuarios["ana@alu.ufc.br"].pk
+        self.assertEqual(self.ids("ana"), [ana])
+        self.assertEqual(self.ids("bea"), [ana])
+        self.assertEqual(self.ids("ana souza"), [ana])
+        self.assertEqual(self.ids("4001"), [ana])
+        self.assertEqual(self.ids("carla@"), [self.usuarios["carla@ufc.br"].pk])
+        # Trechos do meio de uma palavra não casam (nem como nome parecido).
+        self.assertEqual(self.ids("atri"), [])
+        # Curingas digitados são tratados como texto.
+        self.assertEqual(self.ids("4%"), [])
+
+    @skipUnless(connection.vendor == "postgresql", "Índices de trigramas")
+    def test_busca_usa_indices_de_trigramas(self):
+        """No PostgreSQL os filtros da busca usam os índices de trigramas"""
+        sql, params = search.buscar_usuarios(
+            CustomUser.objects.only("id"), "souza"
+        ).query.sql_with_params()
+        with connection.cursor() as cursor:
+            # Com tabelas pequenas o planejador prefere ler a tabela (ou um
+            # índice) inteira; fora isso, só restam os índices dos filtros.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_indexscan = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plano = "\n".join(linha for (linha,) in cursor.fetchall())
+        self.assertNotIn("Seq Scan", plano)
+        for indice in (
+            "accounts_customuser_email_trgm",
+            "accounts_perfil_matricula_trgm",
+            "accounts_perfil_nome_completo_trgm",
+            "accounts_perfil_nome_exibicao_trgm",
+        ):
+            self.assertIn(indice, plano)
+
+    def test_uma_consulta(self):
+        """A listagem é feita em uma única consulta, sem contagem"""
+        with self.assertNumQueries(1):
+            diretorio = account_management_service.list_directory("", limite=2)
+        self.assertEqual(
+            diretorio,
+            [
+                {
+                    "id": self.usuarios["ana@alu.ufc.br"].pk,
+                    "nome_exibicao": "Ana Souza",
+                    "foto": None,
+                    "cargos": ["aluno"],
+                },
+                {
+                    "id": self.usuarios["bruno@alu.ufc.br"].pk,
+                    "nome_exibicao": "Bruno",
+                    "foto": None,
+                    "cargos": ["aluno"],
+                },
+            ],
+        )
+
+    def test_email_apenas_para_professores(self):
+        """Somente professores e administradores veem os e-mails"""
+        url = reverse("usuario-diretorio")
+        for email, com_email in (("bruno@alu.ufc.br", False), ("carla@ufc.br", True)):
+            token = account_management_service.get_user_token(self.usuarios[email]).key
+            response = self.client.get(
+                url,
+                {"busca": "ana", "limite": 100},
+                HTTP_AUTHORIZATION=f"Token {token}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data), 1)
+            self.assertEqual("email" in response.data[0], com_email)
@@ -0,0 +1,183 @@
+"""Testes da importação de alunos em lote."""
+import io
+import os
+import re
+import tempfile
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service, import_service
+from accounts.models import (
+    CARGOS,
+    CustomUser,
+    EmailActivationToken,
+    ImportacaoAlunos,
+    Perfil,
+)
+from core.models import Curso, EmailPendente
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+PLANILHA = (
+    "﻿email;nome;matricula;curso;entrada\n"
+    "ana@alu.ufc.br;Ana Maria Souza;100001;Ciência da Computação;2023.1\n"
+    "BRUNO@alu.ufc.br;Bruno Lima;100002;{curso_id};2023.1\n"
+    "existente@alu.ufc.br;Já Cadastrado;100003;;2023.1\n"
+    "invalido;Sem Email;100004;;2023.1\n"
+    "carla@alu.ufc.br;Carla;100005;Medicina;2023.3\n"
+)
+
+
+def planilha_alunos(quantidade):
+    """Gera uma planilha com a quantidade de alunos informada."""
+    linhas = ["email,nome,matricula,curso,entrada"]
+    linhas += [
+        f"aluno{i}@alu.ufc.br,Aluno {i},{i:06d},,2023.2" for i in range(quantidade)
+    ]
+    return import_service.ler_planilha(io.StringIO("\n".join(linhas)), "alunos.csv")
+
+
+class ImportacaoAlunosTest(APITestCase):
+    """Verifica a criação de contas a partir de planilhas."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self):
+        self.curso = Curso.objects.create(nome="Ciência da Computação")
+        CustomUser.objects.create_user(email="existente@alu.ufc.br", password=PASSWORD)
+
+    def test_comando(self):
+        """O comando cria contas, perfis, grupos, códigos e e-mails"""
+        with tempfile.NamedTemporaryFile("wb", suffix=".csv", delete=False) as arquivo:
+            arquivo.write(PLANILHA.format(curso_id=self.curso.pk).encode())
+        self.addCleanup(os.remove, arquivo.name)
+
+        saida = io.StringIO()
+        call_command(
+            "importar_alunos", arquivo.name, stdout=saida, stderr=io.StringIO()
+        )
+        self.assertIn(
+            "2 aluno(s) criado(s), 1 já cadastrado(s), 2 linha(s)", saida.getvalue()
+        )
+
+        ana = CustomUser.objects.get(email="ana@alu.ufc.br")
+        self.assertFalse(ana.is_email_active)
+        self.assertEqual(ana.cargos_mascara, CARGOS["aluno"])
+        self.assertEqual(list(ana.groups.values_list("name", flat=True)), ["aluno"])
+        self.assertEqual(ana.perfil.nome_exibicao, "Ana Souza")
+        self.assertEqual(ana.perfil.curso, self.curso)
+        self.assertEqual(
+            CustomUser.objects.get(email="bruno@alu.ufc.br").perfil.curso, self.curso
+        )
+        self.assertFalse(CustomUser.objects.filter(email="carla@alu.ufc.br").exists())
+
+        # Nenhuma senha é gerada: nem hash calculado, nem senha no e-mail.
+        self.assertFalse(ana.has_usable_password())
+        corpo = EmailPendente.objects.get(destinatarios=["ana@alu.ufc.br"]).corpo
+        self.assertNotIn("senha:", corpo.lower())
+
+        # O aluno cadastra a senha com o código, o que ativa a conta.
+        codigo = re.search(r"Código de primeiro acesso: (\w+)", corpo).group(1)
+        self.assertEqual(EmailActivationToken.objects.get(user=ana).token, codigo)
+        response = self.client.post(
+            reverse("usuario-verificar-token"), {"token": codigo}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            reverse("usuario-redefinir-senha"),
+            {"concessao": response.data["concessao"], "senha": PASSWORD},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            reverse("obtain-api-token"), {"username": ana.email, "password": PASSWORD}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(EMAIL_TOKEN_TTL=15 * 60, IMPORT_TOKEN_TTL=7 * 24 * 60 * 60)
+    def test_validade_do_codigo(self):
+        """Os códigos de primeiro acesso valem por IMPORT_TOKEN_TTL, não EMAIL_TOKEN_TTL"""
+        antes = timezone.now()
+        import_service.importar_alunos(planilha_alunos(3))
+        depois = timezone.now()
+
+        expiracoes = EmailActivationToken.objects.values_list("expires_at", flat=True)
+        self.assertEqual(len(expiracoes), 3)
+        for expiracao in expiracoes:
+            self.assertGreaterEqual(expiracao, antes + timedelta(days=7))
+            self.assertLessEqual(expiracao, depois + timedelta(days=7))
+
+    def test_consultas_independem_da_quantidade(self):
+        """A importação faz o mesmo número de consultas para 5 ou 50 alunos"""
+        with self.assertNumQueries(11):
+            relatorio = import_service.importar_alunos(planilha_alunos(5))
+        self.assertEqual(relatorio["criados"], 5)
+        Perfil.objects.all().delete()
+        CustomUser.objects.filter(email__startswith="aluno").delete()
+        with self.assertNumQueries(11):
+            relatorio = import_service.importar_alunos(planilha_alunos(50))
+        self.assertEqual(relatorio["criados"], 50)
+
+    def test_endpoint_restrito_a_administradores(self):
+        """Somente administradores podem importar pela API, em segundo plano"""
+        admin = CustomUser.objects.create_user(
+            email="admin@localhost.com",
+            password=PASSWORD,
+            is_email_active=True,
+            is_staff=True,
+        )
+        aluno = CustomUser.objects.get(email="existente@alu.ufc.br")
+        url = reverse("usuario-importar")
+
+        for usuario, esperado in (
+            (aluno, status.HTTP_403_FORBIDDEN),
+            (admin, status.HTTP_202_ACCEPTED),
+        ):
+            token = account_management_service.get_user_token(usuario).key
+            arquivo = SimpleUploadedFile(
+                "alunos.csv", PLANILHA.format(curso_id=self.curso.pk).encode()
+            )
+            response = self.client.post(
+                url,
+                {"arquivo": arquivo},
+                format="multipart",
+                HTTP_AUTHORIZATION=f"Token {token}",
+            )
+            self.assertEqual(response.status_code, esperado)
+
+        # A requisição só enfileira; as contas são criadas pelo worker.
+        self.assertEqual(response.data["status"], "pendente")
+        self.assertFalse(CustomUser.objects.filter(email="ana@alu.ufc.br").exists())
+        url = reverse("usuario-importacao", args=[response.data["id"]])
+        call_command("processar_importacoes", stdout=io.StringIO())
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Token {token}")
+        self.assertEqual(response.data["status"], "concluida")
+        relatorio = response.data["relatorio"]
+        self.assertEqual(relatorio["criados"], 2)
+        self.assertEqual(relatorio["existentes"], ["existente@alu.ufc.br"])
+        self.assertEqual([erro["linha"] for erro in relatorio["erros"]], [5, 6])
+        self.assertTrue(CustomUser.objects.filter(email="ana@alu.ufc.br").exists())
+        # As linhas da planilha não ficam guardadas depois do processamento.
+        self.assertEqual(ImportacaoAlunos.objects.get().linhas, [])
+
+    def test_falha_no_worker(self):
+        """Uma importação que falha é marcada, sem criar contas pela metade"""
+        importacao = import_service.enfileirar_importacao([{"email": None}])
+        with self.assertLogs("accounts.import_service", "ERROR"):
+            self.assertEqual(import_service.processar_importacoes(), 1)
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, "falhou")
+        self.assertTrue(importacao.erro)
+        self.assertEqual(import_service.processar_importacoes(), 0)
+
+    def test_colunas_ausentes(self):
+        """Planilhas sem as colunas esperadas são recusadas"""
+        with self.assertRaisesMessage(Exception, "Colunas ausentes"):
+            import_service.ler_planilha(io.BytesIO(b"email,nome\na@b.com,A"), "a.csv")
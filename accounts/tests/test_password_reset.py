@@ -0,0 +1,78 @@
+"""Testes da redefinição de senha com autorização assinada."""
+from django.contrib.sessions.models import Session
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import token_store
+from accounts.models import CustomUser
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+NOVA_SENHA = "novaSenha123"
+
+
+class RedefinicaoSenhaTest(APITestCase):
+    """Verifica o fluxo verificar-token -> redefinir-senha sem sessão."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="esqueci@user.com", password=PASSWORD, is_email_active=True
+        )
+        self.outro = CustomUser.objects.create_user(
+            email="outro@user.com", password=PASSWORD, is_email_active=True
+        )
+
+    def verificar(self, codigo):
+        return self.client.post(
+            reverse("usuario-verificar-token"), {"token": codigo}, format="json"
+        )
+
+    def redefinir(self, concessao, senha=NOVA_SENHA):
+        return self.client.post(
+            reverse("usuario-redefinir-senha"),
+            {"concessao": concessao, "senha": senha},
+            format="json",
+        )
+
+    def test_fluxo_sem_sessao(self):
+        """A senha do dono do código é trocada sem gravar sessões"""
+        codigo = token_store.get_token_store().emitir(self.user)
+        response = self.verificar(codigo)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Outro cliente (outro worker ou dispositivo) conclui o fluxo.
+        self.client = self.client_class()
+        response = self.redefinir(response.data["concessao"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.outro.refresh_from_db()
+        self.assertTrue(self.user.check_password(NOVA_SENHA))
+        self.assertTrue(self.outro.check_password(PASSWORD))
+        self.assertFalse(Session.objects.exists())
+
+    def test_codigo_e_autorizacao_de_uso_unico(self):
+        """O código é consumido ao gerar a autorização, que só vale uma vez"""
+        codigo = token_store.get_token_store().emitir(self.user)
+        concessao = self.verificar(codigo).data["concessao"]
+        self.assertEqual(self.verificar(codigo).status_code, 400)
+
+        self.assertEqual(self.redefinir(concessao).status_code, status.HTTP_200_OK)
+        response = self.redefinir(concessao, "outraSenha456")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(NOVA_SENHA))
+
+    def test_autorizacao_invalida(self):
+        """Autorizações adulteradas, expiradas ou ausentes são recusadas"""
+        codigo = token_store.get_token_store().emitir(self.user)
+        concessao = self.verificar(codigo).data["concessao"]
+
+        self.assertEqual(self.redefinir(concessao[:-2] + "xx").status_code, 400)
+        self.assertEqual(self.redefinir("").status_code, 400)
+        with override_settings(PASSWORD_RESET_GRANT_TTL=-1):
+            self.assertEqual(self.redefinir(concessao).status_code, 400)
+        # Senha fraca é recusada antes de usar a autorização.
+        self.assertEqual(self.redefinir(concessao, "curta").status_code, 400)
+        self.assertEqual(self.redefinir(concessao).status_code, status.HTTP_200_OK)
@@ -0,0 +1,190 @@
+"""Testes do processamento das fotos de perfil."""
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service, photo_service
+from accounts.models import CustomUser, Perfil
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+
+def imagem(largura=1600, altura=1200, formato="PNG"):
+    """Gera um upload de imagem em memória."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (largura, altura), "teal").save(buffer, format=formato)
+    return SimpleUploadedFile(
+        f"foto.{formato.lower()}", buffer.getvalue(), content_type="image/png"
+    )
+
+
+class FotoPerfilTest(APITestCase):
+    """Verifica o upload assíncrono e as miniaturas das fotos de perfil."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        self.armazenamento = os.path.join(diretorio, "fotos")
+        configuracao = override_settings(
+            FOTOS_STORAGE={
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": self.armazenamento, "base_url": "/midia/"},
+            },
+            FOTOS_UPLOAD_DIR=os.path.join(diretorio, "uploads"),
+            FOTOS_WORKERS=0,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.user = CustomUser.objects.create_user(
+            email="foto@user.com", password=PASSWORD, is_email_active=True
+        )
+        self.perfil = Perfil.objects.create(
+            usuario=self.user,
+            nome_completo="Usuário Foto",
+            nome_exibicao="Foto",
+            data_nascimento="2000-01-01",
+            matricula="000000",
+        )
+        self.token = account_management_service.get_user_token(self.user).key
+
+    def enviar_foto(self, arquivo):
+        return self.client.patch(
+            reverse("usuario-detail", args=["eu"]),
+            {"foto": arquivo},
+            format="multipart",
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+        )
+
+    def test_upload_gera_miniaturas_apos_commit(self):
+        """O upload responde antes das miniaturas, que são publicadas após o commit"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.enviar_foto(imagem())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["perfil"]["foto"])
+        self.perfil.refresh_from_db()
+        self.assertIsNotNone(self.perfil.foto_pendente)
+
+        for callback in callbacks:
+            callback()
+
+        self.perfil.refresh_from_db()
+        self.assertIsNone(self.perfil.foto_pendente)
+        self.assertEqual(
+            set(self.perfil.foto_variantes), {"pequena", "media", "grande"}
+        )
+        for tamanho, lado in {"pequena": 64, "media": 256, "grande": 1024}.items():
+            caminho = os.path.join(
+                self.armazenamento, self.perfil.foto_variantes[tamanho]
+            )
+            with Image.open(caminho) as miniatura:
+                self.assertEqual(max(miniatura.size), lado)
+
+        perfil = account_management_service.get_user_profile(self.user)
+        self.assertEqual(
+            perfil["fotos"]["pequena"],
+            "/midia/" + self.perfil.foto_variantes["pequena"],
+        )
+        self.assertEqual(perfil["foto"], perfil["fotos"]["grande"])
+
+    def test_upload_substituido(self):
+        """Um upload ultrapassado por outro é descartado sem alterar o perfil"""
+        with self.captureOnCommitCallbacks() as primeiro:
+            self.enviar_foto(imagem())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enviar_foto(imagem(300, 300))
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in primeiro:
+                callback()
+
+        self.perfil.refresh_from_db()
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.armazenamento, "fotos"))),
+            sorted(
+                os.path.basename(nome) for nome in self.perfil.foto_variantes.values()
+            ),
+        )
+        with Image.open(
+            os.path.join(self.armazenamento, self.perfil.foto_variantes["grande"])
+        ) as miniatura:
+            self.assertEqual(miniatura.size, (300, 300))
+
+    def test_arquivo_invalido(self):
+        """Arquivos que não são imagens são recusados na requisição"""
+        arquivo = SimpleUploadedFile("foto.png", b"nao sou uma imagem")
+        response = self.enviar_foto(arquivo)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("foto", response.data["erro"])
+        self.perfil.refresh_from_db()
+        self.assertIsNone(self.perfil.foto_pendente)
+
+    def test_foto_legada(self):
+        """Fotos sem miniaturas usam a imagem original em todos os tamanhos"""
+        self.perfil.foto = "imagens/antiga.jpg"
+        self.assertEqual(
+            set(photo_service.urls_foto(self.perfil).values()),
+            {photo_service.URL_FOTOS + "imagens/antiga.jpg"},
+        )
+
+    def test_recuperacao_de_processamento_perdido(self):
+        """Uploads pendentes há muito tempo são reprocessados ou descartados"""
+        # O processamento agendado nunca roda (processo reiniciado).
+        with self.captureOnCommitCallbacks():
+            self.enviar_foto(imagem(300, 300))
+        self.perfil.refresh_from_db()
+        self.assertIsNotNone(self.perfil.foto_pendente_desde)
+
+        # Antes do tempo limite o upload ainda pode estar sendo processado.
+        self.assertEqual(photo_service.recuperar_pendentes(), (0, 0))
+
+        with self.settings(FOTOS_PENDENTE_TIMEOUT=0):
+            self.assertEqual(photo_service.recuperar_pendentes(), (1, 0))
+
+            # Upload cujo arquivo se perdeu: o perfil mantém a foto atual.
+            with self.captureOnCommitCallbacks():
+                self.enviar_foto(imagem())
+            self.perfil.refresh_from_db()
+            os.remove(
+                os.path.join(settings.FOTOS_UPLOAD_DIR, self.perfil.foto_pendente)
+            )
+            with self.assertLogs(photo_service.logger, "WARNING"):
+                self.assertEqual(photo_service.recuperar_pendentes(), (0, 1))
+
+        self.perfil.refresh_from_db()
+        self.assertIsNone(self.perfil.foto_pendente)
+        self.assertIsNone(self.perfil.foto_pendente_desde)
+        with Image.open(
+            os.path.join(self.armazenamento, self.perfil.foto_variantes["grande"])
+        ) as miniatura:
+            self.assertEqual(miniatura.size, (300, 300))
+
+    def test_recuperacao_apenas_da_propria_maquina(self):
+        """Uploads recebidos por outra máquina não são tocados"""
+        with self.captureOnCommitCallbacks():
+            self.enviar_foto(imagem(300, 300))
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.perfil.foto_pendente_origem, settings.FOTOS_ORIGEM)
+        pendente = self.perfil.foto_pendente
+
+        with self.settings(FOTOS_PENDENTE_TIMEOUT=0, FOTOS_ORIGEM="web.2"):
+            self.assertEqual(photo_service.recuperar_pendentes(), (0, 0))
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.perfil.foto_pendente, pendente)
+
+        with self.settings(FOTOS_PENDENTE_TIMEOUT=0):
+            self.assertEqual(photo_service.recuperar_pendentes(), (1, 0))
+        self.perfil.refresh_from_db()
+        self.assertIsNone(self.perfil.foto_pendente)
+        self.assertEqual(self.perfil.foto_pendente_origem, "")
@@ -0,0 +1,161 @@
+"""Testes dos limites de requisições dos endpoints de autenticação."""
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service
+from accounts.models import CustomUser
+from utils.throttling import parse_rate
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+# Janelas longas, para que a virada de uma janela não caia no meio de um teste.
+LIMITES = {
+    "login": {"ip": "10/h", "email": "3/h"},
+    "cadastro": {"ip": "2/h"},
+    "verificacao_token": {"ip": "2/h"},
+}
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS=LIMITES)
+class LimiteRequisicoesTest(APITestCase):
+    """Verifica a limitação por IP e por e-mail com janela deslizante."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self):
+        cache.clear()
+        for email in ("alvo@user.com", "legitimo@user.com"):
+            user = CustomUser.objects.create_user(
+                email=email, password=PASSWORD, is_email_active=True
+            )
+            account_management_service.get_user_token(user)
+
+    def login(self, email, senha="senha-errada", ip="10.0.0.1"):
+        return self.client.post(
+            reverse("obtain-api-token"),
+            {"username": email, "password": senha},
+            format="json",
+            REMOTE_ADDR=ip,
+        )
+
+    def test_login_limitado_por_email(self):
+        """Tentativas em excesso para um e-mail recebem 429 sem acessar o banco"""
+        for _ in range(3):
+            self.assertEqual(
+                self.login("alvo@user.com").status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+        with self.assertNumQueries(0):
+            response = self.login("Alvo@User.com", ip="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+        # Outros usuários, inclusive no mesmo IP, continuam entrando.
+        response = self.login("legitimo@user.com", senha=PASSWORD)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_limitado_por_ip(self):
+        """Um IP que tenta vários e-mails é limitado, sem afetar os demais IPs"""
+        for i in range(10):
+            self.login(f"usuario{i}@user.com")
+        self.assertEqual(
+            self.login("legitimo@user.com", senha=PASSWORD).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertEqual(
+            self.login("legitimo@user.com", senha=PASSWORD, ip="10.0.0.9").status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_x_forwarded_for_forjado(self):
+        """Trocar o X-Forwarded-For não zera o contador do IP"""
+        for i in range(10):
+            self.client.post(
+                reverse("obtain-api-token"),
+                {"username": f"usuario{i}@user.com", "password": "senha-errada"},
+                format="json",
+                REMOTE_ADDR="10.0.0.1",
+                HTTP_X_FORWARDED_FOR=f"192.0.2.{i}",
+            )
+        response = self.client.post(
+            reverse("obtain-api-token"),
+            {"username": "legitimo@user.com", "password": PASSWORD},
+            format="json",
+            REMOTE_ADDR="10.0.0.1",
+            HTTP_X_FORWARDED_FOR="192.0.2.200",
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_x_forwarded_for_atras_de_proxy(self):
+        """Atrás do proxy vale o endereço anexado por ele, não o do cliente"""
+        rest_framework = {**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+        with self.settings(REST_FRAMEWORK=rest_framework):
+            for i in range(10):
+                self.client.post(
+                    reverse("obtain-api-token"),
+                    {"username": f"usuario{i}@user.com", "password": "senha-errada"},
+                    format="json",
+                    REMOTE_ADDR="10.1.1.1",
+                    HTTP_X_FORWARDED_FOR=f"192.0.2.{i}, 203.0.113.7",
+                )
+            response = self.client.post(
+                reverse("obtain-api-token"),
+                {"username": "legitimo@user.com", "password": PASSWORD},
+                format="json",
+                REMOTE_ADDR="10.1.1.1",
+                HTTP_X_FORWARDED_FOR="192.0.2.200, 203.0.113.7",
+            )
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            # Outro cliente, atrás do mesmo proxy, não é afetado.
+            response = self.client.post(
+                reverse("obtain-api-token"),
+                {"username": "legitimo@user.com", "password": PASSWORD},
+                format="json",
+                REMOTE_ADDR="10.1.1.1",
+                HTTP_X_FORWARDED_FOR="203.0.113.8",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_escopos_independentes(self):
+        """Cada endpoint tem seus próprios contadores"""
+        for i in range(2):
+            response = self.client.post(
+                reverse("registrar-list"),
+                {"email": f"novo{i}@user.com", "password": PASSWORD},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            reverse("registrar-list"),
+            {"email": "novo2@user.com", "password": PASSWORD},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(CustomUser.objects.filter(email="novo2@user.com").exists())
+
+        url = reverse("usuario-verificar-token")
+        for _ in range(2):
+            response = self.client.post(url, {"token": "000000"}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {"token": "000000"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_desativado(self):
+        """Com RATE_LIMIT_ENABLED desligado nenhuma requisição é limitada"""
+        for _ in range(5):
+            self.assertEqual(
+                self.login("alvo@user.com").status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_parse_rate(self):
+        """Formato dos limites: quantidade/período, com multiplicador opcional"""
+        self.assertEqual(parse_rate("5/m"), (5, 60))
+        self.assertEqual(parse_rate("10/15m"), (10, 900))
+        self.assertEqual(parse_rate("100/d"), (100, 86400))
+        with self.assertRaises(ValueError):
+            parse_rate("5 por minuto")
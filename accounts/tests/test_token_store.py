@@ -0,0 +1,138 @@
+"""Testes do armazenamento dos códigos enviados por e-mail."""
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts.models import CustomUser, EmailActivationToken
+from accounts.token_store import get_token_store
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+
+class DatabaseTokenStoreTest(TestCase):
+    """Verifica o armazenamento dos códigos no banco."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="token@user.com", password=PASSWORD
+        )
+        self.store = get_token_store()
+
+    def test_emitir_reaproveita_codigo_valido(self):
+        """Um código ainda válido é reenviado em vez de gerar outro"""
+        token = self.store.emitir(self.user)
+        self.assertEqual(self.store.emitir(self.user), token)
+
+        EmailActivationToken.objects.update(expires_at=timezone.now())
+        novo = self.store.emitir(self.user)
+        self.assertEqual(EmailActivationToken.objects.get().token, novo)
+
+    def test_consumir(self):
+        """Um código só pode ser consumido uma vez, e só enquanto válido"""
+        token = self.store.emitir(self.user)
+        self.assertEqual(self.store.buscar(token), self.user.pk)
+        self.assertEqual(self.store.consumir(token), self.user.pk)
+        self.assertIsNone(self.store.consumir(token))
+
+        token = self.store.emitir(self.user)
+        EmailActivationToken.objects.update(expires_at=timezone.now())
+        self.assertIsNone(self.store.buscar(token))
+
+    def test_purgar_expirados(self):
+        """O comando limpar_tokens remove apenas os expirados, em lotes
+
+        Três lotes (ids e DELETE) e a consulta final vazia.
+        """
+        agora = timezone.now()
+        for i in range(5):
+            EmailActivationToken.objects.create(
+                user=self.user,
+                email=f"antigo{i}@user.com",
+                token=f"{i:06d}",
+                expires_at=agora - timedelta(minutes=i + 1),
+            )
+        valido = self.store.emitir(self.user)
+
+        saida = StringIO()
+        with self.assertNumQueries(7):
+            call_command("limpar_tokens", lote=2, stdout=saida)
+        self.assertIn("5 código(s)", saida.getvalue())
+        self.assertEqual(
+            list(EmailActivationToken.objects.values_list("token", flat=True)),
+            [valido],
+        )
+
+
+class ConsumoSimultaneoTest(TransactionTestCase):
+    """Verifica o consumo de um código por requisições simultâneas."""
+
+    def test_codigo_consumido_uma_vez(self):
+        """De várias tentativas simultâneas com o mesmo código, só uma vale"""
+        user = CustomUser.objects.create_user(email="token@user.com", password=PASSWORD)
+        store = get_token_store()
+        token = store.emitir(user)
+        barreira = threading.Barrier(8)
+        resultados = []
+        erros = []
+
+        def consumir():
+            try:
+                barreira.wait()
+                while True:
+                    try:
+                        resultados.append(store.consumir(token))
+                        return
+                    except OperationalError:
+                        # O SQLite dos testes bloqueia a tabela inteira em
+                        # escritas simultâneas; a operação é repetida.
+                        continue
+            except Exception as e:  # pylint: disable=W0703
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=consumir) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(erros, [])
+        self.assertEqual(len(resultados), 8)
+        self.assertEqual(resultados.count(user.pk), 1)
+
+
+@override_settings(EMAIL_TOKEN_STORE="accounts.token_store.CacheTokenStore")
+class CacheTokenStoreTest(APITestCase):
+    """Verifica os códigos guardados apenas no cache."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cadastro_sem_tokens_no_banco(self):
+        """Cadastro e confirmação funcionam sem gravar códigos no banco"""
+        self.client.post(
+            "/registrar/",
+            {"email": "cache@user.com", "password": PASSWORD},
+            format="json",
+        )
+        self.assertFalse(EmailActivationToken.objects.exists())
+
+        user = CustomUser.objects.get(email="cache@user.com")
+        token = get_token_store().emitir(user)
+        response = self.client.post("/registrar/confirmar-email/", {"token": token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.is_email_active)
+
+        response = self.client.post("/registrar/confirmar-email/", {"token": token})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
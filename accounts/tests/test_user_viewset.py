@@ -6,7 +6,8 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from accounts.models import CustomUser, EmailActivationToken
+from accounts import account_management_service
+from accounts.models import CustomUser, EmailActivationToken, Perfil
 from accounts.serializer import UserSerializer
 from core.models import Curso
 
@@ -100,3 +101,50 @@ class UserViewSetTest(APITestCase):
         self.assertEqual(self.user.perfil.matricula, "000000")
         self.assertEqual(self.user.perfil.curso_id, 1)
         self.assertEqual(self.user.perfil.entrada, "2022.1")
+
+    def test_get_user_profiles(self):
+        """Verifica a busca de perfis em lote e a invalidação do cache"""
+        outros = [
+            CustomUser.objects.create_user(
+                email=f"outro{i}@user.com", password=PASSWORD
+            )
+            for i in range(3)
+        ]
+        for outro in outros:
+            Perfil.objects.create(usuario=outro, nome_exibicao="Outro", curso_id=1)
+        ids = [self.user.id] + [outro.id for outro in outros]
+
+        with self.assertNumQueries(1):
+            perfis = account_management_service.get_user_profiles(ids)
+        self.assertEqual(set(perfis), set(ids))
+        self.assertEqual(
+            set(perfis[outros[0].id]),
+            {
+                "id",
+                "foto",
+                "fotos",
+                "nome_completo",
+                "nome_exibicao",
+                "curso",
+                "entrada",
+                "cargos",
+            },
+        )
+        self.assertEqual(perfis[outros[0].id]["curso"], "Ciência da Computação")
+
+        with self.assertNumQueries(0):
+            account_management_service.get_user_profiles(ids)
+
+        account_management_service.update_user_profile(
+            self.user.perfil,
+            {
+                "nome_completo": "Usuário da Silva",
+                "nome_exibicao": "Novo",
+                "data_nascimento": "2000-12-30",
+                "matricula": "000000",
+                "cargos": ["monitor"],
+            },
+        )
+        perfil = account_management_service.get_user_profiles([self.user.id])
+        self.assertEqual(perfil[self.user.id]["nome_exibicao"], "Novo")
+        self.assertEqual(perfil[self.user.id]["cargos"], ["monitor"])
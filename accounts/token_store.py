@@ -0,0 +1,255 @@
+"""Armazenamento dos códigos enviados por e-mail (ativação e recuperação de senha).
+
+Os códigos valem por ``settings.EMAIL_TOKEN_TTL`` segundos. O backend é
+escolhido em ``settings.EMAIL_TOKEN_STORE``:
+
+- ``DatabaseTokenStore`` guarda os códigos em ``EmailActivationToken``; os
+  expirados são removidos em lotes pelo comando ``limpar_tokens``.
+- ``CacheTokenStore`` guarda os códigos apenas no cache compartilhado, que os
+  descarta sozinho ao expirar, sem escrever no banco principal.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import EmailActivationToken
+
+# Tentativas de gerar um código que ainda não esteja em uso.
+TENTATIVAS_CODIGO = 5
+
+
+def gerar_codigo() -> str:
+    """Gera um código de 6 caracteres para ser digitado pelo usuário."""
+    return secrets.token_hex(3)
+
+
+class DatabaseTokenStore:
+    """Códigos guardados na tabela de EmailActivationToken."""
+
+    def emitir(self, user) -> str:
+        """Retorna o código válido do usuário para o e-mail atual, criando um novo
+        se não houver."""
+        agora = timezone.now()
+        atual = (
+            EmailActivationToken.objects.filter(
+                user=user, email=user.email, expires_at__gt=agora
+            )
+            .values_list("token", flat=True)
+            .first()
+        )
+        if atual is not None:
+            return atual
+
+        EmailActivationToken.objects.filter(user=user, email=user.email).delete()
+        expiracao = agora + timedelta(seconds=settings.EMAIL_TOKEN_TTL)
+        for _ in range(TENTATIVAS_CODIGO - 1):
+            try:
+                return self._criar(user, expiracao)
+            except IntegrityError:
+                # Código já em uso por outro usuário: tenta outro.
+                pass
+        return self._criar(user, expiracao)
+
+    def emitir_varios(self, users, ttl=None) -> dict:
+        """Cria códigos para vários usuários novos, com um INSERT por lote.
+
+        Args:
+            ttl: Validade dos códigos, em segundos; por padrão,
+                ``settings.EMAIL_TOKEN_TTL``.
+
+        Returns:
+            Dicionário id do usuário -> código.
+        """
+        codigos = {}
+        pendentes = list(users)
+        while pendentes:
+            candidatos = {}
+            for user in pendentes:
+                candidatos.setdefault(gerar_codigo(), user)
+            em_uso = set(codigos.values()) | set(
+                EmailActivationToken.objects.filter(token__in=candidatos).values_list(
+                    "token", flat=True
+                )
+            )
+            for codigo, user in candidatos.items():
+                if codigo not in em_uso:
+                    codigos[user.pk] = codigo
+            pendentes = [user for user in pendentes if user.pk not in codigos]
+
+        ttl = settings.EMAIL_TOKEN_TTL if ttl is None else ttl
+        expiracao = timezone.now() + timedelta(seconds=ttl)
+        EmailActivationToken.objects.bulk_create(
+            [
+                EmailActivationToken(
+                    user=user,
+                    email=user.email,
+                    token=codigos[user.pk],
+                    expires_at=expiracao,
+                )
+                for user in users
+            ],
+            batch_size=500,
+        )
+        return codigos
+
+    @staticmethod
+    def _criar(user, expiracao) -> str:
+        with transaction.atomic():
+            return EmailActivationToken.objects.create(
+                user=user, email=user.email, token=gerar_codigo(), expires_at=expiracao
+            ).token
+
+    def buscar(self, token: str):
+        """Retorna o id do usuário dono de um código válido, ou None."""
+        return (
+            EmailActivationToken.objects.filter(
+                token=token, expires_at__gt=timezone.now()
+            )
+            .values_list("user_id", flat=True)
+            .first()
+        )
+
+    def consumir(self, token: str):
+        """Invalida um código válido e retorna o id do seu usuário, ou None.
+
+        A linha fica travada até a remoção: de duas requisições simultâneas
+        com o mesmo código, só uma o consome.
+        """
+        with transaction.atomic():
+            user_id = (
+                EmailActivationToken.objects.select_for_update()
+                .filter(token=token, expires_at__gt=timezone.now())
+                .values_list("user_id", flat=True)
+                .first()
+            )
+            if user_id is not None:
+                EmailActivationToken.objects.filter(token=token).delete()
+        return user_id
+
+    def purgar_expirados(self, tamanho_lote: int = 1000) -> int:
+        """Remove os códigos expirados em lotes, usando o índice de expiração.
+
+        Returns:
+            Quantidade de códigos removidos.
+        """
+        removidos = 0
+        agora = timezone.now()
+        while True:
+            lote = list(
+                EmailActivationToken.objects.filter(expires_at__lte=agora).values_list(
+                    "pk", flat=True
+                )[:tamanho_lote]
+            )
+            if not lote:
+                return removidos
+            removidos += EmailActivationToken.objects.filter(pk__in=lote).delete()[0]
+
+
+class CacheTokenStore:
+    """Códigos guardados apenas no cache, com expiração pelo TTL do cache.
+
+    Cada código tem duas chaves: a do código (com o usuário) e a do usuário e
+    e-mail (com o código), usada para reenviar o mesmo código.
+    """
+
+    prefixo = "token_email"
+
+    def _chave_codigo(self, token):
+        return f"{self.prefixo}:codigo:{token}"
+
+    def _chave_usuario(self, user):
+        return f"{self.prefixo}:usuario:{user.pk}:{user.email.lower()}"
+
+    def emitir(self, user) -> str:
+        """Retorna o código válido do usuário para o e-mail atual, criando um novo
+        se não houver."""
+        chave_usuario = self._chave_usuario(user)
+        atual = cache.get(chave_usuario)
+        if atual is not None and cache.get(self._chave_codigo(atual)) == user.pk:
+            return atual
+
+        for _ in range(TENTATIVAS_CODIGO):
+            token = gerar_codigo()
+            # add() não sobrescreve um código em uso por outro usuário.
+            if cache.add(
+                self._chave_codigo(token), user.pk, timeout=settings.EMAIL_TOKEN_TTL
+            ):
+                cache.set(chave_usuario, token, timeout=settings.EMAIL_TOKEN_TTL)
+                return token
+        raise RuntimeError("Não foi possível gerar um código de verificação.")
+
+    def emitir_varios(self, users, ttl=None) -> dict:
+        """Cria códigos para vários usuários novos.
+
+        Args:
+            ttl: Validade dos códigos, em segundos; por padrão,
+                ``settings.EMAIL_TOKEN_TTL``.
+
+        Returns:
+            Dicionário id do usuário -> código.
+        """
+        ttl = settings.EMAIL_TOKEN_TTL if ttl is None else ttl
+        codigos = {}
+        pendentes = list(users)
+        while pendentes:
+            candidatos = {}
+            for user in pendentes:
+                candidatos.setdefault(self._chave_codigo(gerar_codigo()), user)
+            em_uso = cache.get_many(list(candidatos))
+            novos = {
+                chave: user for chave, user in candidatos.items() if chave not in em_uso
+            }
+            valores = {}
+            for chave, user in novos.items():
+                codigo = chave.rsplit(":", 1)[1]
+                codigos[user.pk] = codigo
+                valores[chave] = user.pk
+                valores[self._chave_usuario(user)] = codigo
+            cache.set_many(valores, timeout=ttl)
+            pendentes = [user for user in pendentes if user.pk not in codigos]
+        return codigos
+
+    def buscar(self, token: str):
+        """Retorna o id do usuário dono de um código válido, ou None."""
+        return cache.get(self._chave_codigo(token))
+
+    def consumir(self, token: str):
+        """Invalida um código válido e retorna o id do seu usuário, ou None.
+
+        Só quem de fato remove a chave consome o código: ``delete`` informa
+        se a chave existia.
+        """
+        chave = self._chave_codigo(token)
+        user_id = cache.get(chave)
+        if user_id is None or not cache.delete(chave):
+            return None
+        return user_id
+
+    def purgar_expirados(self, tamanho_lote: int = 1000) -> int:
+        """O cache descarta os códigos expirados sozinho."""
+        return 0
+
+
+_store = None
+
+
+def get_token_store():
+    """Retorna o backend configurado em ``settings.EMAIL_TOKEN_STORE``."""
+    global _store  # pylint: disable=global-statement
+    if _store is None:
+        _store = import_string(settings.EMAIL_TOKEN_STORE)()
+    return _store
+
+
+@receiver(setting_changed)
+def _recarregar_configuracao(setting, **kwargs):  # pylint: disable=unused-argument
+    global _store  # pylint: disable=global-statement
+    if setting == "EMAIL_TOKEN_STORE":
+        _store = None
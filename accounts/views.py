@@ -2,7 +2,6 @@
 import re
 from contextvars import Token
 
-from django.utils import timezone
 from django.forms import ValidationError
 from django.core import exceptions
 
@@ -22,6 +21,7 @@ from rest_framework.decorators import action
 from rest_framework.authtoken.models import Token  # pylint: disable=W0404
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.viewsets import mixins, GenericViewSet, ViewSet
 
@@ -33,14 +33,21 @@ from accounts import (
     account_management_service,
     errors,
     access_policy,
+    import_service,
     models,
     serializer,
 )
+from utils.throttling import EmailRateThrottle, IPRateThrottle, ThrottleFirstMixin
 
+LIMITE_DIRETORIO = 50
 
-class CustomAuthToken(ObtainAuthToken):
+
+class CustomAuthToken(ThrottleFirstMixin, ObtainAuthToken):
     """Classe para login"""
 
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "login"
+
     def post(self, request, *args, **kwargs):
         """Função para realizar o login do usuário"""
         serializer = self.serializer_class(  # pylint: disable=W0621
@@ -56,10 +63,12 @@ class CustomAuthToken(ObtainAuthToken):
         return Response({"token": token.key, "user_id": user.pk, "email": user.email})
 
 
-class UserRegistration(AccessViewSetMixin, ViewSet):
+class UserRegistration(ThrottleFirstMixin, AccessViewSetMixin, ViewSet):
     """ViewSet para ações relacionadas ao cadastro do usuário."""
 
     access_policy = access_policy.AccountRegistrationAccessPolicy
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = "cadastro"
 
     @extend_schema(
         tags=["Cadastro do Usuário"],
@@ -174,23 +183,15 @@ class UserRegistration(AccessViewSetMixin, ViewSet):
                 {"error": "Token não informado."}, status=status.HTTP_400_BAD_REQUEST
             )
         try:
-            token_instance = models.EmailActivationToken.objects.get(
-                token=token, expires_at__gt=timezone.now()
-            )
-            user = token_instance.user
-            user.is_email_active = True
-            user.save()
-            token_instance.delete()
-
-            auth_token = account_management_service.get_user_token(user)
+            auth_token = account_management_service.confirm_email(token)
             return Response(
                 {
                     "message": "E-mail confirmado com sucesso.",
-                    "auth_token": auth_token.key,
+                    "auth_token": auth_token,
                 },
                 status=status.HTTP_200_OK,
             )
-        except models.EmailActivationToken.DoesNotExist:
+        except errors.EmailConfirmationCodeInactive:
             return Response(
                 {"error": "Token inválido ou expirado."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -210,6 +211,7 @@ class UserRegistration(AccessViewSetMixin, ViewSet):
     destroy=extend_schema(tags=["Usuário"]),
 )
 class UserViewSet(
+    ThrottleFirstMixin,
     AccessViewSetMixin,
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin,
@@ -221,6 +223,8 @@ class UserViewSet(
     access_policy = access_policy.UserViewAccessPolicy
     queryset = models.CustomUser.objects.all().order_by("id")
     serializer_class = serializer.UserSerializer
+    # Definido por ação, nas ações públicas da redefinição de senha.
+    throttle_scope = None
 
     @extend_schema(
         tags=["Usuário"],
@@ -272,11 +276,9 @@ class UserViewSet(
     def retrieve(self, request, pk=None):
         """Retorna o perfil de um usuário."""
         try:
-            user_model = (
-                request.user if pk == "eu" else models.CustomUser.objects.get(pk=pk)
-            )
-            perfil = account_management_service.get_user_profile(user_model)
-        except exceptions.ObjectDoesNotExist:
+            user_id = request.user.id if pk == "eu" else int(pk)
+            perfil = account_management_service.get_user_profiles([user_id])[user_id]
+        except (KeyError, ValueError):
             return Response(
                 data={"erro": {"mensagem": "Usuário não encontrado."}}, status=404
             )
@@ -320,6 +322,14 @@ class UserViewSet(
                                 "type": "file",
                                 "example": "192.168.0.1/imagens/foto.jpg",
                             },
+                            "fotos": {
+                                "type": "object",
+                                "example": {
+                                    "pequena": "192.168.0.1/imagens/fotos/1-pequena.jpg",
+                                    "media": "192.168.0.1/imagens/fotos/1-media.jpg",
+                                    "grande": "192.168.0.1/imagens/fotos/1-grande.jpg",
+                                },
+                            },
                             "nome_exibição": {
                                 "type": "string",
                                 "example": "Francisco Silva",
@@ -364,6 +374,157 @@ class UserViewSet(
 
         return Response(data={"perfil": perfil}, status=status.HTTP_200_OK)
 
+    @extend_schema(
+        tags=["Usuário"],
+        parameters=[
+            OpenApiParameter(
+                "busca",
+                type=OpenApiTypes.STR,
+                description="Início do nome, da matrícula ou do e-mail.",
+            ),
+            OpenApiParameter(
+                "limite",
+                type=OpenApiTypes.INT,
+                description=f"Quantidade máxima de usuários (até {LIMITE_DIRETORIO}).",
+            ),
+        ],
+        responses={
+            (200, "application/json"): {
+                "type": "array",
+                "example": [
+                    {
+                        "id": 7,
+                        "nome_exibicao": "Francisco Silva",
+                        "foto": "192.168.0.1/imagens/fotos/7-pequena.jpg",
+                        "cargos": ["aluno"],
+                        "email": "francisco@alu.ufc.br",
+                    }
+                ],
+            },
+        },
+    )
+    @action(methods=["GET"], detail=False)
+    def diretorio(self, request):
+        """Lista compacta de usuários para autocompletar.
+
+        O e-mail só é exibido para professores e administradores.
+        """
+        try:
+            limite = int(request.query_params.get("limite", 10))
+        except ValueError:
+            limite = 10
+        limite = min(max(limite, 1), LIMITE_DIRETORIO)
+        com_email = request.user.is_staff or request.user.tem_cargo("professor")
+        diretorio = account_management_service.list_directory(
+            request.query_params.get("busca", ""), limite, com_email
+        )
+        return Response(diretorio, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        tags=["Usuário"],
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {"arquivo": {"type": "file"}},
+            }
+        },
+        responses={
+            (202, "application/json"): {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "example": 3},
+                    "status": {"type": "string", "example": "pendente"},
+                },
+            },
+            (400, "application/json"): {
+                "type": "object",
+                "properties": {
+                    "erro": {
+                        "type": "array",
+                        "example": ["Colunas ausentes na planilha: curso."],
+                    }
+                },
+            },
+        },
+    )
+    @action(
+        methods=["POST"],
+        detail=False,
+        parser_classes=[MultiPartParser],
+    )
+    def importar(self, request):
+        """Enfileira a importação das contas dos alunos de uma planilha CSV ou XLSX
+        (administradores).
+
+        A planilha deve ter as colunas email, nome, matricula, curso e entrada.
+        As contas são criadas por um worker; o resultado é consultado em
+        ``importacoes/<id>/``.
+        """
+        arquivo = request.FILES.get("arquivo")
+        if arquivo is None:
+            return Response(
+                {"erro": ["Planilha não informada."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            linhas = import_service.ler_planilha(arquivo, arquivo.name)
+        except exceptions.ValidationError as e:
+            return Response({"erro": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        importacao = import_service.enfileirar_importacao(linhas, request.user)
+        return Response(
+            {"id": importacao.pk, "status": importacao.status},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(
+        tags=["Usuário"],
+        responses={
+            (200, "application/json"): {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer", "example": 3},
+                    "status": {
+                        "type": "string",
+                        "enum": ["pendente", "concluida", "falhou"],
+                    },
+                    "relatorio": {
+                        "type": "object",
+                        "example": {
+                            "criados": 120,
+                            "existentes": ["aluno@alu.ufc.br"],
+                            "erros": [
+                                {
+                                    "linha": 7,
+                                    "email": "aluno@",
+                                    "erros": ["E-mail inválido."],
+                                }
+                            ],
+                        },
+                    },
+                    "erro": {"type": "string", "example": ""},
+                },
+            },
+        },
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path=r"importacoes/(?P<importacao_id>[0-9]+)",
+    )
+    def importacao(self, request, importacao_id=None):
+        """Situação e relatório de uma importação de alunos (administradores)."""
+        importacao = (
+            models.ImportacaoAlunos.objects.filter(pk=importacao_id)
+            .values("id", "status", "relatorio", "erro", "criado_em", "concluido_em")
+            .first()
+        )
+        if importacao is None:
+            return Response(
+                {"erro": "Importação não encontrada."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(importacao, status=status.HTTP_200_OK)
+
     @extend_schema(
         tags=["usuario"],
         parameters=[
@@ -505,11 +666,16 @@ class UserViewSet(
             },
         },
     )
-    @action(methods=["POST"], detail=False, url_path="solicitar-redefinicao-senha")
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="solicitar-redefinicao-senha",
+        throttle_classes=[IPRateThrottle, EmailRateThrottle],
+        throttle_scope="redefinicao_senha",
+    )
     def solicitar_redefinicao_senha(self, request):
         """Função de solicitação de redefinição de senha de fora do APP"""
         email = request.data.get("email")
-        request.session["email"] = email
         if not email:
             return Response(
                 {"error": "Email não informado."}, status=status.HTTP_400_BAD_REQUEST
@@ -555,6 +721,11 @@ class UserViewSet(
                 "type": "object",
                 "properties": {
                     "message": {"type": "string", "example": "Token válido."},
+                    "concessao": {
+                        "type": "string",
+                        "description": "Autorização assinada para redefinir-senha.",
+                        "example": "eyJ1IjoxLCJzIjoiOWY4YSJ9:1rS2xY:Qb7...",
+                    },
                 },
             },
             (400, "application/json"): {
@@ -574,7 +745,13 @@ class UserViewSet(
             },
         },
     )
-    @action(methods=["POST"], detail=False, url_path="verificar-token")
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="verificar-token",
+        throttle_classes=[IPRateThrottle, EmailRateThrottle],
+        throttle_scope="verificacao_token",
+    )
     def verificar_token(self, request):
         """Função que verifica e valida o token enviado ao e-mail do usuário"""
         token = request.data.get("token")
@@ -583,14 +760,12 @@ class UserViewSet(
                 {"error": "Token não informado."}, status=status.HTTP_400_BAD_REQUEST
             )
         try:
-            token_instance = (  # pylint: disable=W0612
-                models.EmailActivationToken.objects.get(
-                    token=token, expires_at__gt=timezone.now()
-                )
+            concessao = account_management_service.issue_password_reset_grant(token)
+            return Response(
+                {"message": "Token válido.", "concessao": concessao},
+                status=status.HTTP_200_OK,
             )
-            request.session["token_verification"] = True
-            return Response({"message": "Token válido."}, status=status.HTTP_200_OK)
-        except models.EmailActivationToken.DoesNotExist:
+        except errors.EmailConfirmationCodeInactive:
             return Response(
                 {"error": "Token inválido ou expirado."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -606,7 +781,11 @@ class UserViewSet(
             "application/json": {
                 "type": "object",
                 "properties": {
-                    "senha": {"type": "string", "example": "supersecurepassword1"}
+                    "concessao": {
+                        "type": "string",
+                        "example": "eyJ1IjoxLCJzIjoiOWY4YSJ9:1rS2xY:Qb7...",
+                    },
+                    "senha": {"type": "string", "example": "supersecurepassword1"},
                 },
             }
         },
@@ -628,28 +807,29 @@ class UserViewSet(
             },
         },
     )
-    @action(methods=["POST"], detail=False, url_path="redefinir-senha")
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="redefinir-senha",
+        throttle_classes=[IPRateThrottle, EmailRateThrottle],
+        throttle_scope="redefinicao_senha",
+    )
     def redefinir_senha(self, request):
-        """Redefine senha"""
-        if not request.session.get("token_verification", False):
+        """Redefine a senha com a autorização devolvida por verificar-token."""
+        concessao = request.data.get("concessao")
+        if not concessao:
             return Response(
                 {"error": "Verificação de token não realizada."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        email = request.session.get("email")
-        if not email:
-            return Response(
-                {"error": "Email não encontrado."}, status=status.HTTP_400_BAD_REQUEST
-            )
         try:
-            validate_password(request.data)
-            user = models.CustomUser.objects.get(email=email)
-            user.set_password(request.data["senha"])
-            user.save()
+            validate_password({"senha": request.data.get("senha")})
+            account_management_service.reset_password(concessao, request.data["senha"])
 
             return Response(
                 {"message": "Senha redefinida com sucesso."}, status=status.HTTP_200_OK
             )
         except ValidationError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except errors.PasswordResetGrantInvalid as e:
+            return Response({"error": e.message}, status=status.HTTP_400_BAD_REQUEST)
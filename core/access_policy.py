@@ -1,10 +1,10 @@
 """Este módulo contem as definições de aplicativo 'core'."""
-from rest_access_policy import AccessPolicy
+from accounts.access_policy import CargosAccessPolicy
+from core import membership, models
+from utils import identity_map
 
-from core import models
 
-
-class CursoAccessPolicy(AccessPolicy):
+class CursoAccessPolicy(CargosAccessPolicy):
     """Define o controle de acesso para CursoViewSet"""
 
     statements = [
@@ -21,7 +21,7 @@ class CursoAccessPolicy(AccessPolicy):
     ]
 
 
-class DisciplinaAccessPolicy(AccessPolicy):
+class DisciplinaAccessPolicy(CargosAccessPolicy):
     """Define o controle de acesso para DisciplinaViewSet"""
 
     statements = [
@@ -43,12 +43,12 @@ class DisciplinaAccessPolicy(AccessPolicy):
     ]
 
 
-class AgendamentoAccessPolicy(AccessPolicy):
+class AgendamentoAccessPolicy(CargosAccessPolicy):
     """Controle de acesso para as views de agendamentos."""
 
     statements = [
         {
-            "action": ["list", "retrieve", "create"],
+            "action": ["list", "retrieve", "create", "agenda", "renovar_agenda"],
             "principal": "authenticated",
             "effect": "allow",
         },
@@ -63,11 +63,15 @@ class AgendamentoAccessPolicy(AccessPolicy):
     def is_solicitante(self, request, view, action):  # pylint: disable=unused-argument
         """Verifica se o usuário é o solicitante do agendamento."""
         agendamento = view.get_object()
-        return request.user == agendamento.solicitante
+        return request.user.pk == agendamento.solicitante_id
 
     def is_monitor(self, request, view, action):  # pylint: disable=unused-argument
-        """Verifica se o usuário atual é monitor da disciplina."""
-        return models.Disciplinas.objects.filter(monitores=request.user).exists()
+        """Verifica se o usuário atual é monitor da disciplina do agendamento."""
+        agendamento = view.get_object()
+        return (
+            agendamento.disciplina_id
+            in membership.get_memberships(request.user.pk)["monitor"]
+        )
 
     @classmethod
     def scope_queryset(cls, request, qs):
@@ -75,33 +79,32 @@ class AgendamentoAccessPolicy(AccessPolicy):
 
         - Alunos tem acesso apenas a seus agendamentos.
         - Monitores tem acesso a todos os agendamentos das disciplinas que são monitores.
-        - Professores podem ver todos os agendamentos de suas disciplinas"""
-
-        if (
-            request.user.groups.filter(name__in=["monitor"]).exists()
-            and models.Disciplinas.objects.filter(monitores=request.user).exists()
-        ):
-
-            user = request.user
-            disciplinas = models.Disciplinas.objects.filter(monitores=user)
-            new_qs = models.Agendamento.objects.filter(disciplina__id__in=disciplinas)
-
-            return new_qs
-        if request.user.groups.filter(name__in=["professor"]).exists():
-            user = request.user
-            disciplinas = models.Disciplinas.objects.filter(professores=user)
-            new_qs = models.Agendamento.objects.filter(disciplina__id__in=disciplinas)
+        - Professores podem ver todos os agendamentos de suas disciplinas
 
-            return qs
+        As disciplinas vêm do cache de core.membership, de modo que o filtro
+        não precisa de subconsultas.
+        """
+        user = request.user
+        if user.tem_cargo("monitor", "professor"):
+            disciplinas = membership.scoped_disciplinas(user)
+            if disciplinas:
+                return qs.filter(disciplina_id__in=sorted(disciplinas))
+            if user.tem_cargo("professor"):
+                return qs.none()
 
-        return qs.filter(solicitante=request.user)
+        return qs.filter(solicitante=user)
 
 
-class MonitoriaAccessPolicy(AccessPolicy):
+class MonitoriaAccessPolicy(CargosAccessPolicy):
     """Montiria Access Policy"""
 
     statements = [
         {"action": ["list", "retrieve"], "principal": "*", "effect": "allow"},
+        {
+            "action": ["disponibilidade"],
+            "principal": "authenticated",
+            "effect": "allow",
+        },
         {
             "action": ["create", "update", "partial_update", "destroy"],
             "principal": "authenticated",
@@ -118,13 +121,15 @@ class MonitoriaAccessPolicy(AccessPolicy):
             monitor_id = request.data.get("monitor")
         else:
             obj = view.get_object()
-            disciplina_id = obj.disciplina.id
-            monitor_id = obj.monitor.id
+            disciplina_id = obj.disciplina_id
+            monitor_id = obj.monitor_id
 
         if not disciplina_id:
             return False
 
-        disciplina = models.Disciplinas.objects.get(id=disciplina_id)
+        disciplina = identity_map.get_object(
+            request, models.Disciplinas.objects, disciplina_id
+        )
         return (
             disciplina.professores.filter(id=user.id).exists() or user.id == monitor_id
         )
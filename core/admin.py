@@ -16,6 +16,15 @@ class AgendamentoAdmin(admin.ModelAdmin):
     mostrar_agendamento.short_description = "Agendamento"
 
 
+@admin.register(models.EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    """Acompanhamento da fila de saída de e-mails."""
+
+    list_display = ("assunto", "criado_em", "tentativas", "enviado_em")
+    list_filter = ("enviado_em",)
+    readonly_fields = ("criado_em",)
+
+
 admin.site.register(models.Curso)
 admin.site.register(models.Disciplinas)
 admin.site.register(models.Monitoria)
@@ -7,3 +7,13 @@ class CoreConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel, unused-import
+        from utils import conditional
+
+        # Conecta os sinais que versionam as respostas com ETag/Last-Modified.
+        conditional.conectar_sinais()
+
+        # Invalida os caches de vínculos, horários livres e agendas.
+        from core import availability, calendar_feed, membership  # noqa: F401
@@ -0,0 +1,266 @@
+"""Horários livres para agendamento em uma disciplina.
+
+Cada ``Monitoria`` da disciplina é uma janela semanal (dia da semana, hora de
+início e de fim) de um monitor, que é repetida em cada dia do período
+consultado. Dessas janelas são subtraídos os intervalos já ocupados por
+agendamentos não cancelados da disciplina, do monitor da janela e do seu
+local (as mesmas regras de conflito de core.booking_service).
+
+As janelas e os intervalos ocupados são ordenados e percorridos uma única vez
+(união e subtração por varredura com dois ponteiros), em O(n log n) para n
+janelas e agendamentos: um semestre inteiro é resolvido em milissegundos,
+com duas consultas ao banco.
+
+Os resultados ficam no cache compartilhado, versionados pelas gerações da
+disciplina (horários de monitoria e agendamentos dela) e dos monitores e
+locais envolvidos (agendamentos em outras disciplinas), trocadas pelos
+sinais deste módulo.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import DURACAO_MAXIMA, DURACAO_MINIMA, Agendamento, Monitoria
+from utils import cache as cache_utils
+
+PREFIXO = "disponibilidade"
+
+
+def namespace_disciplina(disciplina_id) -> str:
+    """Namespace dos horários de monitoria e agendamentos de uma disciplina."""
+    return f"{PREFIXO}:disciplina:{disciplina_id}"
+
+
+def namespace_monitor(monitor_id) -> str:
+    """Namespace dos agendamentos atendidos por um monitor."""
+    return f"{PREFIXO}:monitor:{monitor_id}"
+
+
+def namespace_local(local: str) -> str:
+    """Namespace dos agendamentos em um local."""
+    return f"{PREFIXO}:local:{hashlib.sha256(local.encode()).hexdigest()[:16]}"
+
+
+def unir(intervalos) -> list:
+    """Une intervalos [inicio, fim) sobrepostos ou adjacentes, em ordem."""
+    unidos = []
+    for inicio, fim in sorted(intervalos):
+        if unidos and inicio <= unidos[-1][1]:
+            if fim > unidos[-1][1]:
+                unidos[-1][1] = fim
+        else:
+            unidos.append([inicio, fim])
+    return [(inicio, fim) for inicio, fim in unidos]
+
+
+def subtrair(janelas, ocupados) -> list:
+    """Subtrai de cada janela os intervalos ocupados.
+
+    Args:
+        janelas: intervalos [inicio, fim) ordenados e sem sobreposição.
+        ocupados: intervalos ordenados e unidos (ver ``unir``).
+
+    Returns:
+        Os trechos livres das janelas, em ordem.
+    """
+    livres = []
+    i = 0
+    for inicio, fim in janelas:
+        # Ocupações que terminam antes da janela não afetam as próximas.
+        while i < len(ocupados) and ocupados[i][1] <= inicio:
+            i += 1
+        atual = inicio
+        j = i
+        while j < len(ocupados) and ocupados[j][0] < fim:
+            if ocupados[j][0] > atual:
+                livres.append((atual, ocupados[j][0]))
+            atual = max(atual, ocupados[j][1])
+            j += 1
+        if atual < fim:
+            livres.append((atual, fim))
+    return livres
+
+
+def _expandir(monitorias, de, ate) -> dict:
+    """Repete as janelas semanais em cada dia de [de, ate].
+
+    Returns:
+        Dicionário (monitor_id, local) -> janelas ordenadas e unidas.
+    """
+    fuso = timezone.get_current_timezone()
+    por_dia = {}
+    for monitoria in monitorias:
+        por_dia.setdefault(int(monitoria["dia_semana"]), []).append(monitoria)
+
+    janelas = {}
+    dia = de
+    while dia <= ate:
+        for monitoria in por_dia.get(dia.weekday(), ()):
+            local = (monitoria["local"] or "").strip() or None
+            chave = (monitoria["monitor_id"], local)
+            janelas.setdefault(chave, []).append(
+                (
+                    datetime.combine(dia, monitoria["hora_inicio"], tzinfo=fuso),
+                    datetime.combine(dia, monitoria["hora_fim"], tzinfo=fuso),
+                )
+            )
+        dia += timedelta(days=1)
+    return {chave: unir(intervalos) for chave, intervalos in janelas.items()}
+
+
+def _monitorias(disciplina_id) -> list:
+    return list(
+        Monitoria.objects.filter(
+            disciplina_id=disciplina_id,
+            dia_semana__isnull=False,
+            # Janelas vazias, invertidas ou incompletas são ignoradas.
+            hora_inicio__lt=F("hora_fim"),
+        ).values("monitor_id", "dia_semana", "hora_inicio", "hora_fim", "local")
+    )
+
+
+def calcular_disponibilidade(disciplina_id, de, ate, monitorias=None) -> list:
+    """Calcula os horários livres de uma disciplina entre as datas ``de`` e ``ate``.
+
+    Returns:
+        Lista de horários livres, ordenados por início, com ``inicio``,
+        ``fim``, ``monitor`` e ``local``. Trechos menores que a duração mínima
+        de um agendamento ficam de fora.
+    """
+    if monitorias is None:
+        monitorias = _monitorias(disciplina_id)
+    janelas = _expandir(monitorias, de, ate)
+    if not janelas:
+        return []
+
+    fuso = timezone.get_current_timezone()
+    inicio = datetime.combine(de, time.min, tzinfo=fuso)
+    fim = datetime.combine(ate + timedelta(days=1), time.min, tzinfo=fuso)
+    monitores = {monitor for monitor, _ in janelas if monitor is not None}
+    locais = {local for _, local in janelas if local}
+    recursos = Q(disciplina_id=disciplina_id)
+    if monitores:
+        recursos |= Q(monitor_id__in=monitores)
+    if locais:
+        recursos |= Q(local__in=locais)
+    agendamentos = (
+        Agendamento.objects.filter(recursos)
+        .exclude(status="cancelado")
+        .filter(data__gt=inicio - DURACAO_MAXIMA, data__lt=fim, fim__gt=inicio)
+        .values_list("disciplina_id", "monitor_id", "local", "data", "fim")
+    )
+
+    da_disciplina = []
+    do_monitor = {}
+    no_local = {}
+    for outra_disciplina, monitor, local, data, termino in agendamentos:
+        intervalo = (data, termino)
+        if outra_disciplina == disciplina_id:
+            da_disciplina.append(intervalo)
+        if monitor in monitores:
+            do_monitor.setdefault(monitor, []).append(intervalo)
+        if local in locais:
+            no_local.setdefault(local, []).append(intervalo)
+
+    horarios = []
+    for (monitor, local), intervalos in janelas.items():
+        ocupados = unir(
+            da_disciplina + do_monitor.get(monitor, []) + no_local.get(local, [])
+        )
+        for livre_inicio, livre_fim in subtrair(intervalos, ocupados):
+            if livre_fim - livre_inicio >= DURACAO_MINIMA:
+                horarios.append(
+                    {
+                        "inicio": livre_inicio,
+                        "fim": livre_fim,
+                        "monitor": monitor,
+                        "local": local,
+                    }
+                )
+    horarios.sort(key=lambda horario: (horario["inicio"], horario["monitor"] or 0))
+    return horarios
+
+
+def get_availability(disciplina_id: int, de, ate) -> list:
+    """Horários livres a partir de agora, servidos do cache quando possível.
+
+    As janelas de monitoria da disciplina são guardadas na geração da
+    disciplina; os horários livres, nas gerações da disciplina e dos
+    monitores e locais das janelas.
+    """
+    (geracao,) = cache_utils.get_generations(namespace_disciplina(disciplina_id))
+    chave_janelas = f"{PREFIXO}:janelas:{geracao}:{disciplina_id}"
+    monitorias = cache.get(chave_janelas)
+    if monitorias is None:
+        monitorias = _monitorias(disciplina_id)
+        cache.set(
+            chave_janelas, monitorias, timeout=settings.DISPONIBILIDADE_CACHE_TIMEOUT
+        )
+
+    namespaces = [namespace_disciplina(disciplina_id)]
+    namespaces += sorted(
+        {namespace_monitor(m["monitor_id"]) for m in monitorias if m["monitor_id"]}
+    )
+    namespaces += sorted(
+        {
+            namespace_local(m["local"].strip())
+            for m in monitorias
+            if (m["local"] or "").strip()
+        }
+    )
+    geracoes = cache_utils.get_generations(*namespaces)
+    assinatura = repr((disciplina_id, de, ate, geracoes)).encode()
+    chave = f"{PREFIXO}:horarios:{hashlib.sha256(assinatura).hexdigest()}"
+    horarios = cache.get(chave)
+    if horarios is None:
+        horarios = calcular_disponibilidade(disciplina_id, de, ate, monitorias)
+        cache.set(chave, horarios, timeout=settings.DISPONIBILIDADE_CACHE_TIMEOUT)
+
+    # O resultado em cache não depende do horário atual: o passado é cortado
+    # na leitura.
+    agora = timezone.now()
+    futuros = []
+    for horario in horarios:
+        if horario["fim"] - max(horario["inicio"], agora) >= DURACAO_MINIMA:
+            futuros.append({**horario, "inicio": max(horario["inicio"], agora)})
+    return futuros
+
+
+def _recursos(valores: dict, agendamento: bool) -> tuple:
+    if not agendamento:
+        # Horários de monitoria só entram nas janelas da disciplina.
+        return (valores.get("disciplina_id"), None, None)
+    return (
+        valores.get("disciplina_id"),
+        valores.get("monitor_id"),
+        valores.get("local"),
+    )
+
+
+@receiver(post_save, sender=Agendamento)
+@receiver(post_delete, sender=Agendamento)
+@receiver(post_save, sender=Monitoria)
+@receiver(post_delete, sender=Monitoria)
+def _horarios_alterados(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalida a disponibilidade dos recursos atuais e dos anteriores, como
+    carregados do banco, caso a edição os troque."""
+    agendamento = sender is Agendamento
+    namespaces = set()
+    for disciplina_id, monitor_id, local in (
+        _recursos(instance.__dict__, agendamento),
+        _recursos(instance.valores_carregados(), agendamento),
+    ):
+        if disciplina_id is not None:
+            namespaces.add(namespace_disciplina(disciplina_id))
+        if monitor_id is not None:
+            namespaces.add(namespace_monitor(monitor_id))
+        if local:
+            namespaces.add(namespace_local(local))
+    for namespace in namespaces:
+        cache_utils.bump_generation(namespace)
@@ -0,0 +1,107 @@
+"""Verificação de conflitos de horário entre agendamentos.
+
+Um agendamento ocupa o intervalo [data, fim) da sua disciplina, do monitor
+que o atende e do local, quando informados. Agendamentos cancelados não
+ocupam nada.
+
+A verificação é feita na aplicação, em todos os bancos, dentro de uma
+transação que trava as linhas da disciplina e do monitor, o que serializa
+agendamentos concorrentes dos mesmos recursos. Como nenhum agendamento dura
+mais que ``DURACAO_MAXIMA``, a consulta percorre apenas uma faixa limitada
+dos índices (recurso, data). No PostgreSQL, restrições de exclusão sobre
+``tstzrange(data, fim)`` (criadas pela migração 0012) garantem a mesma regra
+no próprio banco, inclusive para o local, que não tem linha a travar.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import CustomUser
+from core.models import DURACAO_MAXIMA, Agendamento, Disciplinas
+
+
+class ConflitoAgendamento(Exception):
+    """O horário do agendamento se sobrepõe a outro do mesmo recurso."""
+
+    message = "Já existe um agendamento nesse horário"
+    http_error_code = 409
+
+    def __init__(self, recursos):
+        super().__init__(recursos)
+        self.recursos = recursos
+
+
+def find_conflicts(
+    inicio, fim, disciplina_id, monitor_id=None, local=None, excluir=None
+) -> list:
+    """Retorna os recursos ocupados no intervalo [inicio, fim).
+
+    Returns:
+        Lista com ``"disciplina"``, ``"monitor"`` e/ou ``"local"``.
+    """
+    recursos = Q(disciplina_id=disciplina_id)
+    if monitor_id is not None:
+        recursos |= Q(monitor_id=monitor_id)
+    if local:
+        recursos |= Q(local=local)
+
+    ocupados = (
+        Agendamento.objects.filter(recursos).exclude(status="cancelado")
+        # data > inicio - DURACAO_MAXIMA limita a faixa percorrida no índice.
+        .filter(data__gt=inicio - DURACAO_MAXIMA, data__lt=fim, fim__gt=inicio)
+    )
+    if excluir is not None:
+        ocupados = ocupados.exclude(pk=excluir)
+
+    conflitos = set()
+    for outro in ocupados.values("disciplina_id", "monitor_id", "local"):
+        if outro["disciplina_id"] == disciplina_id:
+            conflitos.add("disciplina")
+        if monitor_id is not None and outro["monitor_id"] == monitor_id:
+            conflitos.add("monitor")
+        if local and outro["local"] == local:
+            conflitos.add("local")
+    return [
+        recurso
+        for recurso in ("disciplina", "monitor", "local")
+        if recurso in conflitos
+    ]
+
+
+def save_agendamento(agendamento: Agendamento, **kwargs) -> Agendamento:
+    """Valida o intervalo do agendamento e o salva se não houver conflitos.
+
+    Raises:
+        ValidationError: a duração está fora dos limites ou algum valor é
+            inválido.
+        ConflitoAgendamento: o intervalo se sobrepõe a outro agendamento.
+    """
+    agendamento.local = (agendamento.local or "").strip() or None
+    # Converte os valores recebidos da requisição (datas, ids) antes da busca.
+    agendamento.full_clean(exclude=["solicitante", "fim", "assunto", "descricao"])
+    with transaction.atomic():
+        if agendamento.status != "cancelado":
+            # Agendamentos concorrentes da mesma disciplina ou do mesmo monitor
+            # esperam aqui; a ordem fixa das travas evita deadlocks.
+            list(
+                Disciplinas.objects.select_for_update()
+                .filter(pk=agendamento.disciplina_id)
+                .values_list("pk")
+            )
+            if agendamento.monitor_id is not None:
+                list(
+                    CustomUser.objects.select_for_update()
+                    .filter(pk=agendamento.monitor_id)
+                    .values_list("pk")
+                )
+            conflitos = find_conflicts(
+                agendamento.data,
+                agendamento.data + agendamento.duracao,
+                agendamento.disciplina_id,
+                agendamento.monitor_id,
+                agendamento.local,
+                excluir=agendamento.pk,
+            )
+            if conflitos:
+                raise ConflitoAgendamento(conflitos)
+        agendamento.save(**kwargs)
+    return agendamento
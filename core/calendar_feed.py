@@ -0,0 +1,368 @@
+"""Agendas iCalendar (.ics) para assinatura em aplicativos de calendário.
+
+Há uma agenda por usuário (os horários de monitoria em que é monitor ou
+professor e os agendamentos em que é solicitante ou monitor) e uma por
+disciplina (os horários de monitoria e os horários já reservados, sem dados
+dos alunos). Os horários de monitoria viram eventos semanais (RRULE); os
+agendamentos, eventos únicos.
+
+Aplicativos de calendário não enviam o token da API: cada agenda é protegida
+por uma chave, que faz parte da URL de assinatura, derivada da SECRET_KEY e de
+um segredo do usuário (``CustomUser.agenda_segredo``). Trocar o segredo
+invalida as URLs já distribuídas. A agenda de uma disciplina é assinada por
+um usuário vinculado a ela (monitor, professor ou aluno de um curso que a
+oferece) e deixa de ser servida se o vínculo acabar.
+
+Cada agenda é gerada uma vez e guardada no cache compartilhado, versionada
+por gerações (ver utils.cache) trocadas pelos sinais deste módulo quando os
+horários, agendamentos ou disciplinas envolvidos mudam. O ETag é calculado a
+partir das gerações, sem gerar a agenda, e permite responder 304.
+"""
+import hashlib
+import secrets
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from accounts.models import CustomUser
+from core import membership
+from core.models import Agendamento, Disciplinas, Monitoria
+from utils import cache as cache_utils
+
+PREFIXO = "agenda"
+PRODID = "-//Ambiente de Monitoria Online//Agenda//PT-BR"
+DOMINIO_UID = "monitorias"
+# Primeira segunda-feira de 2024: início fixo das recorrências semanais, para
+# que a agenda gerada não dependa do dia em que foi gerada.
+ANCORA_RECORRENCIAS = date(2024, 1, 1)
+DIAS_ICAL = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+# Agendamentos mais antigos que isso ficam de fora das agendas.
+HISTORICO = timedelta(days=30)
+
+
+def namespace_usuario(user_id) -> str:
+    """Namespace da agenda de um usuário."""
+    return f"{PREFIXO}:usuario:{user_id}"
+
+
+def namespace_disciplina(disciplina_id) -> str:
+    """Namespace da agenda de uma disciplina."""
+    return f"{PREFIXO}:disciplina:{disciplina_id}"
+
+
+# Nomes das disciplinas aparecem em todas as agendas.
+NAMESPACE_DISCIPLINAS = f"{PREFIXO}:disciplinas"
+
+
+def _chave_segredo(user_id) -> str:
+    return f"{PREFIXO}:segredo:{user_id}"
+
+
+def segredo(user_id, criar: bool = False) -> str:
+    """Segredo das agendas do usuário ("" se não existir).
+
+    Args:
+        criar: gera o segredo se o usuário ainda não tiver um.
+    """
+    chave_cache = _chave_segredo(user_id)
+    valor = cache.get(chave_cache)
+    if valor is None:
+        valor = (
+            CustomUser.objects.filter(pk=user_id)
+            .values_list("agenda_segredo", flat=True)
+            .first()
+        )
+        if valor is None:
+            return ""
+        cache.set(chave_cache, valor, timeout=settings.AGENDA_CACHE_TIMEOUT)
+    if not valor and criar:
+        return renovar_segredo(user_id)
+    return valor
+
+
+def renovar_segredo(user_id) -> str:
+    """Troca o segredo do usuário, invalidando as URLs das suas agendas."""
+    valor = secrets.token_hex(16)
+    CustomUser.objects.filter(pk=user_id).update(agenda_segredo=valor)
+    cache.delete(_chave_segredo(user_id))
+    return valor
+
+
+def chave(namespace: str, user_id, segredo_usuario: str) -> str:
+    """Chave que autoriza o usuário a ler a agenda do namespace."""
+    return salted_hmac(
+        "core.agenda", f"{namespace}:{user_id}:{segredo_usuario}"
+    ).hexdigest()[:32]
+
+
+def verificar_chave(namespace: str, user_id, valor: str) -> bool:
+    """Verifica a chave da URL de uma agenda assinada pelo usuário."""
+    segredo_usuario = segredo(user_id)
+    if not segredo_usuario:
+        return False
+    return constant_time_compare(valor, chave(namespace, user_id, segredo_usuario))
+
+
+def pode_assinar_disciplina(user_id, disciplina_id) -> bool:
+    """Verifica se o usuário é monitor, professor ou aluno da disciplina."""
+    vinculos = membership.get_memberships(user_id)
+    if disciplina_id in vinculos["monitor"] or disciplina_id in vinculos["professor"]:
+        return True
+    return Disciplinas.objects.filter(
+        pk=disciplina_id, cursos__perfil__usuario_id=user_id
+    ).exists()
+
+
+def _escapar(texto) -> str:
+    return (
+        str(texto)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _dobrar(linha: str) -> str:
+    """Quebra linhas maiores que 75 octetos, como exige a RFC 5545."""
+    codificada = linha.encode()
+    if len(codificada) <= 75:
+        return linha
+    partes = []
+    inicio = 0
+    limite = 75
+    while inicio < len(codificada):
+        fim = min(inicio + limite, len(codificada))
+        # Não corta no meio de um caractere UTF-8.
+        while fim < len(codificada) and (codificada[fim] & 0xC0) == 0x80:
+            fim -= 1
+        partes.append(codificada[inicio:fim].decode())
+        inicio = fim
+        limite = 74  # As continuações começam com um espaço.
+    return "\r\n ".join(partes)
+
+
+def _utc(momento: datetime) -> str:
+    return momento.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fuso() -> list:
+    """VTIMEZONE do fuso do projeto, usado nas recorrências semanais.
+
+    O deslocamento é o atual do fuso; os fusos brasileiros não têm horário
+    de verão desde 2019.
+    """
+    nome = settings.TIME_ZONE
+    deslocamento = timezone.now().astimezone(timezone.get_current_timezone())
+    segundos = int(deslocamento.utcoffset().total_seconds())
+    sinal = "+" if segundos >= 0 else "-"
+    horas, minutos = divmod(abs(segundos) // 60, 60)
+    offset = f"{sinal}{horas:02d}{minutos:02d}"
+    return [
+        "BEGIN:VTIMEZONE",
+        f"TZID:{nome}",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        f"TZOFFSETFROM:{offset}",
+        f"TZOFFSETTO:{offset}",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+    ]
+
+
+def _evento_monitoria(monitoria: dict, disciplinas: dict, carimbo: str) -> list:
+    dia = int(monitoria["dia_semana"])
+    primeiro = ANCORA_RECORRENCIAS + timedelta(days=dia)
+    tzid = settings.TIME_ZONE
+    linhas = [
+        "BEGIN:VEVENT",
+        f"UID:monitoria-{monitoria['id']}@{DOMINIO_UID}",
+        f"DTSTAMP:{carimbo}",
+        f"DTSTART;TZID={tzid}:"
+        f"{datetime.combine(primeiro, monitoria['hora_inicio']):%Y%m%dT%H%M%S}",
+        f"DTEND;TZID={tzid}:"
+        f"{datetime.combine(primeiro, monitoria['hora_fim']):%Y%m%dT%H%M%S}",
+        f"RRULE:FREQ=WEEKLY;BYDAY={DIAS_ICAL[dia]}",
+        "SUMMARY:"
+        + _escapar(f"Monitoria - {disciplinas.get(monitoria['disciplina_id'], '')}"),
+    ]
+    if monitoria["local"]:
+        linhas.append(f"LOCATION:{_escapar(monitoria['local'])}")
+    linhas.append("END:VEVENT")
+    return linhas
+
+
+def _evento_agendamento(
+    agendamento: dict, disciplinas: dict, carimbo: str, detalhes: bool
+) -> list:
+    disciplina = disciplinas.get(agendamento["disciplina_id"], "")
+    if detalhes:
+        resumo = f"Atendimento - {disciplina}: {agendamento['assunto']}"
+    else:
+        resumo = f"Atendimento reservado - {disciplina}"
+    linhas = [
+        "BEGIN:VEVENT",
+        f"UID:agendamento-{agendamento['id']}@{DOMINIO_UID}",
+        f"DTSTAMP:{carimbo}",
+        f"DTSTART:{_utc(agendamento['data'])}",
+        f"DTEND:{_utc(agendamento['fim'])}",
+        f"SUMMARY:{_escapar(resumo)}",
+        "STATUS:"
+        + ("CONFIRMED" if agendamento["status"] == "confirmado" else "TENTATIVE"),
+    ]
+    if detalhes and agendamento["descricao"]:
+        linhas.append(f"DESCRIPTION:{_escapar(agendamento['descricao'])}")
+    if agendamento["local"]:
+        linhas.append(f"LOCATION:{_escapar(agendamento['local'])}")
+    linhas.append("END:VEVENT")
+    return linhas
+
+
+def gerar_agenda(nome: str, monitorias, agendamentos, detalhes: bool) -> bytes:
+    """Monta o arquivo iCalendar com os horários e agendamentos informados."""
+    monitorias = list(monitorias)
+    agendamentos = list(agendamentos)
+    ids = {m["disciplina_id"] for m in monitorias} | {
+        a["disciplina_id"] for a in agendamentos
+    }
+    disciplinas = dict(Disciplinas.objects.filter(pk__in=ids).values_list("id", "nome"))
+    carimbo = _utc(timezone.now())
+
+    linhas = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escapar(nome)}",
+        f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+    ]
+    if monitorias:
+        linhas += _fuso()
+    for monitoria in monitorias:
+        linhas += _evento_monitoria(monitoria, disciplinas, carimbo)
+    for agendamento in agendamentos:
+        linhas += _evento_agendamento(agendamento, disciplinas, carimbo, detalhes)
+    linhas.append("END:VCALENDAR")
+    return ("\r\n".join(_dobrar(linha) for linha in linhas) + "\r\n").encode()
+
+
+def _monitorias(filtro: Q):
+    return (
+        Monitoria.objects.filter(filtro)
+        .filter(dia_semana__isnull=False, hora_inicio__isnull=False)
+        .filter(hora_fim__isnull=False)
+        .order_by("id")
+        .values("id", "disciplina_id", "dia_semana", "hora_inicio", "hora_fim", "local")
+    )
+
+
+def _agendamentos(filtro: Q):
+    return (
+        Agendamento.objects.filter(filtro)
+        .exclude(status="cancelado")
+        .filter(data__gte=timezone.now() - HISTORICO)
+        .order_by("data", "id")
+        .values(
+            "id",
+            "disciplina_id",
+            "data",
+            "fim",
+            "status",
+            "local",
+            "assunto",
+            "descricao",
+        )
+    )
+
+
+def agenda_usuario(user_id) -> bytes:
+    """Gera a agenda de um usuário."""
+    return gerar_agenda(
+        "Monitorias",
+        _monitorias(Q(monitor_id=user_id) | Q(professor_id=user_id)),
+        _agendamentos(Q(solicitante_id=user_id) | Q(monitor_id=user_id)),
+        detalhes=True,
+    )
+
+
+def agenda_disciplina(disciplina_id) -> bytes:
+    """Gera a agenda pública de uma disciplina, sem os dados dos alunos."""
+    nome = (
+        Disciplinas.objects.filter(pk=disciplina_id)
+        .values_list("nome", flat=True)
+        .first()
+    )
+    return gerar_agenda(
+        f"Monitorias - {nome or disciplina_id}",
+        _monitorias(Q(disciplina_id=disciplina_id)),
+        _agendamentos(Q(disciplina_id=disciplina_id)),
+        detalhes=False,
+    )
+
+
+def etag(namespace: str) -> str:
+    """ETag da versão atual de uma agenda, sem gerá-la."""
+    geracoes = cache_utils.get_generations(namespace, NAMESPACE_DISCIPLINAS)
+    assinatura = repr((namespace, geracoes)).encode()
+    return hashlib.sha256(assinatura).hexdigest()
+
+
+def obter_agenda(namespace: str, gerar) -> tuple:
+    """Retorna (etag, conteúdo) de uma agenda, gerando-a só se mudou.
+
+    Args:
+        namespace: namespace da agenda (``namespace_usuario`` ou
+            ``namespace_disciplina``).
+        gerar: função sem argumentos que gera a agenda.
+    """
+    versao = etag(namespace)
+    chave_cache = f"{PREFIXO}:ics:{versao}"
+    conteudo = cache.get(chave_cache)
+    if conteudo is None:
+        conteudo = gerar()
+        cache.set(chave_cache, conteudo, timeout=settings.AGENDA_CACHE_TIMEOUT)
+    return versao, conteudo
+
+
+def _namespaces(valores: dict, agendamento: bool) -> set:
+    namespaces = set()
+    if valores.get("disciplina_id") is not None:
+        namespaces.add(namespace_disciplina(valores["disciplina_id"]))
+    if agendamento:
+        campos = ("solicitante_id", "monitor_id")
+    else:
+        campos = ("monitor_id", "professor_id")
+    for campo in campos:
+        if valores.get(campo) is not None:
+            namespaces.add(namespace_usuario(valores[campo]))
+    return namespaces
+
+
+@receiver(post_save, sender=Agendamento)
+@receiver(post_delete, sender=Agendamento)
+@receiver(post_save, sender=Monitoria)
+@receiver(post_delete, sender=Monitoria)
+def _agenda_alterada(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """Invalida as agendas dos usuários e disciplinas atuais e anteriores."""
+    agendamento = sender is Agendamento
+    namespaces = _namespaces(instance.__dict__, agendamento) | _namespaces(
+        instance.valores_carregados(), agendamento
+    )
+    for namespace in namespaces:
+        cache_utils.bump_generation(namespace)
+
+
+@receiver(post_save, sender=Disciplinas)
+@receiver(post_delete, sender=Disciplinas)
+def _disciplina_alterada(sender, **kwargs):  # pylint: disable=unused-argument
+    # O nome da disciplina aparece nos eventos de todas as agendas.
+    cache_utils.bump_generation(NAMESPACE_DISCIPLINAS)
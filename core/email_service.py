@@ -0,0 +1,156 @@
+"""Fila de saída (outbox) dos e-mails da aplicação.
+
+As views e serviços apenas gravam os e-mails com ``enfileirar_email``, na
+mesma transação da operação que os originou. O envio é feito pelo comando
+``enviar_emails``, em um processo separado, reaproveitando uma conexão SMTP
+por lote e repetindo as falhas com espera exponencial.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import EmailPendente
+
+logger = logging.getLogger(__name__)
+
+MAX_TENTATIVAS = 8
+ESPERA_BASE = timedelta(seconds=30)
+ESPERA_MAXIMA = timedelta(hours=6)
+# Tempo que um lote fica reservado para o worker que o pegou; se ele não
+# registrar o resultado até lá, o lote volta para a fila.
+PRAZO_ENVIO = timedelta(minutes=10)
+
+
+def enfileirar_email(
+    assunto: str, corpo: str, destinatarios: list, remetente: str = None
+) -> EmailPendente:
+    """Grava um e-mail na fila de saída.
+
+    Deve ser chamada dentro da transação da operação que gera o e-mail: se ela
+    for desfeita, o e-mail também é.
+    """
+    return EmailPendente.objects.create(
+        assunto=assunto,
+        corpo=corpo,
+        remetente=remetente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+    )
+
+
+def enfileirar_emails(mensagens, remetente: str = None) -> list:
+    """Grava vários e-mails na fila de saída, em lotes de INSERTs.
+
+    Args:
+        mensagens: triplas (assunto, corpo, destinatarios).
+    """
+    remetente = remetente or settings.DEFAULT_FROM_EMAIL
+    return EmailPendente.objects.bulk_create(
+        [
+            EmailPendente(
+                assunto=assunto,
+                corpo=corpo,
+                remetente=remetente,
+                destinatarios=list(destinatarios),
+            )
+            for assunto, corpo, destinatarios in mensagens
+        ],
+        batch_size=500,
+    )
+
+
+def proxima_espera(tentativas: int) -> timedelta:
+    """Espera antes da próxima tentativa, dobrando a cada falha."""
+    return min(ESPERA_BASE * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+
+
+def enviar_pendentes(tamanho_lote: int = 50, connection=None) -> tuple:
+    """Envia um lote de e-mails pendentes.
+
+    O lote é reservado em uma transação curta (``SKIP LOCKED``), que adia
+    ``proxima_tentativa`` por ``PRAZO_ENVIO``: assim vários workers podem rodar
+    ao mesmo tempo sem enviar o mesmo e-mail duas vezes, e um worker que morra
+    no meio do envio devolve o lote à fila quando o prazo vence. O envio, por
+    uma única conexão SMTP, acontece fora de qualquer transação, e o resultado
+    é gravado em uma segunda transação curta.
+
+    Returns:
+        Par (enviados, falhas) do lote.
+    """
+    lote = _reservar_lote(tamanho_lote)
+    if not lote:
+        return 0, 0
+
+    enviados = []
+    falhas = []
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as exc:  # pylint: disable=broad-except
+        # Sem conexão, todo o lote é reagendado.
+        logger.warning("Falha ao conectar ao servidor de e-mail: %s", exc)
+        falhas = [(email, exc) for email in lote]
+    else:
+        try:
+            for email in lote:
+                mensagem = EmailMessage(
+                    email.assunto,
+                    email.corpo,
+                    email.remetente,
+                    email.destinatarios,
+                    connection=connection,
+                )
+                try:
+                    connection.send_messages([mensagem])
+                except Exception as exc:  # pylint: disable=broad-except
+                    falhas.append((email, exc))
+                else:
+                    enviados.append(email)
+        finally:
+            connection.close()
+
+    _registrar_resultado(enviados, falhas)
+    return len(enviados), len(falhas)
+
+
+def _reservar_lote(tamanho_lote: int) -> list:
+    agora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            EmailPendente.objects.select_for_update(skip_locked=True)
+            .filter(
+                enviado_em__isnull=True,
+                proxima_tentativa__lte=agora,
+                tentativas__lt=MAX_TENTATIVAS,
+            )
+            .order_by("proxima_tentativa", "id")[:tamanho_lote]
+        )
+        EmailPendente.objects.filter(pk__in=[email.pk for email in lote]).update(
+            proxima_tentativa=agora + PRAZO_ENVIO
+        )
+    return lote
+
+
+def _registrar_resultado(enviados: list, falhas: list) -> None:
+    agora = timezone.now()
+    for email in enviados:
+        email.enviado_em = agora
+    for email, exc in falhas:
+        email.tentativas += 1
+        email.ultimo_erro = str(exc)
+        email.proxima_tentativa = agora + proxima_espera(email.tentativas)
+        if email.tentativas >= MAX_TENTATIVAS:
+            logger.error(
+                "E-mail %s descartado após %s tentativas.",
+                email.pk,
+                email.tentativas,
+            )
+    with transaction.atomic():
+        EmailPendente.objects.bulk_update(enviados, ["enviado_em"])
+        EmailPendente.objects.bulk_update(
+            [email for email, _ in falhas],
+            ["tentativas", "ultimo_erro", "proxima_tentativa"],
+        )
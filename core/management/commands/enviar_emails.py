@@ -0,0 +1,45 @@
+"""Comando que entrega os e-mails da fila de saída."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import email_service
+
+
+class Command(BaseCommand):
+    """Worker de envio dos e-mails pendentes."""
+
+    help = "Envia os e-mails pendentes da fila de saída."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=50,
+            help="Quantidade de e-mails enviados por conexão (padrão: 50).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Continua rodando e verificando a fila periodicamente.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5,
+            help="Segundos de espera quando a fila está vazia (padrão: 5).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            enviados, falhas = email_service.enviar_pendentes(options["lote"])
+            if enviados or falhas:
+                self.stdout.write(
+                    f"{enviados} e-mail(s) enviado(s), {falhas} falha(s)."
+                )
+            # Lote cheio: provavelmente há mais e-mails esperando.
+            if enviados + falhas >= options["lote"]:
+                continue
+            if not options["continuo"]:
+                return
+            time.sleep(options["intervalo"])
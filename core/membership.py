@@ -0,0 +1,77 @@
+"""Disciplinas em que cada usuário é monitor ou professor.
+
+Usado no controle de acesso aos agendamentos, que é verificado em toda
+listagem. Os vínculos de um usuário são lidos com uma única consulta às
+tabelas de ``Disciplinas.monitores`` e ``Disciplinas.professores`` e
+guardados no cache compartilhado, em uma geração (ver utils.cache) trocada a
+cada alteração nesses vínculos ou remoção de disciplina.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, Value
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+
+from core.models import Disciplinas
+from utils import cache as cache_utils
+
+NAMESPACE = "vinculos_disciplinas"
+VAZIO = {"monitor": frozenset(), "professor": frozenset()}
+
+
+def _chave(geracao, user_id) -> str:
+    return f"{NAMESPACE}:{geracao}:{user_id}"
+
+
+def get_memberships(user_id) -> dict:
+    """Retorna os ids das disciplinas que o usuário monitora e leciona.
+
+    Returns:
+        Dicionário com os conjuntos ``"monitor"`` e ``"professor"``.
+    """
+    if user_id is None:
+        return VAZIO
+    (geracao,) = cache_utils.get_generations(NAMESPACE)
+    chave = _chave(geracao, user_id)
+    vinculos = cache.get(chave)
+    if vinculos is None:
+        vinculos = {"monitor": set(), "professor": set()}
+        monitorias = Disciplinas.monitores.through.objects.filter(
+            customuser_id=user_id
+        ).values_list("disciplinas_id", Value("monitor", output_field=CharField()))
+        aulas = Disciplinas.professores.through.objects.filter(
+            customuser_id=user_id
+        ).values_list("disciplinas_id", Value("professor", output_field=CharField()))
+        for disciplina_id, cargo in monitorias.union(aulas, all=True):
+            vinculos[cargo].add(disciplina_id)
+        vinculos = {cargo: frozenset(ids) for cargo, ids in vinculos.items()}
+        cache.set(chave, vinculos, timeout=settings.VINCULOS_CACHE_TIMEOUT)
+    return vinculos
+
+
+def scoped_disciplinas(user) -> frozenset:
+    """Disciplinas cujos agendamentos o usuário acompanha.
+
+    Monitores acompanham as disciplinas que monitoram; professores, as que
+    lecionam.
+    """
+    vinculos = get_memberships(user.pk)
+    disciplinas = frozenset()
+    if user.tem_cargo("monitor"):
+        disciplinas |= vinculos["monitor"]
+    if user.tem_cargo("professor"):
+        disciplinas |= vinculos["professor"]
+    return disciplinas
+
+
+@receiver(m2m_changed, sender=Disciplinas.monitores.through)
+@receiver(m2m_changed, sender=Disciplinas.professores.through)
+def _vinculo_alterado(sender, action, **kwargs):  # pylint: disable=unused-argument
+    if action.startswith("post_"):
+        cache_utils.bump_generation(NAMESPACE)
+
+
+@receiver(post_delete, sender=Disciplinas)
+def _disciplina_removida(sender, **kwargs):  # pylint: disable=unused-argument
+    # A remoção apaga as linhas das tabelas de vínculos sem m2m_changed.
+    cache_utils.bump_generation(NAMESPACE)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_monitoria_dia_semana_monitoria_disciplina_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="agendamento",
+            index=models.Index(fields=["data", "id"], name="agendamento_data_id_idx"),
+        ),
+    ]
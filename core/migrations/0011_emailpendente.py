@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_agendamento_agendamento_data_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailPendente",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("assunto", models.CharField(max_length=255)),
+                ("corpo", models.TextField()),
+                ("remetente", models.CharField(max_length=255)),
+                ("destinatarios", models.JSONField()),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                (
+                    "proxima_tentativa",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("tentativas", models.PositiveSmallIntegerField(default=0)),
+                ("ultimo_erro", models.TextField(blank=True)),
+                ("enviado_em", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["enviado_em", "proxima_tentativa"],
+                        name="email_pendente_fila_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,150 @@
+import datetime
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+# Restrições de exclusão do PostgreSQL: nome -> (coluna do recurso, condição).
+RESTRICOES_EXCLUSAO = {
+    "agendamento_sem_conflito_disciplina": ("disciplina_id", "TRUE"),
+    "agendamento_sem_conflito_monitor": ("monitor_id", "monitor_id IS NOT NULL"),
+    "agendamento_sem_conflito_local": ("local", "coalesce(local, '') <> ''"),
+}
+
+
+def preencher_fim(apps, schema_editor):  # pylint: disable=unused-argument
+    Agendamento = apps.get_model("core", "Agendamento")
+    Agendamento.objects.update(fim=F("data") + F("duracao"))
+
+
+def resolver_sobreposicoes(apps, schema_editor):  # pylint: disable=unused-argument
+    """Encurta agendamentos antigos que a duração padrão fez se sobrepor.
+
+    Antes só havia a restrição de unicidade de (data, disciplina); com a
+    duração padrão de 30 minutos, agendamentos mais próximos que isso se
+    sobrepõem e a restrição de exclusão da disciplina não poderia ser criada.
+    O anterior passa a terminar quando o seguinte começa. Monitor e local
+    são campos novos, ainda vazios.
+    """
+    Agendamento = apps.get_model("core", "Agendamento")
+    anterior = None
+    alterados = []
+    for agendamento in (
+        Agendamento.objects.exclude(status="cancelado")
+        .order_by("disciplina_id", "data", "id")
+        .only("disciplina_id", "data", "duracao", "fim")
+        .iterator()
+    ):
+        if (
+            anterior is not None
+            and anterior.disciplina_id == agendamento.disciplina_id
+            and agendamento.data < anterior.fim
+        ):
+            anterior.duracao = agendamento.data - anterior.data
+            anterior.fim = agendamento.data
+            alterados.append(anterior)
+        anterior = agendamento
+    Agendamento.objects.bulk_update(alterados, ["duracao", "fim"], batch_size=500)
+    if schema_editor.connection.vendor == "postgresql":
+        # As chaves estrangeiras são verificadas só no commit; com verificações
+        # pendentes o PostgreSQL recusa o ALTER TABLE das operações seguintes.
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def instalar(apps, schema_editor):  # pylint: disable=unused-argument
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    for nome, (coluna, condicao) in RESTRICOES_EXCLUSAO.items():
+        schema_editor.execute(
+            f"ALTER TABLE core_agendamento ADD CONSTRAINT {nome} "
+            f"EXCLUDE USING gist ({coluna} WITH =, "
+            f"tstzrange(data, fim, '[)') WITH &&) "
+            f"WHERE (status <> 'cancelado' AND {condicao})"
+        )
+
+
+def desinstalar(apps, schema_editor):  # pylint: disable=unused-argument
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for nome in RESTRICOES_EXCLUSAO:
+        schema_editor.execute(
+            f"ALTER TABLE core_agendamento DROP CONSTRAINT IF EXISTS {nome}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0011_emailpendente"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="agendamento",
+            name="agendamento_unico",
+        ),
+        migrations.AddField(
+            model_name="agendamento",
+            name="monitor",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="atendimentos",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="agendamento",
+            name="duracao",
+            field=models.DurationField(
+                default=datetime.timedelta(seconds=1800),
+                validators=[
+                    django.core.validators.MinValueValidator(
+                        datetime.timedelta(seconds=300)
+                    ),
+                    django.core.validators.MaxValueValidator(
+                        datetime.timedelta(seconds=14400)
+                    ),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="agendamento",
+            name="local",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="agendamento",
+            name="fim",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_fim, migrations.RunPython.noop),
+        migrations.RunPython(resolver_sobreposicoes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="agendamento",
+            name="fim",
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="agendamento",
+            index=models.Index(
+                fields=["disciplina", "data"], name="agendamento_disciplina_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="agendamento",
+            index=models.Index(
+                fields=["monitor", "data"], name="agendamento_monitor_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="agendamento",
+            index=models.Index(fields=["local", "data"], name="agendamento_local_idx"),
+        ),
+        migrations.RunPython(instalar, desinstalar),
+    ]
@@ -1,5 +1,9 @@
 """Este módulo define os modelos do aplicativo 'core'."""
+from datetime import timedelta
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 TIPOS_AGENDAMENTO = [
     ("presencial", "Presencial"),
@@ -50,27 +54,98 @@ class Disciplinas(models.Model):
         return f"Disciplina: {self.nome}"
 
 
-class Agendamento(models.Model):
-    """Representa um adentamento para atendimento."""
+# Limites da duração de um agendamento. A duração máxima também limita a
+# faixa do índice percorrida na busca por conflitos (ver core.booking_service).
+DURACAO_PADRAO = timedelta(minutes=30)
+DURACAO_MINIMA = timedelta(minutes=5)
+DURACAO_MAXIMA = timedelta(hours=4)
+
+
+class ValoresCarregadosMixin:
+    """Guarda os valores de ``campos_rastreados`` como estão no banco.
+
+    Os sinais que invalidam caches por recurso (disciplina, monitor etc.)
+    usam ``valores_carregados()`` para invalidar também os recursos
+    anteriores quando uma edição os troca.
+    """
+
+    campos_rastreados = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._carregados = instance._valores_rastreados()
+        return instance
+
+    def _valores_rastreados(self) -> dict:
+        return {campo: self.__dict__.get(campo) for campo in self.campos_rastreados}
+
+    def valores_carregados(self) -> dict:
+        """Valores do último carregamento ou save (vazio em instâncias novas)."""
+        return self.__dict__.get("_carregados", {})
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Os sinais de post_save já rodaram: o banco agora tem os valores atuais.
+        self._carregados = self._valores_rastreados()
+
+
+class Agendamento(ValoresCarregadosMixin, models.Model):
+    """Representa um adentamento para atendimento.
+
+    O atendimento ocupa o intervalo [data, fim), em que ``fim`` é calculado
+    a partir de ``duracao`` ao salvar. Agendamentos não cancelados não podem
+    se sobrepor na mesma disciplina, com o mesmo monitor ou no mesmo local.
+    """
 
     disciplina = models.ForeignKey(Disciplinas, on_delete=models.CASCADE)
     solicitante = models.ForeignKey("accounts.CustomUser", on_delete=models.CASCADE)
+    monitor = models.ForeignKey(
+        "accounts.CustomUser",
+        on_delete=models.SET_NULL,
+        related_name="atendimentos",
+        null=True,
+        blank=True,
+    )
     tipo = models.CharField(max_length=10, choices=TIPOS_AGENDAMENTO)
     status = models.CharField(
         max_length=10, choices=STATUS_AGENDAMENTO, default="aguardando"
     )
     data = models.DateTimeField()
+    duracao = models.DurationField(
+        default=DURACAO_PADRAO,
+        validators=[
+            MinValueValidator(DURACAO_MINIMA),
+            MaxValueValidator(DURACAO_MAXIMA),
+        ],
+    )
+    fim = models.DateTimeField(editable=False)
+    local = models.CharField(max_length=255, null=True, blank=True)
     assunto = models.TextField()
     descricao = models.TextField()
     link_zoom = models.TextField(null=True, blank=True)
 
+    campos_rastreados = ("disciplina_id", "monitor_id", "local", "solicitante_id")
+
     class Meta:
-        constraints = [
-            models.UniqueConstraint(
-                fields=["data", "disciplina"], name="agendamento_unico"
-            )
+        indexes = [
+            models.Index(fields=["data", "id"], name="agendamento_data_id_idx"),
+            models.Index(
+                fields=["disciplina", "data"], name="agendamento_disciplina_idx"
+            ),
+            models.Index(fields=["monitor", "data"], name="agendamento_monitor_idx"),
+            models.Index(fields=["local", "data"], name="agendamento_local_idx"),
         ]
 
+    def save(self, *args, **kwargs):
+        self.data = self._meta.get_field("data").to_python(self.data)
+        self.duracao = self._meta.get_field("duracao").to_python(self.duracao)
+        self.fim = self.data + self.duracao
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"data", "duracao"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "fim"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         """Representação textual do agendamento"""
         return (
@@ -90,7 +165,7 @@ class Agendamento(models.Model):
     get_data_formatada.short_description = "Data"
 
 
-class Monitoria(models.Model):
+class Monitoria(ValoresCarregadosMixin, models.Model):
     """Page para visualização do monitor, com informações sobre a monitoria."""
 
     professor = models.ForeignKey(
@@ -121,6 +196,8 @@ class Monitoria(models.Model):
     hora_fim = models.TimeField(blank=True, null=True)
     local = models.CharField(max_length=255, blank=True, null=True)
 
+    campos_rastreados = ("disciplina_id", "monitor_id", "professor_id")
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -134,3 +211,33 @@ class Monitoria(models.Model):
             f"{self.get_dia_semana_display()} - {self.hora_inicio} "
             f"às {self.hora_fim} - {self.disciplina.nome}"
         )
+
+
+class EmailPendente(models.Model):
+    """E-mail na fila de saída (outbox), enviado pelo comando 'enviar_emails'.
+
+    Gravado na mesma transação da operação que o originou, para que o e-mail
+    só seja enviado se ela for confirmada e sem abrir conexões SMTP durante
+    as requisições.
+    """
+
+    assunto = models.CharField(max_length=255)
+    corpo = models.TextField()
+    remetente = models.CharField(max_length=255)
+    destinatarios = models.JSONField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    ultimo_erro = models.TextField(blank=True)
+    enviado_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["enviado_em", "proxima_tentativa"],
+                name="email_pendente_fila_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.assunto} - {', '.join(self.destinatarios)}"
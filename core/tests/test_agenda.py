@@ -0,0 +1,216 @@
+"""Testes das agendas .ics."""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service
+from accounts.models import CustomUser, Perfil
+from core import calendar_feed
+from core.models import Agendamento, Curso, Disciplinas, Monitoria
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+
+class AgendaTest(APITestCase):
+    """Verifica o conteúdo, o cache e os validadores das agendas."""
+
+    def setUp(self):
+        cache.clear()
+        self.disciplina = Disciplinas.objects.create(nome="Cálculo", descricao="")
+        self.monitor = CustomUser.objects.create_user(
+            email="monitor@alu.ufc.br", password=PASSWORD, is_email_active=True
+        )
+        self.aluno = CustomUser.objects.create_user(
+            email="aluno@alu.ufc.br", password=PASSWORD, is_email_active=True
+        )
+        self.monitoria = Monitoria.objects.create(
+            disciplina=self.disciplina,
+            monitor=self.monitor,
+            dia_semana="2",
+            hora_inicio=time(14),
+            hora_fim=time(16),
+            local="Bloco 910, sala 3",
+        )
+        amanha = timezone.localdate() + timedelta(days=1)
+        self.agendamento = Agendamento.objects.create(
+            disciplina=self.disciplina,
+            solicitante=self.aluno,
+            monitor=self.monitor,
+            tipo="presencial",
+            data=datetime.combine(
+                amanha, time(10), tzinfo=timezone.get_current_timezone()
+            ),
+            assunto="Limites; derivadas",
+            descricao="",
+        )
+
+        self.disciplina.monitores.add(self.monitor)
+
+    @staticmethod
+    def url_usuario(user):
+        namespace = calendar_feed.namespace_usuario(user.pk)
+        segredo = calendar_feed.segredo(user.pk, criar=True)
+        return reverse(
+            "agenda-usuario",
+            args=[user.pk, calendar_feed.chave(namespace, user.pk, segredo)],
+        )
+
+    def url_disciplina(self, user=None):
+        user = user or self.monitor
+        namespace = calendar_feed.namespace_disciplina(self.disciplina.pk)
+        segredo = calendar_feed.segredo(user.pk, criar=True)
+        return reverse(
+            "agenda-disciplina",
+            args=[
+                self.disciplina.pk,
+                user.pk,
+                calendar_feed.chave(namespace, user.pk, segredo),
+            ],
+        )
+
+    def autenticar(self, user):
+        token = account_management_service.get_user_token(user).key
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+    def test_conteudo(self):
+        """Horários viram eventos semanais e agendamentos, eventos únicos"""
+        response = self.client.get(self.url_usuario(self.monitor))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/calendar"))
+        conteudo = response.content.decode()
+        self.assertTrue(conteudo.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(conteudo.endswith("END:VCALENDAR\r\n"))
+        self.assertIn("RRULE:FREQ=WEEKLY;BYDAY=WE\r\n", conteudo)
+        self.assertIn("DTSTART;TZID=America/Fortaleza:20240103T140000", conteudo)
+        self.assertIn("LOCATION:Bloco 910\\, sala 3\r\n", conteudo)
+        self.assertIn(f"UID:agendamento-{self.agendamento.pk}@monitorias", conteudo)
+        self.assertIn("Limites\\; derivadas", conteudo)
+        for linha in conteudo.split("\r\n"):
+            self.assertLessEqual(len(linha.encode()), 75)
+
+        # A agenda da disciplina não expõe os dados do aluno.
+        conteudo = self.client.get(self.url_disciplina()).content.decode()
+        self.assertIn(f"UID:agendamento-{self.agendamento.pk}@monitorias", conteudo)
+        self.assertNotIn("Limites", conteudo)
+
+    def test_cancelados_ficam_de_fora(self):
+        """Agendamentos cancelados não aparecem"""
+        self.agendamento.status = "cancelado"
+        self.agendamento.save()
+        conteudo = self.client.get(self.url_usuario(self.aluno)).content.decode()
+        self.assertNotIn("agendamento-", conteudo)
+
+    def test_cache_e_validadores(self):
+        """A agenda vem do cache e responde 304 até os dados mudarem"""
+        url = self.url_usuario(self.aluno)
+        response = self.client.get(url)
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A troca do solicitante invalida a agenda do anterior.
+        self.agendamento.solicitante = self.monitor
+        self.agendamento.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("agendamento-", response.content.decode())
+
+        etag = response["ETag"]
+        self.disciplina.nome = "Cálculo I"
+        self.disciplina.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_chave_invalida(self):
+        """Sem a chave correta a agenda não é encontrada"""
+        url = reverse("agenda-usuario", args=[self.aluno.pk, "0" * 32])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        # A chave de um usuário não serve para outro.
+        url = self.url_usuario(self.monitor).replace(
+            f"/{self.monitor.pk}/", f"/{self.aluno.pk}/"
+        )
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_urls_de_assinatura(self):
+        """O endpoint informa as URLs de assinatura ao usuário autenticado"""
+        url = reverse("agendamentos-agenda")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.autenticar(self.monitor)
+        response = self.client.get(url, {"disciplina": self.disciplina.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            response.data["usuario"].endswith(self.url_usuario(self.monitor))
+        )
+        self.assertTrue(response.data["disciplina"].endswith(self.url_disciplina()))
+
+    def test_agenda_da_disciplina_so_para_vinculados(self):
+        """Só monitores, professores e alunos da disciplina recebem a URL dela"""
+        url = reverse("agendamentos-agenda")
+        self.autenticar(self.aluno)
+        response = self.client.get(url, {"disciplina": self.disciplina.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # Uma chave gerada para quem não participa da disciplina não vale.
+        response = self.client.get(self.url_disciplina(self.aluno))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        curso = Curso.objects.create(nome="Computação", descricao="")
+        self.disciplina.cursos.add(curso)
+        Perfil.objects.create(
+            usuario=self.aluno,
+            nome_completo="Aluno",
+            nome_exibicao="Aluno",
+            curso=curso,
+        )
+        response = self.client.get(url, {"disciplina": self.disciplina.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            response.data["usuario"].endswith(self.url_usuario(self.monitor))
+        )
+        self.assertTrue(response.data["disciplina"].endswith(self.url_disciplina()))
+
+    def test_agenda_da_disciplina_so_para_vinculados(self):
+        """Só monitores, professores e alunos da disciplina recebem a URL dela"""
+        url = reverse("agendamentos-agenda")
+        self.autenticar(self.aluno)
+        response = self.client.get(url, {"disciplina": self.disciplina.pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # Uma chave gerada para quem não participa da disciplina não vale.
+        response = self.client.get(self.url_disciplina(self.aluno))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        curso = Curso.objects.create(nome="Computação", descricao="")
+        self.disciplina.cursos.add(curso)
+        Perfil.objects.create(
+            usuario=self.aluno, nome_completo="Aluno", nome_exibicao="Aluno"
+        )
+        Perfil.objects.filter(usuario=self.aluno).update(curso=curso)
+        response = self.client.get(url, {"disciplina": self.disciplina.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.get(response.data["disciplina"]).status_code,
+            status.HTTP_200_OK,
+        )
+
+        # O fim do vínculo derruba a URL já distribuída.
+        url_monitor = self.url_disciplina()
+        self.disciplina.monitores.remove(self.monitor)
+        response = self.client.get(url_monitor)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_renovar_chave(self):
+        """Renovar o segredo invalida as URLs anteriores do usuário"""
+        antiga = self.url_usuario(self.aluno)
+        self.assertEqual(self.client.get(antiga).status_code, status.HTTP_200_OK)
+        self.autenticar(self.aluno)
+        response = self.client.post(reverse("agendamentos-renovar-agenda"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(antiga).status_code, status.HTTP_404_NOT_FOUND)
+        nova = response.data["usuario"]
+        self.assertNotEqual(nova, antiga)
+        self.assertEqual(self.client.get(nova).status_code, status.HTTP_200_OK)
@@ -0,0 +1,340 @@
+"""Testes do controle de acesso às listagens de agendamentos."""
+import json
+import threading
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service
+from accounts.models import CustomUser, Perfil
+from core import booking_service
+from core.models import Agendamento, Disciplinas
+from forum_amo.tests import _ZoomFalso
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+
+class EscopoAgendamentosTest(APITestCase):
+    """Verifica quem vê quais agendamentos e o custo da listagem."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self):
+        self.calculo = Disciplinas.objects.create(nome="Cálculo", descricao="")
+        self.fisica = Disciplinas.objects.create(nome="Física", descricao="")
+        self.aluno = self.criar_usuario("aluno@alu.ufc.br")
+        self.monitor = self.criar_usuario("monitor@alu.ufc.br", "monitor")
+        self.professor = self.criar_usuario("professor@ufc.br", "professor")
+        self.calculo.monitores.add(self.monitor)
+        self.fisica.professores.add(self.professor)
+
+        inicio = timezone.now() + timedelta(days=1)
+        self.agendamentos = {}
+        self.tokens = {}
+        for horas, disciplina, solicitante in (
+            (0, self.calculo, self.aluno),
+            (1, self.fisica, self.aluno),
+            (2, self.fisica, self.monitor),
+        ):
+            self.agendamentos[
+                disciplina.nome, solicitante.email
+            ] = Agendamento.objects.create(
+                disciplina=disciplina,
+                solicitante=solicitante,
+                tipo="presencial",
+                data=inicio + timedelta(hours=horas),
+                assunto="Dúvida",
+                descricao="",
+            ).pk
+
+    @staticmethod
+    def criar_usuario(email, cargo=None):
+        usuario = CustomUser.objects.create_user(
+            email=email, password=PASSWORD, is_email_active=True
+        )
+        if cargo:
+            usuario.groups.add(Group.objects.get(name=cargo))
+        Perfil.objects.create(
+            usuario=usuario, nome_completo=email, nome_exibicao=email[:32]
+        )
+        return usuario
+
+    def listar(self, usuario):
+        token = self.tokens.get(usuario.pk)
+        if token is None:
+            token = account_management_service.get_user_token(usuario).key
+            self.tokens[usuario.pk] = token
+        response = self.client.get(
+            reverse("agendamentos-list"), HTTP_AUTHORIZATION=f"Token {token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(item["id"] for item in response.data["results"])
+
+    def ids(self, *chaves):
+        return sorted(self.agendamentos[chave] for chave in chaves)
+
+    def test_escopo_por_cargo(self):
+        """Alunos veem os seus; monitores e professores, os das suas disciplinas"""
+        self.assertEqual(
+            self.listar(self.aluno),
+            self.ids(("Cálculo", "aluno@alu.ufc.br"), ("Física", "aluno@alu.ufc.br")),
+        )
+        self.assertEqual(
+            self.listar(self.monitor), self.ids(("Cálculo", "aluno@alu.ufc.br"))
+        )
+        self.assertEqual(
+            self.listar(self.professor),
+            self.ids(("Física", "aluno@alu.ufc.br"), ("Física", "monitor@alu.ufc.br")),
+        )
+
+    def test_vinculos_invalidados(self):
+        """Alterar monitores ou professores muda o escopo imediatamente"""
+        self.listar(self.monitor)
+        self.fisica.monitores.add(self.monitor)
+        self.assertEqual(len(self.listar(self.monitor)), 3)
+
+        self.listar(self.professor)
+        self.fisica.delete()
+        self.assertEqual(self.listar(self.professor), [])
+
+    def test_listagem_em_uma_consulta(self):
+        """Com os vínculos e o token em cache, a listagem custa uma consulta"""
+        self.listar(self.professor)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.listar(self.professor)), 2)
+
+
+class ConflitosAgendamentoTest(APITestCase):
+    """Verifica a detecção de sobreposição de horários."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self):
+        self.calculo = Disciplinas.objects.create(nome="Cálculo", descricao="")
+        self.fisica = Disciplinas.objects.create(nome="Física", descricao="")
+        self.aluno = EscopoAgendamentosTest.criar_usuario("aluno@alu.ufc.br")
+        self.monitor = EscopoAgendamentosTest.criar_usuario(
+            "monitor@alu.ufc.br", "monitor"
+        )
+        self.calculo.monitores.add(self.monitor)
+        self.fisica.monitores.add(self.monitor)
+        self.inicio = (timezone.now() + timedelta(days=1)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        self.token = account_management_service.get_user_token(self.aluno).key
+
+    def agendar(self, minutos, disciplina=None, **dados):
+        return self.client.post(
+            reverse("agendamentos-list"),
+            {
+                "disciplina": (disciplina or self.calculo).pk,
+                "tipo": "presencial",
+                "data": (self.inicio + timedelta(minutes=minutos)).isoformat(),
+                "assunto": "Dúvida",
+                "descricao": "",
+                **dados,
+            },
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+        )
+
+    def test_sobreposicao_na_disciplina(self):
+        """Intervalos sobrepostos da mesma disciplina são recusados"""
+        response = self.agendar(0)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["duracao"], "00:30:00")
+
+        response = self.agendar(15)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["conflitos"], ["disciplina"])
+        # Intervalos semiabertos: começar quando o outro termina é permitido.
+        self.assertEqual(self.agendar(30).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.agendar(15, disciplina=self.fisica).status_code,
+            status.HTTP_201_CREATED,
+        )
+
+    def test_sobreposicao_de_monitor_e_local(self):
+        """O mesmo monitor ou local não atende dois agendamentos ao mesmo tempo"""
+        self.agendar(0, duracao=60, monitor=self.monitor.pk, local="Bloco 910")
+
+        response = self.agendar(45, disciplina=self.fisica, monitor=self.monitor.pk)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["conflitos"], ["monitor"])
+        response = self.agendar(45, disciplina=self.fisica, local=" Bloco 910 ")
+        self.assertEqual(response.data["conflitos"], ["local"])
+        response = self.agendar(60, disciplina=self.fisica, monitor=self.monitor.pk)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_confirmacao_ocupa_o_monitor(self):
+        """Quem confirma vira o monitor e não pode confirmar horários sobrepostos"""
+        primeiro = self.agendar(0).data["id"]
+        segundo = self.agendar(10, disciplina=self.fisica).data["id"]
+        token = account_management_service.get_user_token(self.monitor).key
+
+        for pk, esperado in ((primeiro, 200), (segundo, 409)):
+            response = self.client.patch(
+                reverse("agendamentos-detail", args=[pk]),
+                {"status": "confirmado"},
+                format="json",
+                HTTP_AUTHORIZATION=f"Token {token}",
+            )
+            self.assertEqual(response.status_code, esperado)
+        self.assertEqual(Agendamento.objects.get(pk=primeiro).monitor, self.monitor)
+        self.assertIsNone(Agendamento.objects.get(pk=segundo).monitor)
+
+    def test_agendamento_carregado_uma_vez(self):
+        """A access policy e a ação compartilham o agendamento carregado"""
+        pk = self.agendar(0).data["id"]
+        token = account_management_service.get_user_token(self.monitor).key
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.patch(
+                reverse("agendamentos-detail", args=[pk]),
+                {"status": "confirmado"},
+                format="json",
+                HTTP_AUTHORIZATION=f"Token {token}",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        leituras = [
+            consulta["sql"]
+            for consulta in consultas.captured_queries
+            if consulta["sql"].startswith('SELECT "core_agendamento"')
+            and "LIMIT 21" in consulta["sql"]
+        ]
+        self.assertEqual(len(leituras), 1, leituras)
+
+    def test_monitor_informado(self):
+        """Só um monitor da disciplina pode ser escolhido; quem confirma atende"""
+        outro = EscopoAgendamentosTest.criar_usuario("outro@alu.ufc.br", "monitor")
+        self.fisica.monitores.add(outro)
+        for monitor in (outro.pk, self.aluno.pk, "x"):
+            response = self.agendar(0, monitor=monitor)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("monitor", response.data)
+
+        pk = self.agendar(0, monitor=self.monitor.pk).data["id"]
+        self.calculo.monitores.add(outro)
+        token = account_management_service.get_user_token(outro).key
+        response = self.client.patch(
+            reverse("agendamentos-detail", args=[pk]),
+            {"status": "confirmado"},
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Agendamento.objects.get(pk=pk).monitor, outro)
+
+    def test_cancelados_e_duracao(self):
+        """Cancelados não ocupam horário; a duração tem limites"""
+        Agendamento.objects.filter(pk=self.agendar(0).data["id"]).update(
+            status="cancelado"
+        )
+        self.assertEqual(self.agendar(0).status_code, status.HTTP_201_CREATED)
+        for duracao in (1, 600, "meia hora"):
+            response = self.agendar(120, duracao=duracao)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_busca_de_conflitos_em_uma_consulta(self):
+        """A busca por conflitos é uma única consulta, limitada pela duração máxima"""
+        self.agendar(0, monitor=self.monitor.pk, local="Sala 1")
+        with self.assertNumQueries(1):
+            conflitos = booking_service.find_conflicts(
+                self.inicio + timedelta(minutes=20),
+                self.inicio + timedelta(minutes=50),
+                self.fisica.pk,
+                self.monitor.pk,
+                "Sala 1",
+            )
+        self.assertEqual(conflitos, ["monitor", "local"])
+
+
+class ReuniaoZoomTest(APITestCase):
+    """Verifica a criação da reunião do Zoom na confirmação."""
+
+    fixtures = ["groups.yaml"]
+    agendar = ConflitosAgendamentoTest.agendar
+
+    def setUp(self):
+        ConflitosAgendamentoTest.setUp(self)
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ZoomFalso)
+        self.servidor.requisicoes = []
+        self.servidor.tokens = 0
+        self.servidor.validade = 3600
+        self.servidor.recusados = set()
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+        endereco = f"http://127.0.0.1:{self.servidor.server_port}"
+        self.zoom = {
+            "account_id": "conta",
+            "client_id": "id",
+            "client_secret": "segredo",
+            "oauth_url": f"{endereco}/oauth/token",
+            "api_url": f"{endereco}/v2",
+            "timeout": 5,
+        }
+
+    def confirmar(self, pk):
+        token = account_management_service.get_user_token(self.monitor).key
+        return self.client.patch(
+            reverse("agendamentos-detail", args=[pk]),
+            {"status": "confirmado"},
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {token}",
+        )
+
+    def reunioes(self):
+        return [
+            json.loads(corpo)
+            for caminho, _, corpo in self.servidor.requisicoes
+            if caminho == "/v2/users/me/meetings"
+        ]
+
+    def test_confirmacao_de_agendamento_virtual(self):
+        """Só agendamentos virtuais ganham reunião, uma única vez"""
+        virtual = self.agendar(0, tipo="virtual", duracao=45).data["id"]
+        presencial = self.agendar(0, disciplina=self.fisica).data["id"]
+
+        with override_settings(ZOOM=self.zoom):
+            self.assertEqual(self.confirmar(presencial).status_code, 200)
+            self.assertEqual(self.reunioes(), [])
+            self.assertEqual(self.confirmar(virtual).status_code, 409)
+
+            Agendamento.objects.filter(pk=presencial).update(status="cancelado")
+            self.assertEqual(self.confirmar(virtual).status_code, 200)
+            self.assertEqual(self.confirmar(virtual).status_code, 200)
+
+        agendamento = Agendamento.objects.get(pk=virtual)
+        self.assertEqual(agendamento.link_zoom, "https://zoom.us/j/123")
+        self.assertEqual(agendamento.status, "confirmado")
+        reunioes = self.reunioes()
+        self.assertEqual(len(reunioes), 1)
+        self.assertEqual(reunioes[0]["topic"], "Dúvida")
+        self.assertEqual(reunioes[0]["duration"], 45)
+
+    def test_falha_do_zoom(self):
+        """Sem o Zoom, a confirmação vale e o aviso de link continua"""
+        pk = self.agendar(0, tipo="virtual").data["id"]
+        aviso = Agendamento.objects.get(pk=pk).link_zoom
+
+        self.servidor.recusados.add("Bearer token-1")
+        self.servidor.recusados.add("Bearer token-2")
+        with override_settings(ZOOM=self.zoom):
+            response = self.confirmar(pk)
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        agendamento = Agendamento.objects.get(pk=pk)
+        self.assertEqual(agendamento.status, "confirmado")
+        self.assertEqual(agendamento.link_zoom, aviso)
+
+        # Sem credenciais (desenvolvimento e testes), a API não é chamada.
+        self.assertEqual(self.confirmar(pk).status_code, 200)
+        self.assertEqual(len(self.reunioes()), 2)
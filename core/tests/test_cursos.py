@@ -87,3 +87,30 @@ class CursoTestCase(APITestCase):
                 HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
             )
             self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_condicional(self):
+        """Verifica ETag e Last-Modified na lista e no detalhe de Cursos"""
+        for url in (reverse("cursos-list"), reverse("cursos-detail", args=[1])):
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_AUTHORIZATION=f"Token {self.user_auth_token}"
+                )
+                etag = response["ETag"]
+                self.assertIn("Last-Modified", response)
+
+                response = self.client.get(
+                    url,
+                    HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+                    HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response.content, b"")
+
+                Curso.objects.filter(pk=1).first().save()
+                response = self.client.get(
+                    url,
+                    HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+                    HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotEqual(response["ETag"], etag)
@@ -0,0 +1,150 @@
+"""Testes dos horários livres para agendamento."""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts import account_management_service
+from accounts.models import CustomUser
+from core import availability
+from core.models import Agendamento, Disciplinas, Monitoria
+
+PASSWORD = "M@vr8RjZS8LqrjhV"
+
+
+class IntervalosTest(APITestCase):
+    """Verifica a união e a subtração de intervalos."""
+
+    def test_unir(self):
+        """Intervalos sobrepostos e adjacentes são unidos"""
+        self.assertEqual(
+            availability.unir([(5, 7), (1, 3), (2, 4), (4, 5), (9, 10)]),
+            [(1, 7), (9, 10)],
+        )
+
+    def test_subtrair(self):
+        """Ocupações cortam as janelas, inclusive as que cobrem várias"""
+        self.assertEqual(
+            availability.subtrair(
+                [(0, 10), (20, 30), (40, 50)], [(2, 3), (8, 22), (25, 45)]
+            ),
+            [(0, 2), (3, 8), (22, 25), (45, 50)],
+        )
+        self.assertEqual(availability.subtrair([(0, 10)], []), [(0, 10)])
+
+
+class DisponibilidadeTest(APITestCase):
+    """Verifica o cálculo, o cache e o endpoint de disponibilidade."""
+
+    def setUp(self):
+        cache.clear()
+        self.calculo = Disciplinas.objects.create(nome="Cálculo", descricao="")
+        self.fisica = Disciplinas.objects.create(nome="Física", descricao="")
+        self.monitor = CustomUser.objects.create_user(
+            email="monitor@alu.ufc.br", password=PASSWORD, is_email_active=True
+        )
+        # Segunda-feira daqui a pelo menos uma semana.
+        hoje = timezone.localdate()
+        self.segunda = hoje + timedelta(days=7 + (7 - hoje.weekday()) % 7)
+        Monitoria.objects.create(
+            disciplina=self.calculo,
+            monitor=self.monitor,
+            dia_semana="0",
+            hora_inicio=time(14),
+            hora_fim=time(16),
+            local="Sala 1",
+        )
+
+    def hora(self, horas, minutos=0, dias=0):
+        return datetime.combine(
+            self.segunda + timedelta(days=dias),
+            time(horas, minutos),
+            tzinfo=timezone.get_current_timezone(),
+        )
+
+    def agendar(self, disciplina, horas, minutos, **campos):
+        return Agendamento.objects.create(
+            disciplina=disciplina,
+            solicitante=self.monitor,
+            tipo="presencial",
+            data=self.hora(horas, minutos),
+            assunto="Dúvida",
+            descricao="",
+            **campos,
+        )
+
+    def livres(self, de=None, ate=None):
+        return [
+            (horario["inicio"], horario["fim"])
+            for horario in availability.get_availability(
+                self.calculo.pk, de or self.segunda, ate or self.segunda
+            )
+        ]
+
+    def test_subtrai_agendamentos(self):
+        """Agendamentos da disciplina, do monitor e do local ocupam a janela"""
+        self.agendar(self.calculo, 14, 30)
+        self.agendar(self.fisica, 15, 30, monitor=self.monitor)
+        self.agendar(self.fisica, 15, 0, local="Sala 1", duracao=timedelta(minutes=10))
+        self.agendar(self.fisica, 14, 0)
+        self.agendar(self.calculo, 14, 0, status="cancelado")
+
+        self.assertEqual(
+            self.livres(),
+            [
+                (self.hora(14), self.hora(14, 30)),
+                (self.hora(15, 10), self.hora(15, 30)),
+            ],
+        )
+
+    def test_expande_o_periodo(self):
+        """A janela semanal se repete em cada semana do período"""
+        livres = self.livres(ate=self.segunda + timedelta(weeks=18))
+        self.assertEqual(len(livres), 19)
+        self.assertEqual(livres[-1], (self.hora(14, dias=126), self.hora(16, dias=126)))
+
+    def test_cache_invalidado(self):
+        """O resultado vem do cache até um horário ou agendamento mudar"""
+        self.livres()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.livres(), [(self.hora(14), self.hora(16))])
+
+        agendamento = self.agendar(self.fisica, 14, 0, monitor=self.monitor)
+        self.assertEqual(self.livres(), [(self.hora(14, 30), self.hora(16))])
+        # Trocar o monitor libera o horário dele.
+        agendamento = Agendamento.objects.get(pk=agendamento.pk)
+        agendamento.monitor = None
+        agendamento.save()
+        self.assertEqual(self.livres(), [(self.hora(14), self.hora(16))])
+
+        Monitoria.objects.update(hora_fim=time(15))
+        Monitoria.objects.get().save()
+        self.assertEqual(self.livres(), [(self.hora(14), self.hora(15))])
+
+    def test_endpoint(self):
+        """O endpoint valida os parâmetros e exige autenticação"""
+        url = reverse("monitorias-disponibilidade")
+        parametros = {"disciplina": self.calculo.pk, "de": self.segunda.isoformat()}
+        self.assertEqual(
+            self.client.get(url, parametros).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+        token = account_management_service.get_user_token(self.monitor).key
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        response = self.client.get(url, parametros)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["horarios"]), 1)
+        self.assertEqual(response.data["horarios"][0]["monitor"], self.monitor.pk)
+        self.assertEqual(response.data["horarios"][0]["local"], "Sala 1")
+
+        for invalidos in (
+            {"de": self.segunda.isoformat()},
+            {**parametros, "ate": "2020-13-01"},
+            {**parametros, "ate": (self.segunda + timedelta(days=365)).isoformat()},
+        ):
+            response = self.client.get(url, invalidos)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,106 @@
+"""Testes da fila de saída de e-mails do aplicativo 'core'."""
+import io
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import email_service
+from core.models import EmailPendente
+
+
+class BackendInstavel(EmailBackend):
+    """Backend em memória que recusa destinatários "@falha" e conta conexões."""
+
+    aberturas = 0
+
+    def open(self):
+        BackendInstavel.aberturas += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(email.endswith("@falha") for email in message.to):
+                raise ConnectionError("Servidor recusou a mensagem.")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="core.tests.test_email.BackendInstavel")
+class EmailPendenteTestCase(TestCase):
+    """Testes relacionados ao envio dos e-mails pendentes."""
+
+    def setUp(self):
+        BackendInstavel.aberturas = 0
+
+    def test_envio_em_lote(self):
+        """Os e-mails pendentes são enviados por uma única conexão"""
+        for i in range(3):
+            email_service.enfileirar_email("Assunto", "Corpo", [f"user{i}@localhost"])
+        self.assertEqual(len(mail.outbox), 0)
+
+        saida = io.StringIO()
+        call_command("enviar_emails", stdout=saida)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(BackendInstavel.aberturas, 1)
+        self.assertIn("3 e-mail(s) enviado(s), 0 falha(s).", saida.getvalue())
+        self.assertFalse(EmailPendente.objects.filter(enviado_em__isnull=True))
+
+        call_command("enviar_emails", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_falha_reagenda_com_espera(self):
+        """Falhas são reagendadas com espera exponencial sem travar o lote"""
+        falha = email_service.enfileirar_email("Assunto", "Corpo", ["user@falha"])
+        email_service.enfileirar_email("Assunto", "Corpo", ["user@localhost"])
+
+        self.assertEqual(email_service.enviar_pendentes(), (1, 1))
+        falha.refresh_from_db()
+        self.assertEqual(falha.tentativas, 1)
+        self.assertIsNone(falha.enviado_em)
+        self.assertIn("recusou", falha.ultimo_erro)
+        self.assertGreater(falha.proxima_tentativa, timezone.now())
+
+        # Ainda dentro da espera: nada a enviar.
+        self.assertEqual(email_service.enviar_pendentes(), (0, 0))
+
+        EmailPendente.objects.filter(pk=falha.pk).update(
+            proxima_tentativa=timezone.now()
+        )
+        email_service.enviar_pendentes()
+        falha.refresh_from_db()
+        self.assertEqual(falha.tentativas, 2)
+        self.assertEqual(email_service.proxima_espera(2), email_service.ESPERA_BASE * 2)
+
+    def test_lote_reservado_durante_o_envio(self):
+        """Outro worker não pega o lote enquanto ele é enviado"""
+        email_service.enfileirar_email("Assunto", "Corpo", ["user@localhost"])
+        outros_workers = []
+
+        class BackendConcorrente(BackendInstavel):
+            def send_messages(self, messages):
+                outros_workers.append(email_service.enviar_pendentes())
+                return super().send_messages(messages)
+
+        self.assertEqual(
+            email_service.enviar_pendentes(connection=BackendConcorrente()), (1, 0)
+        )
+        self.assertEqual(outros_workers, [(0, 0)])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_lote_abandonado_volta_para_a_fila(self):
+        """Um lote reservado por um worker que morreu é enviado após o prazo"""
+        email = email_service.enfileirar_email("Assunto", "Corpo", ["user@localhost"])
+        EmailPendente.objects.filter(pk=email.pk).update(
+            proxima_tentativa=timezone.now() + email_service.PRAZO_ENVIO
+        )
+        self.assertEqual(email_service.enviar_pendentes(), (0, 0))
+
+        EmailPendente.objects.filter(pk=email.pk).update(
+            proxima_tentativa=timezone.now()
+        )
+        self.assertEqual(email_service.enviar_pendentes(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.tentativas, 0)
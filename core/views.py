@@ -1,4 +1,14 @@
 """Conjunto de Views do aplicativo 'core'."""
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_access_policy import AccessViewSetMixin
 from rest_framework.filters import OrderingFilter, SearchFilter
@@ -6,11 +16,17 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
-from django.db import transaction
 from django.db import IntegrityError
 from django.contrib.auth.models import Group
 from accounts.models import CustomUser
-from core import access_policy, filters
+from core import (
+    access_policy,
+    availability,
+    booking_service,
+    calendar_feed,
+    filters,
+    membership,
+)
 from core.models import Agendamento, Curso, Disciplinas, Monitoria
 from core.serializer import (
     AgendamentoRequestSerializer,
@@ -19,23 +35,41 @@ from core.serializer import (
     DisciplinaSerializer,
     MonitoriaSerializer,
 )
+from forum_amo import zoom
+from utils.conditional import ConditionalGetMixin
+from utils.identity_map import IdentityMapMixin
+from utils.pagination import KeysetPagination
+
+# Período máximo consultado em /monitorias/disponibilidade/ (um semestre).
+PERIODO_MAXIMO = timedelta(days=200)
 
 
-class CursoViewSet(AccessViewSetMixin, ModelViewSet):  # pylint: disable=R0901
+class CursoViewSet(
+    ConditionalGetMixin, AccessViewSetMixin, ModelViewSet
+):  # pylint: disable=R0901
     """ViewSet para ações relacionadas a cursos."""
 
     access_policy = access_policy.CursoAccessPolicy
+    conditional_models = ["core.Curso"]
     serializer_class = CursoSerializer
     queryset = Curso.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter]
     search_fields = ["nome"]
 
 
-class DisciplinaViewSet(AccessViewSetMixin, ModelViewSet):  # pylint: disable=R0901
+class DisciplinaViewSet(
+    ConditionalGetMixin, AccessViewSetMixin, ModelViewSet
+):  # pylint: disable=R0901
     """ViewSet para ações relacionadas a disciplinas."""
 
     # permission_classes = []
     access_policy = access_policy.DisciplinaAccessPolicy
+    conditional_models = [
+        "core.Disciplinas",
+        "core.Curso",
+        "accounts.CustomUser",
+        "accounts.Perfil",
+    ]
     serializer_class = DisciplinaSerializer
     queryset = Disciplinas.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter]
@@ -116,54 +150,70 @@ class DisciplinaViewSet(AccessViewSetMixin, ModelViewSet):  # pylint: disable=R0
         )
 
 
-class AgendamentoViewSet(AccessViewSetMixin, ModelViewSet):
+class AgendamentoViewSet(IdentityMapMixin, AccessViewSetMixin, ModelViewSet):
     """Ações do agendamento de atendimento."""
 
     access_policy = access_policy.AgendamentoAccessPolicy
     serializer_class = AgendamentoSerializer
     filterset_class = filters.AgendamentoFilter
-    queryset = Agendamento.objects.all()
+    # O serializer exibe o nome de exibição do solicitante.
+    queryset = Agendamento.objects.select_related("solicitante__perfil")
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     search_fields = ["assunto", "descricao"]
+    pagination_class = KeysetPagination
     ordering = ["data"]
     ordering_fields = ["data"]
 
     def create(self, request, *args, **kwargs):
         disciplina = Disciplinas.objects.get(id=request.data["disciplina"])
-        s_agen = None
         link = "Link é disponibilizado apenas para agendamentos remotos."
         if request.data["tipo"] == "virtual":
             link = "O link estará disponível após o monitor confirmar o agendamento."
 
-        try:
-            with transaction.atomic():
-                agendamento = Agendamento.objects.create(
-                    link_zoom=link,
-                    tipo=request.data["tipo"],
-                    data=request.data["data"],
-                    assunto=request.data["assunto"],
-                    descricao=request.data["descricao"],
-                    disciplina=disciplina,
-                    solicitante_id=request.user.id,
+        monitor_id = request.data.get("monitor") or None
+        if monitor_id is not None:
+            try:
+                monitor_id = int(monitor_id)
+            except (TypeError, ValueError):
+                monitor_id = None
+            if (
+                monitor_id is None
+                or disciplina.pk
+                not in membership.get_memberships(monitor_id)["monitor"]
+            ):
+                return Response(
+                    data={"monitor": ["O usuário não é monitor dessa disciplina."]},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
-                agendamento.save()
-                s_agen = AgendamentoSerializer(agendamento)
-
-        except IntegrityError:
-            return Response(
-                data={"mensagem": "já existe um agendamento pra essa data e horário"},
-                status=status.HTTP_409_CONFLICT,
-            )
 
-        return Response(data=s_agen.data, status=status.HTTP_201_CREATED)
+        agendamento = Agendamento(
+            link_zoom=link,
+            tipo=request.data["tipo"],
+            data=request.data["data"],
+            assunto=request.data["assunto"],
+            descricao=request.data["descricao"],
+            disciplina=disciplina,
+            solicitante_id=request.user.id,
+            monitor_id=monitor_id,
+            local=request.data.get("local"),
+        )
+        erro = self._salvar(agendamento, request.data)
+        if erro is not None:
+            return erro
+        return Response(
+            data=AgendamentoSerializer(agendamento).data,
+            status=status.HTTP_201_CREATED,
+        )
 
     def partial_update(self, request, pk=None):  # pylint: disable=W0221
-        allowed_keys = ["tipo", "data", "assunto", "descricao", "disciplina", "status"]
-        agendamento = Agendamento.objects.get(id=pk)
+        allowed_keys = ["tipo", "data", "assunto", "descricao", "status", "local"]
+        # A mesma instância já carregada pelas condições da access policy.
+        agendamento = self.get_object()
+        confirmacao = request.data.get("status") == "confirmado"
         if (
-            request.data["status"]
-            and request.data["status"] == "confirmado"
-            and request.user not in agendamento.disciplina.monitores.all()
+            confirmacao
+            and agendamento.disciplina_id
+            not in membership.get_memberships(request.user.pk)["monitor"]
         ):
             return Response(
                 data={
@@ -173,14 +223,138 @@ class AgendamentoViewSet(AccessViewSetMixin, ModelViewSet):
                 status=401,
             )
 
-        with transaction.atomic():
-            for key, value in request.data.items():
-                if key in allowed_keys:
-                    setattr(agendamento, key, value)
-            # agendamento.link_zoom = create_meeting()
-            agendamento.save()
+        for key, value in request.data.items():
+            if key in allowed_keys:
+                setattr(agendamento, key, value)
+        if "disciplina" in request.data:
+            agendamento.disciplina_id = request.data["disciplina"]
+        if confirmacao:
+            # Quem confirma passa a ser o monitor do atendimento.
+            agendamento.monitor_id = request.user.pk
+        erro = self._salvar(agendamento, request.data)
+        if erro is not None:
+            return erro
+        if confirmacao and agendamento.tipo == "virtual":
+            erro = self._criar_reuniao(agendamento)
+            if erro is not None:
+                return erro
         return Response(data={"sucesso"}, status=200)
 
+    @staticmethod
+    def _criar_reuniao(agendamento):
+        """Cria a reunião do Zoom de um agendamento virtual confirmado.
+
+        Roda após o commit da confirmação, para que a chamada à API não segure
+        a transação. Sem credenciais configuradas, o agendamento mantém o aviso
+        criado em ``create``; se o Zoom falhar, a confirmação continua valendo
+        e pode ser repetida para tentar de novo. Retorna a resposta de erro,
+        se houver.
+        """
+        if (agendamento.link_zoom or "").startswith("http") or not zoom.configurado():
+            return None
+        try:
+            agendamento.link_zoom = zoom.create_meeting(
+                agendamento.assunto, agendamento.data, agendamento.duracao
+            )
+        except zoom.ZoomError as e:
+            return Response(
+                data={
+                    "mensagem": f"{e.message}; o agendamento foi confirmado sem link."
+                },
+                status=e.http_error_code,
+            )
+        agendamento.save(update_fields=["link_zoom"])
+        return None
+
+    @staticmethod
+    def _salvar(agendamento, dados):
+        """Salva o agendamento verificando conflitos de horário.
+
+        ``duracao`` é informada em minutos. Retorna a resposta de erro, se
+        houver.
+        """
+        try:
+            if dados.get("duracao") not in (None, ""):
+                agendamento.duracao = timedelta(minutes=int(dados["duracao"]))
+            booking_service.save_agendamento(agendamento)
+        except (TypeError, ValueError):
+            return Response(
+                data={"duracao": ["Informe a duração em minutos."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except ValidationError as e:
+            return Response(data=e.message_dict, status=status.HTTP_400_BAD_REQUEST)
+        except booking_service.ConflitoAgendamento as e:
+            return Response(
+                data={"mensagem": e.message, "conflitos": e.recursos},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except IntegrityError:
+            # Restrições de exclusão do PostgreSQL, em corridas não travadas.
+            return Response(
+                data={"mensagem": booking_service.ConflitoAgendamento.message},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return None
+
+    @action(methods=["GET"], detail=False)
+    def agenda(self, request):
+        """URLs de assinatura das agendas .ics.
+
+        Retorna a agenda do usuário e, com o parâmetro ``disciplina``, a da
+        disciplina, se o usuário for monitor, professor ou aluno dela. As URLs
+        contêm a chave de acesso e não exigem token.
+        """
+        user_id = request.user.pk
+        disciplina_id = None
+        if "disciplina" in request.query_params:
+            try:
+                disciplina_id = int(request.query_params["disciplina"])
+            except ValueError:
+                return Response(
+                    {"erro": "Informe o id da disciplina."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if not calendar_feed.pode_assinar_disciplina(user_id, disciplina_id):
+                return Response(
+                    {"erro": "Você não participa dessa disciplina."},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+
+        segredo = calendar_feed.segredo(user_id, criar=True)
+        namespace = calendar_feed.namespace_usuario(user_id)
+        dados = {
+            "usuario": request.build_absolute_uri(
+                reverse(
+                    "agenda-usuario",
+                    args=[user_id, calendar_feed.chave(namespace, user_id, segredo)],
+                )
+            )
+        }
+        if disciplina_id is not None:
+            namespace = calendar_feed.namespace_disciplina(disciplina_id)
+            dados["disciplina"] = request.build_absolute_uri(
+                reverse(
+                    "agenda-disciplina",
+                    args=[
+                        disciplina_id,
+                        user_id,
+                        calendar_feed.chave(namespace, user_id, segredo),
+                    ],
+                )
+            )
+        return Response(dados)
+
+    @action(methods=["POST"], detail=False, url_path="agenda/renovar")
+    def renovar_agenda(self, request):
+        """Troca a chave das URLs de assinatura das agendas do usuário.
+
+        As URLs anteriores deixam de funcionar; a resposta é a mesma de
+        ``agenda``, com as novas URLs.
+        """
+        calendar_feed.renovar_segredo(request.user.pk)
+        return self.agenda(request)
+
     def perform_create(self, serializer):
         """Salva o agendamento adicionando o usuário atual como solicitante."""
         serializer.save(solicitante=self.request.user)
@@ -194,7 +368,7 @@ class AgendamentoViewSet(AccessViewSetMixin, ModelViewSet):
         return self.access_policy.scope_queryset(self.request, self.queryset)
 
 
-class MonitoresHorarioViewSet(AccessViewSetMixin, ModelViewSet):
+class MonitoresHorarioViewSet(IdentityMapMixin, AccessViewSetMixin, ModelViewSet):
     """Ações do horário de monitoria."""
 
     access_policy = access_policy.MonitoriaAccessPolicy
@@ -239,3 +413,84 @@ class MonitoresHorarioViewSet(AccessViewSetMixin, ModelViewSet):
 
     def get_queryset(self):
         return self.access_policy.scope_queryset(self.request, self.queryset)
+
+    @action(methods=["GET"], detail=False)
+    def disponibilidade(self, request):
+        """Horários livres para agendamento em uma disciplina.
+
+        Parâmetros: ``disciplina`` (obrigatório), ``de`` e ``ate`` (datas no
+        formato AAAA-MM-DD; por padrão, os próximos 7 dias).
+        """
+        try:
+            disciplina_id = int(request.query_params["disciplina"])
+        except (KeyError, ValueError):
+            return Response(
+                {"erro": "Informe o id da disciplina."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            de = parse_date(request.query_params.get("de", "")) or timezone.localdate()
+            ate = parse_date(request.query_params.get("ate", "")) or de + timedelta(
+                days=6
+            )
+        except ValueError:
+            de = ate = None
+        if de is None or ate is None or not de <= ate <= de + PERIODO_MAXIMO:
+            return Response(
+                {
+                    "erro": "Período inválido: use datas AAAA-MM-DD, com no "
+                    f"máximo {PERIODO_MAXIMO.days} dias."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        horarios = availability.get_availability(disciplina_id, de, ate)
+        return Response(
+            {"disciplina": disciplina_id, "de": de, "ate": ate, "horarios": horarios}
+        )
+
+
+def _resposta_agenda(request, namespace, user_id, chave, gerar):
+    """Responde com a agenda .ics do namespace, ou 304 se o cliente já a tem."""
+    if not calendar_feed.verificar_chave(namespace, user_id, chave):
+        raise Http404
+    etag = quote_etag(calendar_feed.etag(namespace))
+    resposta = get_conditional_response(request, etag=etag)
+    if resposta is None:
+        versao, conteudo = calendar_feed.obter_agenda(namespace, gerar)
+        etag = quote_etag(versao)
+        resposta = HttpResponse(conteudo, content_type="text/calendar; charset=utf-8")
+        resposta["Content-Disposition"] = 'inline; filename="agenda.ics"'
+    resposta["ETag"] = etag
+    # A URL contém a chave de acesso: a agenda não pode ir para caches públicos.
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
+
+
+@require_safe
+def agenda_usuario(request, user_id, chave):
+    """Agenda .ics de um usuário: seus horários de monitoria e agendamentos."""
+    return _resposta_agenda(
+        request,
+        calendar_feed.namespace_usuario(user_id),
+        user_id,
+        chave,
+        lambda: calendar_feed.agenda_usuario(user_id),
+    )
+
+
+@require_safe
+def agenda_disciplina(request, disciplina_id, user_id, chave):
+    """Agenda .ics de uma disciplina: horários de monitoria e atendimentos.
+
+    A URL é a de um usuário vinculado à disciplina, verificado a cada acesso.
+    """
+    if not calendar_feed.pode_assinar_disciplina(user_id, disciplina_id):
+        raise Http404
+    return _resposta_agenda(
+        request,
+        calendar_feed.namespace_disciplina(disciplina_id),
+        user_id,
+        chave,
+        lambda: calendar_feed.agenda_disciplina(disciplina_id),
+    )
@@ -1,8 +1,8 @@
 "Arquivo que definem restrições de acesso"
-from rest_access_policy import AccessPolicy
+from accounts.access_policy import CargosAccessPolicy
 
 
-class RespostaAccessPolicy(AccessPolicy):
+class RespostaAccessPolicy(CargosAccessPolicy):
     "Restrições de acesso para o modelo de resposta"
     statements = [
         {
@@ -22,14 +22,12 @@ class RespostaAccessPolicy(AccessPolicy):
         """Função que verifica se asserta que apenas o dono da resposta,
         monitor ou professor pode excluí-la"""
         resposta = view.get_object()
-        return (
-            request.user == resposta.autor
-            or request.user.groups.filter(name="monitor").exists()
-            or request.user.groups.filter(name="professor").exists()
+        return request.user.id == resposta.autor_id or request.user.tem_cargo(
+            "monitor", "professor"
         )
 
 
-class DuvidaAccessPolicy(AccessPolicy):
+class DuvidaAccessPolicy(CargosAccessPolicy):
     "Restrições de acesso para o modelo de duvidas"
     statements = [
         {
@@ -49,8 +47,6 @@ class DuvidaAccessPolicy(AccessPolicy):
         """Função que verifica se asserta que apenas o dono da dúvida,
         monitor ou professor pode excluí-la"""
         duvida = view.get_object()
-        return (
-            request.user == duvida.autor
-            or request.user.groups.filter(name="monitor").exists()
-            or request.user.groups.filter(name="professor").exists()
+        return request.user.id == duvida.autor_id or request.user.tem_cargo(
+            "monitor", "professor"
         )
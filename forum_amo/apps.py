@@ -2,6 +2,20 @@
 APPS forum_app
 """
 from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+
+def reinstalar_busca_textual(sender, using, **kwargs):  # pylint: disable=W0613
+    """Garante a busca textual após migrações que recriam as tabelas do fórum."""
+    # pylint: disable=import-outside-toplevel
+    from forum_amo.search import install_fulltext_search
+
+    connection = connections[using]
+    aplicadas = MigrationRecorder(connection).applied_migrations()
+    if ("forum_amo", "0011_busca_textual") in aplicadas:
+        install_fulltext_search(connection)
 
 
 class ForumAmoConfig(AppConfig):
@@ -9,3 +23,9 @@ class ForumAmoConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "forum_amo"
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel, unused-import
+        from forum_amo import signals  # noqa: F401
+
+        post_migrate.connect(reinstalar_busca_textual, sender=self)
@@ -1,18 +1,279 @@
 """Este módulo contem ações de gerenciamento do fórum."""
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, Exists, F, OuterRef, QuerySet, Value
+
 from accounts import account_management_service
 from forum_amo import models
+from forum_amo.ranking import pontuacao_hot
+from utils import cache as cache_utils
+from utils import identity_map
+from utils.conditional import bump_model_generation
+
+# Gerações das listagens de dúvidas em cache (ver utils.cache): uma por
+# disciplina e uma comum para os dados dos autores exibidos nas listagens.
+NAMESPACE_AUTORES = "forum:autores"
 
 
-def get_resposta(pk: int) -> dict:
-    """Retorna uma Resposta"""
-    resposta_model = models.Resposta.objects.get(pk=pk)
+def get_resposta(pk: int, request=None) -> dict:
+    """Retorna uma Resposta
+
+    Com ``request``, a linha vem do mapa de identidade da requisição (ver
+    utils.identity_map), compartilhada com as access policies.
+    """
+    resposta_model = identity_map.get_object(request, models.Resposta.objects, pk)
+    perfis = account_management_service.get_user_profiles([resposta_model.autor_id])
 
     resposta_dict = {
         "id": resposta_model.id,
         "duvida": resposta_model.duvida_id,
         "data": resposta_model.data.astimezone(),
         "resposta": resposta_model.resposta,
-        "autor": account_management_service.get_user_profile(resposta_model.autor),
+        "autor": perfis.get(resposta_model.autor_id),
     }
 
     return resposta_dict
+
+
+def annotate_viewer_state(queryset: QuerySet, user) -> QuerySet:
+    """Anota nas dúvidas o estado do usuário atual (por exemplo, se já votou).
+
+    O estado é calculado na mesma consulta que busca a página de dúvidas,
+    evitando uma consulta extra por dúvida serializada.
+    """
+    if user is None or not user.is_authenticated:
+        return queryset.annotate(votou=Value(False, output_field=BooleanField()))
+
+    return queryset.annotate(
+        votou=Exists(
+            models.VotoDuvida.objects.filter(usuario_id=user.id, duvida=OuterRef("pk"))
+        )
+    )
+
+
+def namespace_disciplina(disciplina_id) -> str:
+    """Namespace de cache das listagens de dúvidas de uma disciplina."""
+    return f"forum:duvidas:{disciplina_id}"
+
+
+def invalidar_listagem_duvidas(disciplina_id) -> None:
+    """Invalida as listagens de dúvidas em cache de uma disciplina.
+
+    Também troca os validadores HTTP (ETag/Last-Modified) das dúvidas, já que
+    os contadores são alterados com UPDATE, sem disparar sinais.
+    """
+    cache_utils.bump_generation(namespace_disciplina(disciplina_id))
+    bump_model_generation(models.Duvida)
+
+
+def invalidar_autores() -> None:
+    """Invalida as listagens em cache após mudanças nos dados de usuários."""
+    cache_utils.bump_generation(NAMESPACE_AUTORES)
+
+
+def overlay_viewer_state(duvidas: list, user) -> None:
+    """Preenche o estado do usuário atual em dúvidas já serializadas.
+
+    Usado sobre respostas compartilhadas entre usuários (em cache), que são
+    geradas sem esse estado. Faz uma única consulta para toda a página.
+    """
+    votadas = set()
+    if user is not None and user.is_authenticated and duvidas:
+        votadas = set(
+            models.VotoDuvida.objects.filter(
+                usuario_id=user.id, duvida_id__in=[duvida["id"] for duvida in duvidas]
+            ).values_list("duvida_id", flat=True)
+        )
+    for duvida in duvidas:
+        duvida["votou"] = duvida["id"] in votadas
+
+
+def _somar_votos(duvida_id: int, delta: int) -> None:
+    """Atualiza o contador de votos no banco e, em seguida, a pontuação "hot".
+
+    O contador é somado com um UPDATE atômico (F("votos")); atualizar_hot então
+    lê a linha e grava a pontuação em um segundo UPDATE. Devem ser as últimas
+    instruções da transação do voto, para que o bloqueio da linha da dúvida
+    dure o mínimo possível em dúvidas muito votadas.
+    """
+    models.Duvida.objects.filter(pk=duvida_id).update(votos=F("votos") + delta)
+    atualizar_hot(duvida_id)
+
+
+def atualizar_hot(duvida_id: int) -> None:
+    """Recalcula a pontuação "hot" de uma dúvida após mudar votos ou respostas.
+
+    Deve rodar na mesma transação que alterou os contadores: a linha da dúvida
+    já está bloqueada pelo UPDATE, então a leitura enxerga os valores finais.
+    Também invalida as listagens em cache da disciplina da dúvida.
+    """
+    linha = (
+        models.Duvida.objects.filter(pk=duvida_id)
+        .values("votos", "quantidade_comentarios", "criada_em", "disciplina_id")
+        .first()
+    )
+    if linha is not None:
+        disciplina_id = linha.pop("disciplina_id")
+        models.Duvida.objects.filter(pk=duvida_id).update(hot=pontuacao_hot(**linha))
+        invalidar_listagem_duvidas(disciplina_id)
+
+
+def _apagar_voto(usuario, duvida_id: int) -> int:
+    """Apaga o voto do usuário e retorna quantos votos foram removidos."""
+    _, removidos = models.VotoDuvida.objects.filter(
+        usuario_id=usuario.id, duvida_id=duvida_id
+    ).delete()
+    return removidos.get(models.VotoDuvida._meta.label, 0)
+
+
+def registrar_voto(usuario, duvida_id: int) -> models.VotoDuvida:
+    """Registra o voto do usuário em uma dúvida.
+
+    Raises:
+        IntegrityError: o usuário já votou na dúvida ou ela não existe.
+    """
+    with transaction.atomic():
+        voto = models.VotoDuvida.objects.create(
+            usuario_id=usuario.id, duvida_id=duvida_id
+        )
+        _somar_votos(duvida_id, 1)
+    return voto
+
+
+def remover_voto(usuario, duvida_id: int) -> None:
+    """Remove o voto do usuário em uma dúvida.
+
+    Raises:
+        VotoDuvida.DoesNotExist: o usuário não votou na dúvida.
+    """
+    with transaction.atomic():
+        if not _apagar_voto(usuario, duvida_id):
+            raise models.VotoDuvida.DoesNotExist()
+        _somar_votos(duvida_id, -1)
+
+
+def definir_voto(usuario, duvida_id: int, votou: bool) -> dict:
+    """Define se o usuário vota ou não na dúvida. A operação é idempotente.
+
+    Returns:
+        O estado resultante: se o usuário votou e o total de votos da dúvida.
+    """
+    with transaction.atomic():
+        if votou:
+            try:
+                with transaction.atomic():
+                    models.VotoDuvida.objects.create(
+                        usuario_id=usuario.id, duvida_id=duvida_id
+                    )
+                delta = 1
+            except IntegrityError:
+                # Voto já existente (inclusive de uma requisição concorrente).
+                delta = 0
+        else:
+            delta = -_apagar_voto(usuario, duvida_id)
+
+        if delta:
+            _somar_votos(duvida_id, delta)
+
+    votos = models.Duvida.objects.values_list("votos", flat=True).get(pk=duvida_id)
+    return {"votou": votou, "votos": votos}
+
+
+def _recalcular_contador(campo: str, origem, tamanho_lote: int) -> int:
+    """Recalcula um contador de Duvida a partir das linhas do modelo de origem.
+
+    As dúvidas são processadas em lotes de ids consecutivos. Cada lote faz uma
+    única consulta agregada (GROUP BY duvida_id) e grava apenas as dúvidas cujo
+    contador divergiu. As linhas do lote ficam bloqueadas durante a correção
+    para não sobrescrever atualizações concorrentes.
+
+    Returns:
+        Quantidade de dúvidas corrigidas.
+    """
+    corrigidas = 0
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                models.Duvida.objects.select_for_update()
+                .filter(pk__gt=ultimo_id)
+                .order_by("pk")
+                .values_list("pk", campo, "disciplina_id")[:tamanho_lote]
+            )
+            if not lote:
+                return corrigidas
+
+            contagens = dict(
+                origem.objects.filter(
+                    duvida_id__gte=lote[0][0], duvida_id__lte=lote[-1][0]
+                )
+                .values("duvida_id")
+                .annotate(total=Count("pk"))
+                .values_list("duvida_id", "total")
+            )
+            divergentes = [
+                models.Duvida(
+                    pk=pk, disciplina_id=disciplina_id, **{campo: contagens.get(pk, 0)}
+                )
+                for pk, atual, disciplina_id in lote
+                if atual != contagens.get(pk, 0)
+            ]
+            models.Duvida.objects.bulk_update(divergentes, [campo])
+            for disciplina_id in {duvida.disciplina_id for duvida in divergentes}:
+                invalidar_listagem_duvidas(disciplina_id)
+
+        corrigidas += len(divergentes)
+        ultimo_id = lote[-1][0]
+
+
+def recalcular_votos(tamanho_lote: int = 1000) -> int:
+    """Recalcula Duvida.votos a partir de VotoDuvida."""
+    return _recalcular_contador("votos", models.VotoDuvida, tamanho_lote)
+
+
+def recalcular_comentarios(tamanho_lote: int = 1000) -> int:
+    """Recalcula Duvida.quantidade_comentarios a partir de Resposta."""
+    return _recalcular_contador("quantidade_comentarios", models.Resposta, tamanho_lote)
+
+
+def recalcular_hot(tamanho_lote: int = 1000) -> int:
+    """Recalcula a pontuação "hot" de todas as dúvidas, em lotes de ids.
+
+    Corrige pontuações que ficaram para trás (por exemplo, após recalcular os
+    contadores ou mudar a fórmula) e grava apenas as que divergiram.
+
+    Returns:
+        Quantidade de dúvidas corrigidas.
+    """
+    corrigidas = 0
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                models.Duvida.objects.select_for_update()
+                .filter(pk__gt=ultimo_id)
+                .order_by("pk")
+                .only(
+                    "votos",
+                    "quantidade_comentarios",
+                    "criada_em",
+                    "hot",
+                    "disciplina_id",
+                )[:tamanho_lote]
+            )
+            if not lote:
+                return corrigidas
+
+            divergentes = []
+            for duvida in lote:
+                hot = pontuacao_hot(
+                    duvida.votos, duvida.quantidade_comentarios, duvida.criada_em
+                )
+                if duvida.hot != hot:
+                    duvida.hot = hot
+                    divergentes.append(duvida)
+            models.Duvida.objects.bulk_update(divergentes, ["hot"])
+            for disciplina_id in {duvida.disciplina_id for duvida in divergentes}:
+                invalidar_listagem_duvidas(disciplina_id)
+
+        corrigidas += len(divergentes)
+        ultimo_id = lote[-1].pk
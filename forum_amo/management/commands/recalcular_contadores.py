@@ -0,0 +1,32 @@
+"""Comando para recalcular os contadores desnormalizados do fórum."""
+from django.core.management.base import BaseCommand
+
+from forum_amo import forum_service
+
+
+class Command(BaseCommand):
+    """Recalcula os contadores das dúvidas a partir das tabelas de origem."""
+
+    help = (
+        "Recalcula os contadores de votos e comentários e a pontuação hot "
+        "das dúvidas em lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=1000,
+            help="Quantidade de dúvidas processadas por lote (padrão: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        contadores = [
+            ("Votos", forum_service.recalcular_votos),
+            ("Comentários", forum_service.recalcular_comentarios),
+            # Por último, para refletir os contadores corrigidos acima.
+            ("Hot", forum_service.recalcular_hot),
+        ]
+        for nome, recalcular in contadores:
+            corrigidas = recalcular(tamanho_lote=options["lote"])
+            self.stdout.write(f"{nome}: {corrigidas} dúvida(s) corrigida(s).")
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from forum_amo.search import install_fulltext_search, uninstall_fulltext_search
+
+
+def instalar(apps, schema_editor):  # pylint: disable=unused-argument
+    install_fulltext_search(schema_editor.connection)
+
+
+def desinstalar(apps, schema_editor):  # pylint: disable=unused-argument
+    uninstall_fulltext_search(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_amo", "0010_remove_duvida_resposta_correta_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
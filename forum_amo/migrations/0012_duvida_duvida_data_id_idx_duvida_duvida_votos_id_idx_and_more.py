@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_amo", "0011_busca_textual"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="duvida",
+            index=models.Index(fields=["data", "id"], name="duvida_data_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="duvida",
+            index=models.Index(fields=["votos", "id"], name="duvida_votos_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="resposta",
+            index=models.Index(
+                fields=["duvida", "data", "id"], name="resposta_duvida_data_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:15
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+# Cópia da fórmula de forum_amo.ranking no momento desta migração, para que
+# mudanças futuras na fórmula não alterem o que a migração grava.
+EPOCA_HOT = datetime(2022, 1, 1, tzinfo=timezone.utc)
+INTERVALO_HOT = 45000
+PESO_RESPOSTA = 2
+
+
+def pontuacao_hot(votos, quantidade_comentarios, data):
+    engajamento = votos + PESO_RESPOSTA * quantidade_comentarios
+    ordem = math.log10(max(abs(engajamento), 1))
+    sinal = (engajamento > 0) - (engajamento < 0)
+    segundos = (data - EPOCA_HOT).total_seconds()
+    return round(sinal * ordem + segundos / INTERVALO_HOT, 7)
+
+
+def calcular_hot(apps, schema_editor):
+    Duvida = apps.get_model("forum_amo", "Duvida")
+    duvidas = list(Duvida.objects.only("votos", "quantidade_comentarios", "data"))
+    for duvida in duvidas:
+        duvida.hot = pontuacao_hot(
+            duvida.votos, duvida.quantidade_comentarios, duvida.data
+        )
+    Duvida.objects.bulk_update(duvidas, ["hot"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "forum_amo",
+            "0012_duvida_duvida_data_id_idx_duvida_duvida_votos_id_idx_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="duvida",
+            name="hot",
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(calcular_hot, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="duvida",
+            index=models.Index(fields=["hot", "id"], name="duvida_hot_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="duvida",
+            index=models.Index(
+                fields=["disciplina", "hot", "id"], name="duvida_disciplina_hot_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.db.models import F, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Least
+import django.utils.timezone
+
+# Cópia da fórmula de forum_amo.ranking no momento desta migração, para que
+# mudanças futuras na fórmula não alterem o que a migração grava.
+EPOCA_HOT = datetime(2022, 1, 1, tzinfo=timezone.utc)
+INTERVALO_HOT = 45000
+PESO_RESPOSTA = 2
+
+
+def pontuacao_hot(votos, quantidade_comentarios, criada_em):
+    engajamento = votos + PESO_RESPOSTA * quantidade_comentarios
+    ordem = math.log10(max(abs(engajamento), 1))
+    sinal = (engajamento > 0) - (engajamento < 0)
+    segundos = (criada_em - EPOCA_HOT).total_seconds()
+    return round(sinal * ordem + segundos / INTERVALO_HOT, 7)
+
+
+def preencher_criada_em(apps, schema_editor):
+    """Estima a criação das dúvidas existentes e recalcula a pontuação "hot".
+
+    "data" é a última edição; a primeira resposta ou o primeiro voto, se mais
+    antigos, limitam melhor o momento da criação.
+    """
+    Duvida = apps.get_model("forum_amo", "Duvida")
+    Resposta = apps.get_model("forum_amo", "Resposta")
+    VotoDuvida = apps.get_model("forum_amo", "VotoDuvida")
+
+    def primeiro(model, campo):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(duvida_id=OuterRef("pk"))
+                .values("duvida_id")
+                .annotate(primeiro=Min(campo))
+                .values("primeiro")
+            ),
+            F("data"),
+        )
+
+    Duvida.objects.update(
+        criada_em=Least(
+            F("data"), primeiro(Resposta, "data"), primeiro(VotoDuvida, "data_criada")
+        )
+    )
+
+    duvidas = list(Duvida.objects.only("votos", "quantidade_comentarios", "criada_em"))
+    for duvida in duvidas:
+        duvida.hot = pontuacao_hot(
+            duvida.votos, duvida.quantidade_comentarios, duvida.criada_em
+        )
+    Duvida.objects.bulk_update(duvidas, ["hot"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forum_amo", "0013_duvida_hot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="duvida",
+            name="criada_em",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.RunPython(preencher_criada_em, migrations.RunPython.noop),
+    ]
@@ -3,9 +3,15 @@ Models para o app forum_app
 """
 
 from django.db import models
+from django.utils import timezone
 
 from accounts.models import CustomUser
 from core.models import Disciplinas
+from forum_amo.ranking import pontuacao_hot
+
+# Colunas de Duvida escritas apenas por forum_service (votos e respostas) e a
+# pontuação derivada delas; ver Duvida.save.
+CAMPOS_CONTADORES = {"votos", "quantidade_comentarios", "hot"}
 
 
 class Duvida(models.Model):
@@ -14,7 +20,9 @@ class Duvida(models.Model):
 
     titulo = models.CharField(max_length=200)
     descricao = models.TextField(max_length=550)
+    # Última alteração; a idade usada no ranqueamento vem de criada_em.
     data = models.DateTimeField(auto_now=True)
+    criada_em = models.DateTimeField(default=timezone.now, editable=False)
     disciplina = models.ForeignKey(Disciplinas, on_delete=models.CASCADE)
     # Ao usuário criar a dúvida, ainda não haverá respostas,
     # assim não é possivel adicionar uma resposta_correta.
@@ -25,10 +33,53 @@ class Duvida(models.Model):
     autor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=False)
     votos = models.IntegerField(default=0)
     quantidade_comentarios = models.PositiveIntegerField(null=False, default=0)
+    # Pontuação de ranqueamento, ver forum_amo.ranking.
+    hot = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            # Paginação por cursor das ordenações disponíveis na listagem.
+            models.Index(fields=["data", "id"], name="duvida_data_id_idx"),
+            models.Index(fields=["votos", "id"], name="duvida_votos_id_idx"),
+            models.Index(fields=["hot", "id"], name="duvida_hot_id_idx"),
+            models.Index(
+                fields=["disciplina", "hot", "id"], name="duvida_disciplina_hot_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.disciplina} - Dúvida: {self.titulo}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Disciplina como carregada do banco, para invalidar as listagens da
+        # disciplina anterior se a edição a trocar (ver forum_amo.signals).
+        instance._disciplina_carregada = instance.__dict__.get("disciplina_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding and update_fields is None:
+            self.hot = pontuacao_hot(
+                self.votos, self.quantidade_comentarios, self.criada_em
+            )
+        elif update_fields is None:
+            # Os contadores são mantidos por forum_service com UPDATEs atômicos;
+            # gravar a linha inteira os sobrescreveria com os valores carregados,
+            # que podem já estar defasados (um voto entre a leitura e a edição).
+            kwargs["update_fields"] = [
+                campo.name
+                for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in CAMPOS_CONTADORES
+            ]
+        elif CAMPOS_CONTADORES.intersection(update_fields):
+            self.hot = pontuacao_hot(
+                self.votos, self.quantidade_comentarios, self.criada_em
+            )
+            kwargs["update_fields"] = {*update_fields, "hot"}
+        super().save(*args, **kwargs)
+
 
 class Resposta(models.Model):
     """Modelo para respostas às dúvidas"""
@@ -38,6 +89,13 @@ class Resposta(models.Model):
     resposta = models.TextField(max_length=750)
     data = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["duvida", "data", "id"], name="resposta_duvida_data_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"Dúvida_id: {self.duvida}.Data: {self.data} Autor_id: {self.autor}"
 
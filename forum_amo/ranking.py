@@ -0,0 +1,55 @@
+"""Pontuação "hot" das dúvidas do fórum.
+
+A pontuação segue o modelo de ranqueamento do Reddit: o logaritmo do
+engajamento (votos e respostas) somado a um termo que cresce com a data de
+criação da dúvida (edições não a rejuvenescem). Como o termo de tempo é fixo
+para cada dúvida, a ordem relativa entre duas dúvidas não muda com a passagem
+do tempo; por isso a pontuação pode ser gravada e indexada, e só precisa ser
+recalculada quando os votos ou as respostas mudam.
+"""
+import math
+from datetime import datetime, timezone
+
+from rest_framework.filters import OrderingFilter
+
+# Referência do termo de tempo; valores menores só deslocam todas as pontuações.
+EPOCA_HOT = datetime(2022, 1, 1, tzinfo=timezone.utc)
+# Segundos necessários para que uma dúvida nova equivalha a 10x o engajamento.
+INTERVALO_HOT = 45000
+# Peso de uma resposta em relação a um voto.
+PESO_RESPOSTA = 2
+
+
+def pontuacao_hot(
+    votos: int, quantidade_comentarios: int, criada_em: datetime
+) -> float:
+    """Calcula a pontuação "hot" de uma dúvida."""
+    engajamento = votos + PESO_RESPOSTA * quantidade_comentarios
+    ordem = math.log10(max(abs(engajamento), 1))
+    sinal = (engajamento > 0) - (engajamento < 0)
+    segundos = (criada_em - EPOCA_HOT).total_seconds()
+    return round(sinal * ordem + segundos / INTERVALO_HOT, 7)
+
+
+class HotOrderingFilter(OrderingFilter):
+    """OrderingFilter que entende ``ordering=hot`` como "mais quentes primeiro".
+
+    A ordenação é feita pela coluna ``hot`` já calculada, usando o índice,
+    sem pontuar as dúvidas a cada requisição.
+    """
+
+    campo_hot = "hot"
+
+    def get_ordering(self, request, queryset, view):
+        ordenacao = super().get_ordering(request, queryset, view)
+        if not ordenacao:
+            return ordenacao
+        return [
+            f"-{self.campo_hot}" if campo == self.campo_hot else campo
+            for campo in ordenacao
+        ]
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        validos = super().remove_invalid_fields(queryset, fields, view, request)
+        # "-hot" seria a ordem inversa ("mais frias primeiro"), que não é exposta.
+        return [campo for campo in validos if campo != f"-{self.campo_hot}"]
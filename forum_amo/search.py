@@ -0,0 +1,152 @@
+"""Busca textual indexada para as dúvidas e respostas do fórum.
+
+No PostgreSQL cada tabela ganha uma coluna ``busca`` (tsvector gerado com o
+dicionário 'portuguese') com índice GIN. No SQLite, usado em desenvolvimento e
+nos testes, é criada uma tabela virtual FTS5 ``<tabela>_fts`` mantida por
+gatilhos. Em outros bancos a busca recai no ``icontains`` do SearchFilter.
+"""
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+# Colunas indexadas de cada tabela. A primeira coluna recebe peso maior na
+# classificação do PostgreSQL.
+COLUNAS_BUSCA = {
+    "forum_amo_duvida": ("titulo", "descricao"),
+    "forum_amo_resposta": ("resposta",),
+}
+
+
+def _instalar_postgresql(cursor, tabela, colunas):
+    pesos = "ABCD"
+    vetor = " || ".join(
+        f"setweight(to_tsvector('portuguese', coalesce({coluna}, '')), '{peso}')"
+        for coluna, peso in zip(colunas, pesos)
+    )
+    cursor.execute(
+        f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS busca tsvector "
+        f"GENERATED ALWAYS AS ({vetor}) STORED"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {tabela}_busca_gin ON {tabela} USING gin (busca)"
+    )
+
+
+def _instalar_sqlite(cursor, tabela, colunas):
+    fts = f"{tabela}_fts"
+    lista = ", ".join(colunas)
+    novos = ", ".join(f"new.{coluna}" for coluna in colunas)
+    antigos = ", ".join(f"old.{coluna}" for coluna in colunas)
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({lista}, "
+        f"content='{tabela}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN "
+        f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos}); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) "
+        f"VALUES ('delete', old.id, {antigos}); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabela} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) "
+        f"VALUES ('delete', old.id, {antigos}); "
+        f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos}); END"
+    )
+    # As alterações de esquema do SQLite recriam a tabela e descartam os
+    # gatilhos, então o índice é reconstruído sempre que é (re)instalado.
+    cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def install_fulltext_search(connection) -> None:
+    """Cria (ou recria) as estruturas de busca textual. A operação é idempotente."""
+    if connection.vendor == "postgresql":
+        instalar = _instalar_postgresql
+    elif connection.vendor == "sqlite":
+        instalar = _instalar_sqlite
+    else:
+        return
+
+    with connection.cursor() as cursor:
+        for tabela, colunas in COLUNAS_BUSCA.items():
+            instalar(cursor, tabela, colunas)
+
+
+def uninstall_fulltext_search(connection) -> None:
+    """Remove as estruturas de busca textual."""
+    with connection.cursor() as cursor:
+        for tabela in COLUNAS_BUSCA:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"ALTER TABLE {tabela} DROP COLUMN IF EXISTS busca")
+            elif connection.vendor == "sqlite":
+                for gatilho in ("ai", "ad", "au"):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {tabela}_fts_{gatilho}")
+                cursor.execute(f"DROP TABLE IF EXISTS {tabela}_fts")
+
+
+class FullTextSearchFilter(SearchFilter):
+    """Filtro de busca que usa o índice textual e ordena por relevância.
+
+    Deve vir depois do OrderingFilter em ``filter_backends``: quando o cliente
+    não pede uma ordenação explícita, os resultados mais relevantes vêm
+    primeiro (com a ordenação padrão da view como desempate).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        termos = self.get_search_terms(request)
+        tabela = queryset.model._meta.db_table
+        vendor = connections[queryset.db].vendor
+        if not termos or tabela not in COLUNAS_BUSCA:
+            return super().filter_queryset(request, queryset, view)
+
+        if vendor == "postgresql":
+            queryset = self._buscar_postgresql(queryset, tabela, termos)
+        elif vendor == "sqlite":
+            queryset = self._buscar_sqlite(queryset, tabela, termos)
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        if not request.query_params.get(OrderingFilter.ordering_param):
+            queryset = queryset.order_by("-relevancia", *queryset.query.order_by)
+        return queryset
+
+    @staticmethod
+    def _buscar_postgresql(queryset, tabela, termos):
+        consulta = "plainto_tsquery('portuguese', %s)"
+        texto = " ".join(termos)
+        return queryset.annotate(
+            relevancia=RawSQL(
+                f'ts_rank("{tabela}"."busca", {consulta})',
+                [texto],
+                output_field=FloatField(),
+            )
+        ).filter(
+            RawSQL(
+                f'"{tabela}"."busca" @@ {consulta}',
+                [texto],
+                output_field=BooleanField(),
+            )
+        )
+
+    @staticmethod
+    def _buscar_sqlite(queryset, tabela, termos):
+        fts = f"{tabela}_fts"
+        # Cada termo vira uma frase entre aspas com busca por prefixo, o que
+        # neutraliza a sintaxe de consulta do FTS5 vinda do usuário.
+        expressao = " ".join(
+            '"{}"*'.format(termo.replace('"', '""')) for termo in termos
+        )
+        return queryset.annotate(
+            relevancia=RawSQL(
+                f'SELECT -rank FROM {fts} WHERE {fts} MATCH %s AND rowid = "{tabela}"."id"',
+                [expressao],
+                output_field=FloatField(),
+            )
+        ).filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [expressao])
+        )
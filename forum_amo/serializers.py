@@ -5,6 +5,7 @@ from rest_framework import serializers
 
 from accounts.serializer import UserSerializer
 from core.models import Disciplinas
+from forum_amo import forum_service
 from forum_amo.models import Duvida, Resposta, VotoDuvida, Denuncia
 
 
@@ -12,6 +13,9 @@ class DuvidaVotouField(serializers.Field):
     """Campo para informar se o usuário atual votou na dúvida."""
 
     def get_attribute(self, instance):
+        # Valor anotado pela view (ver forum_service.annotate_viewer_state).
+        if hasattr(instance, "votou"):
+            return instance.votou
         try:
             return VotoDuvida.objects.filter(
                 usuario=self.context["request"].user, duvida=instance
@@ -92,14 +96,14 @@ class RespostaSerializer(serializers.ModelSerializer):
         fields = ["id", "duvida", "resposta", "data", "autor"]
 
     def create(self, validated_data):
-        nova_resposta = Resposta.objects.create(
-            autor_id=self.context["request"].user.id,
-            duvida_id=validated_data["duvida"].id,
-            resposta=validated_data["resposta"],
-        )
-        duvida = Duvida.objects.get(id=validated_data["duvida"].id)
-        duvida.quantidade_comentarios += 1
-        duvida.save()
+        # O contador de comentários da dúvida é atualizado pelo sinal
+        # post_save de Resposta, na mesma transação da criação.
+        with transaction.atomic():
+            nova_resposta = Resposta.objects.create(
+                autor_id=self.context["request"].user.id,
+                duvida_id=validated_data["duvida"].id,
+                resposta=validated_data["resposta"],
+            )
         return nova_resposta
 
 
@@ -114,25 +118,10 @@ class VotoDuvidaSerializer(serializers.ModelSerializer):
         fields = ["id", "usuario", "duvida"]
 
     def create(self, validated_data):
-        with transaction.atomic():
-            voto = VotoDuvida.objects.create(
-                usuario_id=validated_data["usuario"].id,
-                duvida_id=validated_data["duvida"],
-            )
-            duvida = Duvida.objects.get(pk=validated_data["duvida"])
-            duvida.votos += 1
-            duvida.save()
-
-        return voto
+        return forum_service.registrar_voto(
+            validated_data["usuario"], validated_data["duvida"]
+        )
 
     def destroy(self, validated_data):
         "Exclui o voto de um usuário em uma dúvida"
-        with transaction.atomic():
-            voto = VotoDuvida.objects.get(
-                usuario=validated_data["usuario"].id,
-                duvida=validated_data["duvida"],
-            )
-            voto.delete()
-            duvida = Duvida.objects.get(pk=validated_data["duvida"])
-            duvida.votos -= 1
-            duvida.save()
+        forum_service.remover_voto(validated_data["usuario"], validated_data["duvida"])
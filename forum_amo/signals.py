@@ -0,0 +1,114 @@
+"""Sinais que mantêm os dados desnormalizados do fórum consistentes."""
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import CustomUser, Perfil
+from core.models import Curso
+from forum_amo import forum_service
+from forum_amo.models import Duvida, Resposta
+
+
+@receiver(post_save, sender=Resposta)
+def contar_resposta_criada(
+    sender, instance, created, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    """Incrementa Duvida.quantidade_comentarios quando uma resposta é criada."""
+    if created and not raw:
+        Duvida.objects.filter(pk=instance.duvida_id).update(
+            quantidade_comentarios=F("quantidade_comentarios") + 1
+        )
+        forum_service.atualizar_hot(instance.duvida_id)
+
+
+@receiver(post_delete, sender=Resposta)
+def contar_resposta_removida(
+    sender, instance, origin=None, **kwargs
+):  # pylint: disable=unused-argument
+    """Decrementa Duvida.quantidade_comentarios quando uma resposta é removida.
+
+    Cobre também as remoções em cascata (por exemplo, ao remover o autor).
+    Quando a própria dúvida está sendo removida não há o que atualizar.
+    """
+    if isinstance(origin, Duvida) and origin.pk == instance.duvida_id:
+        return
+    Duvida.objects.filter(pk=instance.duvida_id).update(
+        quantidade_comentarios=Greatest(F("quantidade_comentarios") - 1, 0)
+    )
+    forum_service.atualizar_hot(instance.duvida_id)
+
+
+@receiver(pre_save, sender=Duvida)
+def guardar_disciplina_anterior(
+    sender, instance, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    """Guarda a disciplina atual da dúvida, caso a edição a troque."""
+    # pylint: disable=protected-access
+    if not instance.pk or raw:
+        return
+    anterior = instance.__dict__.get("_disciplina_carregada")
+    if anterior is None:
+        # Instância não carregada do banco (ou sem a disciplina).
+        anterior = (
+            Duvida.objects.filter(pk=instance.pk)
+            .values_list("disciplina_id", flat=True)
+            .first()
+        )
+    instance._disciplina_anterior = anterior
+
+
+@receiver(post_save, sender=Duvida)
+@receiver(post_delete, sender=Duvida)
+def invalidar_listagem_duvida(sender, instance, **kwargs):  # pylint: disable=W0613
+    """Invalida as listagens em cache da disciplina da dúvida alterada."""
+    disciplinas = {
+        instance.disciplina_id,
+        getattr(instance, "_disciplina_anterior", None),
+    }
+    for disciplina_id in disciplinas - {None}:
+        forum_service.invalidar_listagem_duvidas(disciplina_id)
+    # O banco agora tem a disciplina atual.
+    instance._disciplina_carregada = (  # pylint: disable=protected-access
+        instance.disciplina_id
+    )
+
+
+@receiver(m2m_changed, sender=Duvida.resposta_correta.through)
+def invalidar_resposta_correta(
+    sender, instance, action, reverse, **kwargs
+):  # pylint: disable=unused-argument
+    """Invalida as listagens ao marcar ou desmarcar respostas corretas."""
+    if action.startswith("post_") and not reverse:
+        forum_service.invalidar_listagem_duvidas(instance.disciplina_id)
+
+
+@receiver(post_save, sender=Perfil)
+def invalidar_perfil(sender, **kwargs):  # pylint: disable=unused-argument
+    """Os perfis dos autores fazem parte das listagens em cache."""
+    forum_service.invalidar_autores()
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidar_usuario(
+    sender, update_fields=None, raw=False, **kwargs
+):  # pylint: disable=unused-argument
+    """Os dados dos usuários (e-mail, cargos) aparecem nos autores."""
+    # O login só atualiza last_login, que não aparece nas listagens.
+    if raw or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    forum_service.invalidar_autores()
+
+
+@receiver(post_save, sender=Curso)
+@receiver(post_delete, sender=Curso)
+def invalidar_curso(sender, **kwargs):  # pylint: disable=unused-argument
+    """O nome do curso faz parte dos perfis dos autores."""
+    forum_service.invalidar_autores()
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def invalidar_cargos(sender, action, **kwargs):  # pylint: disable=unused-argument
+    """Os cargos dos autores fazem parte das listagens em cache."""
+    if action.startswith("post_"):
+        forum_service.invalidar_autores()
@@ -1,18 +1,32 @@
 """
 TESTS forum_app
 """
+import io
 import json
-
+import threading
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from accounts.models import CustomUser, EmailActivationToken
+from accounts import account_management_service
+from accounts.models import CustomUser, EmailActivationToken, Perfil
 from core.models import Disciplinas
 from core import models as core_models
+from forum_amo import forum_service, zoom
 from forum_amo import models as forum_models
 from forum_amo.models import Duvida, Resposta
+from forum_amo.ranking import pontuacao_hot
 from forum_amo.serializers import DuvidaSerializer, RespostaSerializer
+from utils import conditional
 
 
 class DuvidaTestes(APITestCase):
@@ -155,7 +169,6 @@ class RespostaTestes(APITestCase):
             descricao="Probabilidade e Estatística",
             disciplina=disciplina,
             autor=self.user,
-            quantidade_comentarios=1,
         )
         self.resposta = Resposta.objects.create(
             autor=self.user, duvida=self.duvida, resposta="Esforce-se mais"
@@ -223,6 +236,73 @@ class RespostaTestes(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_quantidade_comentarios(self):
+        """Testa a manutenção do contador de comentários da dúvida"""
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.quantidade_comentarios, 1)
+
+        self.client.post(
+            reverse("respostas-list"),
+            {"resposta": "Revise o capítulo 3", "duvida": self.duvida.id},
+            HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+        )
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.quantidade_comentarios, 2)
+
+        self.client.delete(
+            reverse("respostas-detail", args=[self.resposta.pk]),
+            HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+        )
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.quantidade_comentarios, 1)
+
+    def test_quantidade_comentarios_edicao_da_duvida(self):
+        """Editar a dúvida ou marcar a resposta correta não reescreve o contador"""
+        defasada = Duvida.objects.get(pk=self.duvida.pk)
+        nova = Resposta.objects.create(
+            autor=self.user, duvida=self.duvida, resposta="Revise o capítulo 3"
+        )
+
+        defasada.titulo = "Distribuição exponencial"
+        defasada.save()
+        response = self.client.patch(
+            reverse("duvidas-detail", args=[self.duvida.pk]),
+            {"descricao": "Probabilidade"},
+            HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            reverse("duvidas-correta", args=[self.duvida.pk]),
+            {"id": nova.pk},
+            HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.titulo, "Distribuição exponencial")
+        self.assertEqual(self.duvida.quantidade_comentarios, 2)
+        self.assertEqual(self.duvida.hot, pontuacao_hot(0, 2, self.duvida.criada_em))
+
+    def test_quantidade_comentarios_remocao_em_cascata(self):
+        """Respostas removidas em cascata também atualizam o contador"""
+        outro = CustomUser.objects.create_user(
+            email="outro@localhost.com", password="qwe123456"
+        )
+        Resposta.objects.create(
+            autor=outro, duvida=self.duvida, resposta="Veja o livro"
+        )
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.quantidade_comentarios, 2)
+
+        outro.delete()
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.quantidade_comentarios, 1)
+
+        Duvida.objects.filter(pk=self.duvida.pk).update(quantidade_comentarios=9)
+        call_command("recalcular_contadores", stdout=io.StringIO())
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.quantidade_comentarios, 1)
+
     def test_buscar_resposta_pela_duvidas(self):
         """Testa as respostas ao buscá-las pelo id da dúvida"""
 
@@ -418,6 +498,30 @@ class VotarNaDuvidaTest(APITestCase):
         duvida.refresh_from_db()
         self.assertEqual(duvida.votos, 0)
 
+    def test_edicao_preserva_votos(self):
+        """Editar a dúvida com uma instância carregada antes do voto não o perde"""
+        usuario = CustomUser.objects.first()
+        defasada = Duvida.objects.first()
+        url = reverse("duvidas-votar", args=[defasada.pk])
+        response = self.client.post(
+            url, HTTP_AUTHORIZATION=f"Token {usuario.auth_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        defasada.titulo = "Prova 1"
+        defasada.save()
+        response = self.client.patch(
+            reverse("duvidas-detail", args=[defasada.pk]),
+            {"descricao": "Quais capítulos cairão na prova 1?"},
+            HTTP_AUTHORIZATION=f"Token {usuario.auth_token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        duvida = Duvida.objects.get(pk=defasada.pk)
+        self.assertEqual(duvida.titulo, "Prova 1")
+        self.assertEqual(duvida.votos, 1)
+        self.assertEqual(duvida.hot, pontuacao_hot(1, 1, duvida.criada_em))
+
     def test_voto_ja_existe(self):
         """Testa o usuário votar novamente em uma dúvida"""
         usuario = CustomUser.objects.first()
@@ -477,3 +581,877 @@ class VotarNaDuvidaTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         duvida.refresh_from_db()
         self.assertEqual(duvida.votos, 1)
+
+    def test_definir_voto_idempotente(self):
+        """Testa o PUT idempotente que define o voto do usuário"""
+        usuario = CustomUser.objects.first()
+        duvida = Duvida.objects.first()
+        url = reverse("duvidas-votar", args=[duvida.pk])
+
+        for _ in range(2):
+            response = self.client.put(
+                url,
+                {"votou": True},
+                format="json",
+                HTTP_AUTHORIZATION=f"Token {usuario.auth_token}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), {"votou": True, "votos": 1})
+
+        for _ in range(2):
+            response = self.client.put(
+                url,
+                {"votou": False},
+                format="json",
+                HTTP_AUTHORIZATION=f"Token {usuario.auth_token}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), {"votou": False, "votos": 0})
+
+        response = self.client.put(
+            url, {}, format="json", HTTP_AUTHORIZATION=f"Token {usuario.auth_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recalcular_votos(self):
+        """Testa o recálculo dos contadores de votos em lote"""
+        usuario = CustomUser.objects.first()
+        duvida = Duvida.objects.first()
+        forum_models.VotoDuvida.objects.create(usuario=usuario, duvida=duvida)
+        Duvida.objects.filter(pk=duvida.pk).update(votos=7)
+
+        saida = io.StringIO()
+        call_command("recalcular_contadores", lote=1, stdout=saida)
+
+        duvida.refresh_from_db()
+        self.assertEqual(duvida.votos, 1)
+        self.assertIn("Votos: 1", saida.getvalue())
+
+    def test_votou_na_listagem(self):
+        """Verifica que a listagem informa se o usuário atual votou em cada dúvida"""
+        usuario = CustomUser.objects.first()
+        duvida = Duvida.objects.first()
+        forum_models.Duvida.objects.create(
+            disciplina_id=1,
+            titulo="Prova2",
+            descricao="Quais tópicos cairão na prova 2?",
+            autor_id=1,
+        )
+        self.client.post(
+            reverse("duvidas-votar", args=[duvida.pk]),
+            HTTP_AUTHORIZATION=f"Token {usuario.auth_token}",
+        )
+
+        response = self.client.get(
+            reverse("duvidas-list"), HTTP_AUTHORIZATION=f"Token {usuario.auth_token}"
+        )
+        votou = {item["id"]: item["votou"] for item in response.json()["results"]}
+        self.assertEqual(votou, {duvida.pk: True, duvida.pk + 1: False})
+
+        response = self.client.get(
+            reverse("duvidas-list"),
+            HTTP_AUTHORIZATION=f"Token {self.user_auth_token}",
+        )
+        self.assertFalse(any(item["votou"] for item in response.json()["results"]))
+
+
+class ConsultasListagemTest(APITestCase):
+    """Garante que as listagens do fórum usam um número fixo de consultas."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        curso = core_models.Curso.objects.create(
+            nome="Ciência da Computação",
+            descricao="Bacharelado em Ciência da Computação",
+        )
+        self.disciplina = core_models.Disciplinas.objects.create(
+            nome="Engenharia de Software", descricao="Engenharia de Software"
+        )
+        self.usuario = CustomUser.objects.create_user(
+            email="leitor@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.usuario).key
+        self.curso = curso
+        self.autores = 0
+        # Autentica uma vez: as próximas requisições usam o token em cache.
+        self.client.get(
+            reverse("disciplinas-list"), HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+
+    def criar_duvidas(self, quantidade):
+        """Cria dúvidas e respostas de autores diferentes, cada um com perfil."""
+        for _ in range(quantidade):
+            self.autores += 1
+            i = self.autores
+            autor = CustomUser.objects.create_user(
+                email=f"autor{i}@localhost.com", password="qwe123456"
+            )
+            Perfil.objects.create(
+                usuario=autor, nome_completo=f"Autor {i}", curso=self.curso
+            )
+            duvida = Duvida.objects.create(
+                titulo=f"Dúvida {i}",
+                descricao="Descrição",
+                disciplina=self.disciplina,
+                autor=autor,
+            )
+            resposta = Resposta.objects.create(
+                autor=autor, duvida=duvida, resposta="Resposta"
+            )
+            duvida.resposta_correta.add(resposta)
+
+    def assertOrcamento(self, url, consultas):  # pylint: disable=invalid-name
+        """Verifica o orçamento de consultas com poucas e muitas linhas."""
+        for quantidade in (1, 10):
+            self.criar_duvidas(quantidade)
+            with self.subTest(url=url, linhas=quantidade):
+                with self.assertNumQueries(consultas):
+                    response = self.client.get(
+                        url, HTTP_AUTHORIZATION=f"Token {self.token}"
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_orcamento_listar_duvidas(self):
+        """Listagem de dúvidas: dúvidas (com autores) e respostas corretas"""
+        self.assertOrcamento(reverse("duvidas-list"), 2)
+
+    def test_orcamento_listar_respostas(self):
+        """Listagem de respostas: respostas (com autores)"""
+        self.assertOrcamento(reverse("respostas-list"), 1)
+
+    def test_orcamento_detalhe_duvida(self):
+        """Detalhe de uma dúvida: dúvida (com autor) e respostas corretas"""
+        self.criar_duvidas(1)
+        url = reverse("duvidas-detail", args=[Duvida.objects.first().pk])
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                url,
+                HTTP_AUTHORIZATION=f"Token {self.token}",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ConsultasEscritaTest(APITestCase):
+    """Garante que as ações de escrita carregam cada linha uma única vez."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        self.autor = CustomUser.objects.create_user(
+            email="autor@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.autor).key
+        self.duvida = Duvida.objects.create(
+            titulo="Limites",
+            descricao="Como calcular limites?",
+            disciplina=disciplina,
+            autor=self.autor,
+        )
+        self.resposta = Resposta.objects.create(
+            autor=self.autor, duvida=self.duvida, resposta="Use L'Hôpital"
+        )
+        # Autentica uma vez: as próximas requisições usam o token em cache.
+        self.client.get(
+            reverse("disciplinas-list"), HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+
+    def enviar(self, metodo, url, consultas, **dados):
+        """Faz a requisição verificando o número de consultas."""
+        with self.assertNumQueries(consultas):
+            response = getattr(self.client, metodo)(
+                url, dados, format="json", HTTP_AUTHORIZATION=f"Token {self.token}"
+            )
+        self.assertLess(response.status_code, 300)
+        return response
+
+    def test_marcar_resposta_correta(self):
+        """correta: dúvida (uma vez), votou, respostas corretas, resposta e escritas"""
+        url = reverse("duvidas-correta", args=[self.duvida.pk])
+        self.enviar("post", url, 5, id=self.resposta.pk)
+        self.enviar("delete", url, 3, id=self.resposta.pk)
+
+    def test_editar_duvida(self):
+        """partial_update: a dúvida é carregada uma vez para a permissão e a edição"""
+        url = reverse("duvidas-detail", args=[self.duvida.pk])
+        self.enviar("patch", url, 4, titulo="Limites laterais")
+
+    def test_remover_resposta(self):
+        """destroy de resposta: resposta (uma vez), cascatas e contadores"""
+        url = reverse("respostas-detail", args=[self.resposta.pk])
+        self.enviar("delete", url, 9)
+
+    def test_remover_duvida(self):
+        """destroy de dúvida: dúvida (uma vez) e cascatas"""
+        url = reverse("duvidas-detail", args=[self.duvida.pk])
+        self.enviar("delete", url, 10)
+
+
+class BuscaTextualTest(APITestCase):
+    """Verifica a busca textual indexada de dúvidas e respostas."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        self.usuario = CustomUser.objects.create_user(
+            email="user@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.usuario).key
+        self.integral = Duvida.objects.create(
+            titulo="Integral por partes",
+            descricao="Como escolher u e dv na integração?",
+            disciplina=disciplina,
+            autor=self.usuario,
+        )
+        self.limite = Duvida.objects.create(
+            titulo="Limite fundamental",
+            descricao="Por que sen(x)/x tende a 1? Vi isso na aula de integral.",
+            disciplina=disciplina,
+            autor=self.usuario,
+        )
+        self.derivada = Duvida.objects.create(
+            titulo="Derivada da função exponencial",
+            descricao="Qual a derivada de e^x?",
+            disciplina=disciplina,
+            autor=self.usuario,
+        )
+        Resposta.objects.create(
+            autor=self.usuario,
+            duvida=self.limite,
+            resposta="Use o teorema do confronto.",
+        )
+
+    def buscar(self, rota, termo, **params):
+        """Faz uma busca na rota informada e retorna os ids encontrados."""
+        response = self.client.get(
+            reverse(rota),
+            {"search": termo, **params},
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_busca_titulo_e_descricao_por_relevancia(self):
+        """O termo no título pesa mais que na descrição"""
+        self.assertEqual(
+            self.buscar("duvidas-list", "integral"),
+            [self.integral.pk, self.limite.pk],
+        )
+
+    def test_busca_ignora_acentos_e_aceita_prefixo(self):
+        """A busca ignora acentos e casa prefixos de palavras"""
+        self.assertEqual(self.buscar("duvidas-list", "funcao expo"), [self.derivada.pk])
+
+    def test_busca_com_ordenacao_explicita(self):
+        """Uma ordenação explícita prevalece sobre a relevância"""
+        self.assertEqual(
+            self.buscar("duvidas-list", "integral", ordering="-data"),
+            [self.limite.pk, self.integral.pk],
+        )
+
+    def test_busca_acompanha_edicao_e_remocao(self):
+        """O índice acompanha edições e remoções das dúvidas"""
+        self.integral.titulo = "Integral dupla"
+        self.integral.save()
+        self.assertEqual(self.buscar("duvidas-list", "dupla"), [self.integral.pk])
+
+        self.integral.delete()
+        self.assertEqual(self.buscar("duvidas-list", "dupla"), [])
+
+    def test_busca_respostas(self):
+        """A busca também cobre o texto das respostas"""
+        self.assertEqual(len(self.buscar("respostas-list", "confronto")), 1)
+        self.assertEqual(self.buscar("respostas-list", '"teorema'), [1])
+
+
+class PaginacaoCursorTest(APITestCase):
+    """Verifica a paginação por cursor da listagem de dúvidas."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        self.usuario = CustomUser.objects.create_user(
+            email="user@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.usuario).key
+        for i in range(30):
+            Duvida.objects.create(
+                titulo=f"Dúvida {i}",
+                descricao="Descrição",
+                disciplina=disciplina,
+                autor=self.usuario,
+                votos=i % 3,
+            )
+
+    def get(self, url, **params):
+        """Faz uma requisição autenticada e retorna o corpo da resposta."""
+        response = self.client.get(
+            url, params, HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def percorrer(self, **params):
+        """Percorre todas as páginas seguindo os links 'next'."""
+        pagina = self.get(reverse("duvidas-list"), **params)
+        ids = [item["id"] for item in pagina["results"]]
+        while pagina["next"]:
+            pagina = self.get(pagina["next"])
+            ids += [item["id"] for item in pagina["results"]]
+        return ids
+
+    def test_percorre_todas_as_paginas(self):
+        """Os cursores percorrem todos os itens na ordem da view"""
+        esperado = list(
+            Duvida.objects.order_by("data", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.percorrer(), esperado)
+
+    def test_ordenacao_com_empates(self):
+        """Empates na ordenação são resolvidos pelo id sem repetir itens"""
+        esperado = list(
+            Duvida.objects.order_by("-votos", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(self.percorrer(ordering="-votos"), esperado)
+
+    def test_insercao_concorrente_nao_desloca_paginas(self):
+        """Itens inseridos durante a navegação não duplicam itens já vistos"""
+        primeira = self.get(reverse("duvidas-list"), ordering="-data")
+        Duvida.objects.create(
+            titulo="Nova",
+            descricao="Descrição",
+            disciplina_id=1,
+            autor=self.usuario,
+        )
+        segunda = self.get(primeira["next"])
+        vistos = [item["id"] for item in primeira["results"]]
+        proximos = [item["id"] for item in segunda["results"]]
+        self.assertEqual(len(vistos) + len(proximos), 30)
+        self.assertFalse(set(vistos) & set(proximos))
+
+    def test_pagina_anterior(self):
+        """O link 'previous' retorna a página anterior"""
+        primeira = self.get(reverse("duvidas-list"))
+        self.assertIsNone(primeira["previous"])
+        segunda = self.get(primeira["next"])
+        self.assertEqual(self.get(segunda["previous"])["results"], primeira["results"])
+
+    def test_paginacao_por_numero(self):
+        """O modo por número de página continua disponível"""
+        pagina = self.get(reverse("duvidas-list"), page=2)
+        self.assertEqual(pagina["count"], 30)
+        self.assertEqual(len(pagina["results"]), 5)
+
+    def test_cursor_invalido(self):
+        """Um cursor inválido resulta em 404"""
+        response = self.client.get(
+            reverse("duvidas-list"),
+            {"cursor": "invalido"},
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RankingHotTest(APITestCase):
+    """Verifica a pontuação hot e a ordenação ``ordering=hot``."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        self.disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        outra = core_models.Disciplinas.objects.create(
+            nome="Física", descricao="Física I"
+        )
+        self.usuario = CustomUser.objects.create_user(
+            email="user@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.usuario).key
+        self.antiga = Duvida.objects.create(
+            titulo="Antiga",
+            descricao="Muito votada",
+            disciplina=self.disciplina,
+            autor=self.usuario,
+            votos=50,
+        )
+        # Simula uma dúvida de um mês atrás, como se tivesse sido salva na época.
+        criada_em = self.antiga.criada_em - timedelta(days=30)
+        Duvida.objects.filter(pk=self.antiga.pk).update(
+            criada_em=criada_em, hot=pontuacao_hot(50, 0, criada_em)
+        )
+        self.nova = Duvida.objects.create(
+            titulo="Nova",
+            descricao="Recente",
+            disciplina=self.disciplina,
+            autor=self.usuario,
+        )
+        self.outra = Duvida.objects.create(
+            titulo="Outra",
+            descricao="Outra disciplina",
+            disciplina=outra,
+            autor=self.usuario,
+        )
+
+    def listar(self, **params):
+        """Lista as dúvidas e retorna os ids na ordem da resposta."""
+        response = self.client.get(
+            reverse("duvidas-list"), params, HTTP_AUTHORIZATION=f"Token {self.token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_ordenacao_hot_por_disciplina(self):
+        """Dúvidas recentes superam dúvidas antigas muito votadas"""
+        self.assertEqual(
+            self.listar(ordering="hot", disciplina_id=self.disciplina.pk),
+            [self.nova.pk, self.antiga.pk],
+        )
+        self.assertEqual(self.listar(ordering="votos")[0], self.nova.pk)
+
+    def test_hot_acompanha_votos_e_respostas(self):
+        """Votos e respostas atualizam a pontuação armazenada"""
+        self.nova.refresh_from_db()
+        hot_inicial = self.nova.hot
+
+        forum_service.registrar_voto(self.usuario, self.nova.pk)
+        self.nova.refresh_from_db()
+        self.assertEqual(self.nova.hot, pontuacao_hot(1, 0, self.nova.criada_em))
+
+        Resposta.objects.create(autor=self.usuario, duvida=self.nova, resposta="Ok")
+        self.nova.refresh_from_db()
+        self.assertGreater(self.nova.hot, hot_inicial)
+        self.assertEqual(self.nova.hot, pontuacao_hot(1, 1, self.nova.criada_em))
+
+    def test_recalcular_hot(self):
+        """O comando de reconciliação corrige pontuações defasadas"""
+        Duvida.objects.update(hot=0)
+        saida = io.StringIO()
+        call_command("recalcular_contadores", stdout=saida)
+        self.assertIn("Hot: 3", saida.getvalue())
+        self.antiga.refresh_from_db()
+        self.assertEqual(
+            self.antiga.hot,
+            pontuacao_hot(self.antiga.votos, 0, self.antiga.criada_em),
+        )
+
+    def test_edicao_nao_rejuvenesce(self):
+        """Editar uma dúvida antiga não a faz subir no ranking"""
+        self.antiga.refresh_from_db()
+        hot = self.antiga.hot
+        self.antiga.titulo = "Antiga, editada"
+        self.antiga.save()
+        self.antiga.refresh_from_db()
+        self.assertEqual(self.antiga.hot, hot)
+        self.assertEqual(
+            self.listar(ordering="hot", disciplina_id=self.disciplina.pk),
+            [self.nova.pk, self.antiga.pk],
+        )
+
+
+class CacheListagemTest(APITestCase):
+    """Verifica o cache das listagens de dúvidas por disciplina."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        self.usuario = CustomUser.objects.create_user(
+            email="user@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.perfil = Perfil.objects.create(
+            usuario=self.usuario, nome_completo="Usuário", nome_exibicao="Usuário"
+        )
+        self.outro = CustomUser.objects.create_user(
+            email="outro@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.usuario).key
+        self.token_outro = account_management_service.get_user_token(self.outro).key
+        self.duvida = Duvida.objects.create(
+            titulo="Limites",
+            descricao="Como calcular limites?",
+            disciplina=self.disciplina,
+            autor=self.usuario,
+        )
+
+    def listar(self, token=None):
+        """Lista as dúvidas da disciplina e retorna os resultados."""
+        response = self.client.get(
+            reverse("duvidas-list"),
+            {"disciplina_id": self.disciplina.pk},
+            HTTP_AUTHORIZATION=f"Token {token or self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["results"]
+
+    def test_listagem_servida_do_cache(self):
+        """Uma listagem repetida consulta apenas os votos do usuário"""
+        primeira = self.listar()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.listar(), primeira)
+
+    def test_voto_invalida_e_votou_por_usuario(self):
+        """Votos invalidam o cache e "votou" é calculado para cada usuário"""
+        self.listar()
+        self.client.post(
+            reverse("duvidas-votar", args=[self.duvida.pk]),
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+        )
+        duvida = self.listar()[0]
+        self.assertEqual(duvida["votos"], 1)
+        self.assertTrue(duvida["votou"])
+        duvida = self.listar(self.token_outro)[0]
+        self.assertEqual(duvida["votos"], 1)
+        self.assertFalse(duvida["votou"])
+
+    def test_escritas_invalidam_cache(self):
+        """Novas dúvidas, respostas, edições e perfis aparecem na listagem"""
+        self.listar()
+        self.client.post(
+            reverse("duvidas-list"),
+            {
+                "titulo": "Derivadas",
+                "descricao": "Regra da cadeia",
+                "disciplina": self.disciplina.pk,
+            },
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+        )
+        self.assertEqual(len(self.listar()), 2)
+
+        Resposta.objects.create(
+            autor=self.outro, duvida=self.duvida, resposta="Use L'Hôpital"
+        )
+        duvidas = {duvida["id"]: duvida for duvida in self.listar()}
+        self.assertEqual(duvidas[self.duvida.pk]["quantidade_comentarios"], 1)
+
+        self.duvida.titulo = "Limites laterais"
+        self.duvida.save()
+        duvidas = {duvida["id"]: duvida for duvida in self.listar()}
+        self.assertEqual(duvidas[self.duvida.pk]["titulo"], "Limites laterais")
+
+        self.perfil.nome_exibicao = "Novo nome"
+        self.perfil.save()
+        duvidas = {duvida["id"]: duvida for duvida in self.listar()}
+        self.assertEqual(
+            duvidas[self.duvida.pk]["autor"]["perfil"]["nome_exibicao"], "Novo nome"
+        )
+
+    def test_usuario_e_curso_invalidam_autores(self):
+        """E-mail do usuário e nome do curso do autor aparecem atualizados"""
+        curso = core_models.Curso.objects.create(nome="Computação", descricao="")
+        self.perfil.curso = curso
+        self.perfil.save()
+        self.listar()
+
+        self.usuario.email = "novo@localhost.com"
+        self.usuario.save()
+        autor = self.listar()[0]["autor"]
+        self.assertEqual(autor["email"], "novo@localhost.com")
+
+        curso.nome = "Ciência da Computação"
+        curso.save()
+        autor = self.listar()[0]["autor"]
+        self.assertEqual(autor["perfil"]["curso"]["nome"], "Ciência da Computação")
+
+
+class GetCondicionalTest(APITestCase):
+    """Verifica ETag e Last-Modified nas dúvidas e respostas."""
+
+    fixtures = ["groups.yaml"]
+
+    def setUp(self) -> None:
+        disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        self.usuario = CustomUser.objects.create_user(
+            email="user@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.outro = CustomUser.objects.create_user(
+            email="outro@localhost.com", password="qwe123456", is_email_active=True
+        )
+        self.token = account_management_service.get_user_token(self.usuario).key
+        self.token_outro = account_management_service.get_user_token(self.outro).key
+        self.duvida = Duvida.objects.create(
+            titulo="Limites",
+            descricao="Como calcular limites?",
+            disciplina=disciplina,
+            autor=self.usuario,
+        )
+
+    def get(self, url, token=None, **headers):
+        """Faz uma requisição GET autenticada."""
+        return self.client.get(
+            url, HTTP_AUTHORIZATION=f"Token {token or self.token}", **headers
+        )
+
+    def test_if_none_match(self):
+        """Um ETag atual resulta em 304 sem consultar os dados do recurso"""
+        for url in (
+            reverse("duvidas-list"),
+            reverse("duvidas-detail", args=[self.duvida.pk]),
+            reverse("respostas-list"),
+        ):
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+                # Nenhuma consulta: o token também está em cache.
+                with self.assertNumQueries(0):
+                    response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        """If-Modified-Since sozinho não resulta em 304
+
+        O Last-Modified tem resolução de um segundo: uma escrita no mesmo
+        segundo da resposta anterior não o altera.
+        """
+        url = reverse("duvidas-list")
+        response = self.get(url)
+        last_modified, etag = response["Last-Modified"], response["ETag"]
+        self.duvida.titulo = "Limites laterais"
+        self.duvida.save()
+        response = self.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["titulo"], "Limites laterais")
+
+        response = self.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modelos_monitorados(self):
+        """conditional_models só aceita modelos que trocam as gerações"""
+        with self.assertRaises(ImproperlyConfigured):
+            type(
+                "Invalida",
+                (conditional.ConditionalGetMixin,),
+                {"conditional_models": ["forum_amo.Denuncia"]},
+            )
+
+    def test_etag_muda_com_votos_e_usuario(self):
+        """Votos trocam o ETag, que também é diferente para cada usuário"""
+        url = reverse("duvidas-list")
+        etag = self.get(url)["ETag"]
+        self.assertNotEqual(self.get(url, self.token_outro)["ETag"], etag)
+
+        forum_service.registrar_voto(self.outro, self.duvida.pk)
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["votos"], 1)
+
+    def test_etag_muda_com_respostas(self):
+        """Novas respostas trocam o ETag da listagem de respostas"""
+        url = reverse("respostas-list")
+        etag = self.get(url)["ETag"]
+        Resposta.objects.create(autor=self.outro, duvida=self.duvida, resposta="Ok")
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+
+class VotosConcorrentesTest(TransactionTestCase):
+    """Garante que votos simultâneos mantêm o contador exato."""
+
+    def setUp(self) -> None:
+        disciplina = core_models.Disciplinas.objects.create(
+            nome="Cálculo", descricao="Cálculo I"
+        )
+        self.usuarios = [
+            CustomUser.objects.create(email=f"user{i}@localhost.com") for i in range(16)
+        ]
+        self.duvida = Duvida.objects.create(
+            titulo="Popular",
+            descricao="Descrição",
+            disciplina=disciplina,
+            autor=self.usuarios[0],
+        )
+
+    def executar_em_paralelo(self, tarefas):
+        """Executa as tarefas em threads que começam ao mesmo tempo."""
+        barreira = threading.Barrier(len(tarefas))
+        erros = []
+
+        def executar(tarefa):
+            try:
+                barreira.wait()
+                while True:
+                    try:
+                        tarefa()
+                        return
+                    except OperationalError:
+                        # O SQLite dos testes bloqueia a tabela inteira em
+                        # escritas simultâneas; a operação é repetida.
+                        continue
+            except Exception as e:  # pylint: disable=W0703
+                erros.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=executar, args=(t,)) for t in tarefas]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(erros, [])
+
+    def test_votos_simultaneos(self):
+        """Votos, votos repetidos e remoções simultâneas mantêm o total exato"""
+        pk = self.duvida.pk
+        self.executar_em_paralelo(
+            [
+                lambda u=usuario: forum_service.definir_voto(u, pk, True)
+                for usuario in self.usuarios * 2
+            ]
+        )
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.votos, len(self.usuarios))
+
+        self.executar_em_paralelo(
+            [
+                lambda u=usuario: forum_service.definir_voto(u, pk, False)
+                for usuario in self.usuarios[::2]
+            ]
+        )
+        self.duvida.refresh_from_db()
+        self.assertEqual(self.duvida.votos, len(self.usuarios) // 2)
+        self.assertEqual(
+            self.duvida.votos, forum_models.VotoDuvida.objects.filter(duvida=pk).count()
+        )
+
+
+class _ZoomFalso(BaseHTTPRequestHandler):
+    """Servidor local que imita o OAuth e a criação de reuniões do Zoom."""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        servidor = self.server
+        corpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        servidor.requisicoes.append((self.path, dict(self.headers), corpo))
+        if self.path.startswith("/oauth/token"):
+            servidor.tokens += 1
+            resposta = {
+                "access_token": f"token-{servidor.tokens}",
+                "expires_in": servidor.validade,
+            }
+        elif self.path == "/v2/users/me/meetings":
+            if self.headers["Authorization"] in servidor.recusados:
+                self.send_response(401)
+                self.end_headers()
+                return
+            resposta = {"join_url": "https://zoom.us/j/123", **json.loads(corpo)}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        conteudo = json.dumps(resposta).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class ZoomClientTest(SimpleTestCase):
+    """
+    Testes do cliente do Zoom contra um servidor local
+    """
+
+    def setUp(self) -> None:
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ZoomFalso)
+        self.servidor.requisicoes = []
+        self.servidor.tokens = 0
+        self.servidor.validade = 3600
+        self.servidor.recusados = set()
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+        endereco = f"http://127.0.0.1:{self.servidor.server_port}"
+        configuracao = override_settings(
+            ZOOM={
+                "account_id": "conta",
+                "client_id": "id",
+                "client_secret": "segredo",
+                "oauth_url": f"{endereco}/oauth/token",
+                "api_url": f"{endereco}/v2",
+                "timeout": 5,
+            }
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.inicio = datetime(2024, 3, 4, 14, 30, tzinfo=dt_timezone.utc)
+
+    def reunioes(self):
+        return [
+            (headers, json.loads(corpo))
+            for caminho, headers, corpo in self.servidor.requisicoes
+            if caminho == "/v2/users/me/meetings"
+        ]
+
+    def test_cria_reuniao_com_os_dados_do_agendamento(self):
+        """Assunto, início e duração do agendamento vão para a API"""
+        link = zoom.create_meeting("Dúvida de limites", self.inicio, timedelta(hours=1))
+        self.assertEqual(link, "https://zoom.us/j/123")
+        headers, payload = self.reunioes()[0]
+        self.assertEqual(headers["Authorization"], "Bearer token-1")
+        self.assertEqual(payload["topic"], "Dúvida de limites")
+        self.assertEqual(payload["start_time"], "2024-03-04T14:30:00Z")
+        self.assertEqual(payload["duration"], 60)
+        caminho = self.servidor.requisicoes[0][0]
+        self.assertIn("grant_type=account_credentials", caminho)
+        self.assertIn("account_id=conta", caminho)
+
+    def test_token_reaproveitado_ate_expirar(self):
+        """O token é buscado uma vez e renovado perto da expiração"""
+        zoom.create_meeting("A", self.inicio, 30)
+        zoom.create_meeting("B", self.inicio, 30)
+        self.assertEqual(self.servidor.tokens, 1)
+
+        # Um token que expira dentro da margem é renovado a cada uso.
+        self.servidor.validade = 30
+        zoom.get_client()._expira_em = 0  # pylint: disable=protected-access
+        zoom.create_meeting("C", self.inicio, 30)
+        zoom.create_meeting("D", self.inicio, 30)
+        self.assertEqual(self.servidor.tokens, 3)
+
+    def test_token_recusado_e_renovado(self):
+        """Um token recusado pela API é renovado e a requisição, repetida"""
+        zoom.create_meeting("A", self.inicio, 30)
+        self.servidor.recusados.add("Bearer token-1")
+        self.assertEqual(
+            zoom.create_meeting("B", self.inicio, 30), "https://zoom.us/j/123"
+        )
+        self.assertEqual(self.servidor.tokens, 2)
+
+    def test_falha_na_api(self):
+        """Erros de rede e respostas de erro viram ZoomError"""
+        self.servidor.recusados.update({"Bearer token-1", "Bearer token-2"})
+        with self.assertRaises(zoom.ZoomError):
+            zoom.create_meeting("A", self.inicio, 30)
+
+        client = zoom.ZoomClient(
+            "conta", "id", "segredo", oauth_url="http://127.0.0.1:9/", timeout=1
+        )
+        self.addCleanup(client.close)
+        with self.assertRaises(zoom.ZoomError):
+            client.create_meeting("A", self.inicio, 30)
@@ -1,12 +1,13 @@
 """
 Utilidades
 """
-from django.core.mail import send_mail
 from django.conf import settings
 
+from core import email_service
+
 
 def send_report_mail(report):
-    """Função para enviar e-mail de denúncia"""
+    """Função para enviar e-mail de denúncia (pela fila de saída)"""
     subject = f"Nova denúncia em {report.duvida.titulo}"
     message = f"""
     Nova denúncia recebida. 
@@ -21,4 +22,6 @@ def send_report_mail(report):
 
     """
 
-    send_mail(subject, message, settings.EMAIL_HOST_USER, [settings.EMAIL_HOST_USER])
+    email_service.enfileirar_email(
+        subject, message, [settings.EMAIL_HOST_USER], settings.EMAIL_HOST_USER
+    )
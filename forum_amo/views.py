@@ -2,7 +2,9 @@
 View forum_app
 """
 from django import http
+from django.conf import settings
 from django.core import exceptions
+from django.core.cache import cache
 from django.db import IntegrityError, transaction
 from django_filters import rest_framework as filters
 from django_filters.rest_framework import DjangoFilterBackend
@@ -10,7 +12,7 @@ from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
 from rest_access_policy import AccessViewSetMixin
 from rest_framework import response, status
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
@@ -20,6 +22,13 @@ from forum_amo.utils import send_report_mail
 import forum_amo.forum_service
 from forum_amo.access_policy import DuvidaAccessPolicy, RespostaAccessPolicy
 from forum_amo.models import Duvida, Resposta, VotoDuvida
+from forum_amo.ranking import HotOrderingFilter
+from forum_amo.search import FullTextSearchFilter
+from utils import cache as cache_utils
+from utils import identity_map
+from utils.conditional import ConditionalGetMixin
+from utils.identity_map import IdentityMapMixin
+from utils.pagination import KeysetPagination
 
 from forum_amo.serializers import (
     DuvidaSerializer,
@@ -36,21 +45,121 @@ class DuvidaFilter(filters.FilterSet):
     disciplina_id = filters.Filter(field_name="disciplina", lookup_expr="exact")
 
 
-class DuvidaViewSet(AccessViewSetMixin, ModelViewSet):
+class DuvidaViewSet(
+    ConditionalGetMixin, IdentityMapMixin, AccessViewSetMixin, ModelViewSet
+):
     """ViewSet referente ao modelo de dúvidas do fórum"""
 
     access_policy = DuvidaAccessPolicy
+    conditional_models = [
+        "forum_amo.Duvida",
+        "forum_amo.Resposta",
+        "forum_amo.VotoDuvida",
+        "accounts.CustomUser",
+        "accounts.Perfil",
+        "core.Curso",
+        "auth.Group",
+    ]
+    # O campo "votou" depende do usuário.
+    conditional_per_user = True
     serializer_class = DuvidaSerializer
-    queryset = Duvida.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    queryset = Duvida.objects.select_related("autor__perfil__curso").prefetch_related(
+        "resposta_correta"
+    )
+    filter_backends = [DjangoFilterBackend, HotOrderingFilter, FullTextSearchFilter]
     filterset_class = DuvidaFilter
-    search_fields = ["titulo"]
-    ordering_fields = ["data", "votos"]
+    pagination_class = KeysetPagination
+    search_fields = ["titulo", "descricao"]
+    ordering_fields = ["data", "votos", "hot"]
     ordering = ["data"]
 
-    @action(methods=["POST", "DELETE"], detail=True)
+    # Quando True, a listagem é gerada sem o estado do usuário atual para
+    # poder ser compartilhada no cache (ver list).
+    resposta_compartilhada = False
+
+    def get_queryset(self):
+        return forum_amo.forum_service.annotate_viewer_state(
+            super().get_queryset(),
+            None if self.resposta_compartilhada else self.request.user,
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Lista as dúvidas.
+
+        As listagens filtradas por ``disciplina_id`` são servidas do cache,
+        versionado pela geração da disciplina, que muda a cada alteração nas
+        suas dúvidas, votos ou respostas. O campo ``votou`` é preenchido por
+        usuário sobre a resposta compartilhada.
+        """
+        disciplina_id = request.query_params.get("disciplina_id")
+        if not disciplina_id:
+            return super().list(request, *args, **kwargs)
+
+        namespaces = [
+            forum_amo.forum_service.NAMESPACE_AUTORES,
+            forum_amo.forum_service.namespace_disciplina(disciplina_id),
+        ]
+        chave = cache_utils.response_cache_key(
+            request, namespaces, cache_utils.get_generations(*namespaces)
+        )
+        dados = cache.get(chave)
+        if dados is None:
+            self.resposta_compartilhada = True
+            resposta = super().list(request, *args, **kwargs)
+            if resposta.status_code != status.HTTP_200_OK:
+                return resposta
+            dados = resposta.data
+            cache.set(chave, dados, timeout=settings.FORUM_CACHE_TIMEOUT)
+
+        forum_amo.forum_service.overlay_viewer_state(dados["results"], request.user)
+        return Response(dados)
+
+    @extend_schema(
+        request={
+            "application/json": {
+                "type": "object",
+                "properties": {
+                    "votou": {
+                        "type": "boolean",
+                        "example": True,
+                        "description": "PUT: estado desejado do voto do usuário",
+                    }
+                },
+            }
+        },
+        responses={
+            (status.HTTP_200_OK, "application/json"): {
+                "type": "object",
+                "properties": {
+                    "votou": {"type": "boolean", "example": True},
+                    "votos": {"type": "integer", "example": 3},
+                },
+            },
+            (status.HTTP_202_ACCEPTED, "application/json"): {},
+            (status.HTTP_204_NO_CONTENT, "application/json"): {},
+        },
+    )
+    @action(methods=["POST", "PUT", "DELETE"], detail=True)
     def votar(self, request: Request, pk=None):
-        """Permite votar em um dúvida"""
+        """Permite votar em um dúvida.
+
+        PUT define de forma idempotente o voto do usuário (``{"votou": true}``
+        ou ``{"votou": false}``) e retorna o total de votos atualizado.
+        """
+        if request.method == "PUT":
+            votou = request.data.get("votou")
+            if not isinstance(votou, bool):
+                return Response(
+                    data={"erro": {"mensagem": "Informe 'votou' como true ou false."}},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if not Duvida.objects.filter(pk=pk).exists():
+                return Response(
+                    data={"erro": {"mensagem": "Dúvida não encontrada."}},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            estado = forum_amo.forum_service.definir_voto(request.user, pk, votou)
+            return Response(data=estado, status=status.HTTP_200_OK)
         if request.method == "POST":
             dados = {"duvida": pk, "usuario": request.user}
             serializer = VotoDuvidaSerializer()
@@ -113,10 +222,11 @@ class DuvidaViewSet(AccessViewSetMixin, ModelViewSet):
         if request.method == "POST":
             try:
                 resposta_pk = request.data.get("id", None)
-                resposta = Resposta.objects.get(pk=resposta_pk)
+                resposta = identity_map.get_object(
+                    request, Resposta.objects, resposta_pk
+                )
                 if resposta.duvida_id == duvida.pk:
                     duvida.resposta_correta.add(resposta.id)
-                    duvida.save()
             except exceptions.ObjectDoesNotExist:
                 return response.Response(
                     data={"erro": {"mensagem": "Resposta não encontrada."}},
@@ -126,7 +236,6 @@ class DuvidaViewSet(AccessViewSetMixin, ModelViewSet):
         if request.method == "DELETE":
             resposta_pk = request.data.get("id", None)
             duvida.resposta_correta.remove(resposta_pk)
-            duvida.save()
             return response.Response(
                 data={"sucesso": {"mensagem": "resposta desmarcada como certa."}},
                 status=status.HTTP_200_OK,
@@ -146,8 +255,9 @@ class DuvidaViewSet(AccessViewSetMixin, ModelViewSet):
 
         serializer = DenunciaSerializer(data=data, context={"request": request})
         if serializer.is_valid():
-            denuncia = serializer.save()
-            send_report_mail(denuncia)
+            with transaction.atomic():
+                denuncia = serializer.save()
+                send_report_mail(denuncia)
             return Response(
                 {"success": "Denúncia enviada com sucesso"},
                 status=status.HTTP_201_CREATED,
@@ -155,14 +265,24 @@ class DuvidaViewSet(AccessViewSetMixin, ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RespostaViewSet(AccessViewSetMixin, ModelViewSet):
+class RespostaViewSet(
+    ConditionalGetMixin, IdentityMapMixin, AccessViewSetMixin, ModelViewSet
+):
     """ViewSet referente ao modelo de respostas do fórum"""
 
     access_policy = RespostaAccessPolicy
+    conditional_models = [
+        "forum_amo.Resposta",
+        "accounts.CustomUser",
+        "accounts.Perfil",
+        "core.Curso",
+        "auth.Group",
+    ]
     serializer_class = RespostaSerializer
-    queryset = Resposta.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    queryset = Resposta.objects.select_related("autor__perfil__curso")
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     search_fields = ["resposta"]
+    pagination_class = KeysetPagination
     filterset_fields = ["duvida"]
     ordering_fields = ["data"]
     ordering = ["data"]
@@ -225,7 +345,7 @@ class RespostaViewSet(AccessViewSetMixin, ModelViewSet):
     )
     def retrieve(self, request, *args, pk=None, **kwargs):
         try:
-            resposta = forum_amo.forum_service.get_resposta(pk)
+            resposta = forum_amo.forum_service.get_resposta(pk, request)
         except exceptions.ObjectDoesNotExist:
             return Response(
                 data={"erro": {"mensagem": "Resposta não encontrada."}},
@@ -235,12 +355,8 @@ class RespostaViewSet(AccessViewSetMixin, ModelViewSet):
 
     def destroy(self, request, *args, pk=None, **kwargs):
         with transaction.atomic():
-
-            resposta = Resposta.objects.get(id=pk)
-            resposta.delete()
-            duvida = Duvida.objects.get(id=resposta.duvida.id)
-            duvida.quantidade_comentarios -= 1
-            duvida.save()
+            # O sinal post_delete de Resposta atualiza o contador da dúvida.
+            self.get_object().delete()
 
             return response.Response(
                 data={"Sucesso": {"mensagem": "Resposta excluída.."}},
@@ -257,8 +373,9 @@ class RespostaViewSet(AccessViewSetMixin, ModelViewSet):
         serializer = DenunciaSerializer(data=data, context={"request": request})
 
         if serializer.is_valid():
-            denuncia = serializer.save()
-            send_report_mail(denuncia)
+            with transaction.atomic():
+                denuncia = serializer.save()
+                send_report_mail(denuncia)
             return Response(
                 {"success": "Denúncia enviada com sucesso"},
                 status=status.HTTP_201_CREATED,
@@ -1,49 +1,183 @@
 """
 Integração com a API do Zoom
+
+Nada é feito na importação: o cliente é criado no primeiro uso, a partir de
+``settings.ZOOM``, e busca o token OAuth (credenciais de conta
+servidor-a-servidor) só quando precisa. O token fica em memória até pouco
+antes de expirar e é renovado também se a API o recusar. As requisições usam
+uma ``requests.Session`` (conexões reaproveitadas) e sempre têm timeout.
 """
+import threading
+import time
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+
 import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+URL_OAUTH = "https://zoom.us/oauth/token"
+URL_API = "https://api.zoom.us/v2"
+
+
+class ZoomError(Exception):
+    """Falha na comunicação com a API do Zoom."""
+
+    message = "Não foi possível criar a reunião no Zoom"
+    http_error_code = 502
+
+
+class ZoomClient:
+    """Cliente da API do Zoom.
+
+    Args:
+        account_id, client_id, client_secret: credenciais do aplicativo
+            servidor-a-servidor.
+        oauth_url, api_url: endereços da API (um servidor local nos testes).
+        timeout: tempo máximo, em segundos, de cada requisição.
+        margem: segundos antes da expiração em que o token é renovado.
+    """
+
+    def __init__(
+        self,
+        account_id,
+        client_id,
+        client_secret,
+        oauth_url=URL_OAUTH,
+        api_url=URL_API,
+        timeout=10,
+        margem=60,
+    ):
+        self.account_id = account_id
+        self.credenciais = (client_id, client_secret)
+        self.oauth_url = oauth_url
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.margem = margem
+        self.session = requests.Session()
+        self._token = None
+        self._expira_em = 0.0
+        self._lock = threading.Lock()
 
-URL = "https://zoom.us/oauth/token"
+    def _obter_token(self, renovar=False) -> str:
+        with self._lock:
+            if renovar or self._token is None or time.monotonic() >= self._expira_em:
+                dados = self._requisitar(
+                    "post",
+                    self.oauth_url,
+                    params={
+                        "grant_type": "account_credentials",
+                        "account_id": self.account_id,
+                    },
+                    auth=self.credenciais,
+                )
+                try:
+                    self._token = dados["access_token"]
+                    validade = int(dados.get("expires_in", 3600))
+                except (KeyError, TypeError, ValueError) as e:
+                    raise ZoomError("Resposta inválida do OAuth do Zoom") from e
+                self._expira_em = time.monotonic() + validade - self.margem
+            return self._token
 
-data = {
-    "eventType": "AAS_PORTAL_START",
-    "data": {"uid": "hfe3hf45huf33545", "aid": "1", "vid": "1"},
-}
-params = {"grant_type": "account_credentials", "account_id": "Zn2as7GaRGiLdES4eWC5XQ"}
+    def _requisitar(self, metodo, url, **kwargs) -> dict:
+        try:
+            resposta = self.session.request(metodo, url, timeout=self.timeout, **kwargs)
+            resposta.raise_for_status()
+            return resposta.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ZoomError(str(e)) from e
 
-a = requests.post(
-    URL,
-    params=params,
-    auth=("O6BqSdonRFaY3NUnrcaGEA", "6HD1RdjAeKEfCB00k8TAOM8HQ9QGYBKw"),
-)
+    def _post_api(self, caminho, payload) -> dict:
+        url = f"{self.api_url}{caminho}"
+        try:
+            return self._requisitar(
+                "post", url, json=payload, headers=self._autorizacao()
+            )
+        except ZoomError as e:
+            resposta = getattr(e.__cause__, "response", None)
+            if resposta is None or resposta.status_code != 401:
+                raise
+        # Token revogado ou expirado antes do previsto: renova e tenta de novo.
+        return self._requisitar(
+            "post", url, json=payload, headers=self._autorizacao(renovar=True)
+        )
 
-b = a.json()
+    def _autorizacao(self, renovar=False) -> dict:
+        return {"Authorization": f"Bearer {self._obter_token(renovar)}"}
 
-token = b["access_token"]
+    def create_meeting(self, topic, start_time, duration) -> str:
+        """Agenda uma reunião e retorna o link de entrada.
 
-payload = {
-    "topic": "Monitoria Acadêmica",
-    "type": 2,  # 1 for instant meeting, 2 for scheduled meeting
-    "start_time": "2024-01-26T12:16:43Z",
-    "duration": 60,
-    "settings": {
-        "host_video": True,
-        "participant_video": True,
-        "join_before_host": True,
-        "mute_upon_entry": True,
-        "alternative_hosts_email_notification": False,
-    },
-}
+        Args:
+            topic: assunto da reunião.
+            start_time: início (datetime com fuso).
+            duration: duração, em minutos ou ``timedelta``.
 
-headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+        Raises:
+            ZoomError: a API não respondeu ou recusou a requisição.
+        """
+        if isinstance(duration, timedelta):
+            duration = duration.total_seconds() // 60
+        payload = {
+            "topic": topic,
+            "type": 2,  # 1 for instant meeting, 2 for scheduled meeting
+            "start_time": start_time.astimezone(dt_timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "duration": int(duration),
+            "settings": {
+                "host_video": True,
+                "participant_video": True,
+                "join_before_host": True,
+                "mute_upon_entry": True,
+                "alternative_hosts_email_notification": False,
+            },
+        }
+        reuniao = self._post_api("/users/me/meetings", payload)
+        try:
+            return reuniao["join_url"]
+        except (KeyError, TypeError) as e:
+            raise ZoomError("Resposta inválida da API do Zoom") from e
 
+    def close(self) -> None:
+        """Fecha as conexões da sessão."""
+        self.session.close()
 
-def create_meeting():
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ZoomClient:
+    """Retorna o cliente configurado em ``settings.ZOOM``."""
+    global _client  # pylint: disable=global-statement
+    with _client_lock:
+        if _client is None:
+            _client = ZoomClient(**settings.ZOOM)
+        return _client
+
+
+@receiver(setting_changed)
+def _recarregar_configuracao(setting, **kwargs):  # pylint: disable=unused-argument
+    global _client  # pylint: disable=global-statement
+    if setting == "ZOOM":
+        with _client_lock:
+            if _client is not None:
+                _client.close()
+            _client = None
+
+
+def configurado() -> bool:
+    """Se as credenciais de ``settings.ZOOM`` foram informadas."""
+    return all(
+        settings.ZOOM.get(chave)
+        for chave in ("account_id", "client_id", "client_secret")
+    )
+
+
+def create_meeting(topic, start_time, duration) -> str:
     """
     Função que retorna link do meeting
     """
-    aba = requests.post(
-        "https://api.zoom.us/v2/users/me/meetings", headers=headers, json=payload
-    )
-    aba = aba.json()
-    return aba["join_url"]
+    return get_client().create_meeting(topic, start_time, duration)
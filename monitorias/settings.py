@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 import os
+import socket
+import tempfile
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -166,14 +168,128 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 25,
+    # Proxies reversos à frente do gunicorn (o roteador do Heroku). O IP do
+    # cliente usado nos limites de requisições é o endereço que o último
+    # proxy anexou ao X-Forwarded-For; o restante do cabeçalho é informado
+    # pelo próprio cliente. Sem proxy, vale o REMOTE_ADDR.
+    "NUM_PROXIES": int(
+        os.getenv(
+            "NUM_PROXIES",
+            "1" if os.getenv("DJANGO_ENVIRONMENT") in ("PRODUCTION", "DEV") else "0",
+        )
+    ),
+}
+
+# Cache compartilhado entre todos os processos e dynos (web e workers): tokens,
+# limites de requisições, gerações dos ETags, vínculos, horários e agendas.
+# O Redis (REDIS_URL, definido pelo add-on do Heroku) tem add/incr atômicos e
+# não descarta chaves ao atingir um número de entradas. O LocMemCache, local
+# ao processo, fica só para os testes e o desenvolvimento local.
+if os.getenv("DJANGO_ENVIRONMENT") in ("PRODUCTION", "DEV"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Tempo (em segundos) que a autenticação de um token fica em cache.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", "300"))
+
+# Tempo (em segundos) que as disciplinas monitoradas/lecionadas de um usuário
+# ficam em cache (ver core.membership). Alterações invalidam na hora.
+VINCULOS_CACHE_TIMEOUT = int(os.getenv("VINCULOS_CACHE_TIMEOUT", "3600"))
+
+# Tempo máximo (em segundos) dos horários livres em cache (ver
+# core.availability). Alterações em horários e agendamentos invalidam na hora.
+DISPONIBILIDADE_CACHE_TIMEOUT = int(os.getenv("DISPONIBILIDADE_CACHE_TIMEOUT", "600"))
+
+# Tempo máximo (em segundos) das agendas .ics em cache (ver core.calendar_feed).
+# Alterações em horários, agendamentos e disciplinas invalidam na hora.
+AGENDA_CACHE_TIMEOUT = int(os.getenv("AGENDA_CACHE_TIMEOUT", "86400"))
+
+# Tempo máximo (em segundos) das listagens do fórum em cache. As listagens são
+# invalidadas a cada alteração; o TTL só limita o espaço ocupado.
+FORUM_CACHE_TIMEOUT = int(os.getenv("FORUM_CACHE_TIMEOUT", "300"))
+
+# Limites de requisições dos endpoints públicos de autenticação (ver
+# utils.throttling), por escopo e por IP/e-mail, no formato
+# "quantidade/período" (ex.: "5/m", "10/15m"). Os contadores ficam em CACHES.
+RATE_LIMIT_ENABLED = (
+    os.getenv(
+        "RATE_LIMIT_ENABLED",
+        str(os.getenv("DJANGO_ENVIRONMENT") in ("PRODUCTION", "DEV")),
+    )
+    == "True"
+)
+RATE_LIMITS = {
+    "login": {"ip": "30/m", "email": "10/15m"},
+    "cadastro": {"ip": "10/h", "email": "5/h"},
+    "redefinicao_senha": {"ip": "10/h", "email": "5/h"},
+    "verificacao_token": {"ip": "10/15m"},
 }
 
+# Fotos de perfil: o upload é guardado em FOTOS_UPLOAD_DIR e as miniaturas
+# (FOTOS_TAMANHOS, lado máximo em pixels) são geradas em segundo plano por
+# FOTOS_WORKERS threads e gravadas no backend FOTOS_STORAGE. Com 0 workers as
+# miniaturas são geradas na própria requisição.
+if os.getenv("DJANGO_ENVIRONMENT") in ("PRODUCTION", "DEV"):
+    FOTOS_STORAGE = {
+        "BACKEND": os.getenv(
+            "FOTOS_STORAGE_BACKEND",
+            "cloudinary_storage.storage.MediaCloudinaryStorage",
+        ),
+        "OPTIONS": {},
+    }
+else:
+    FOTOS_STORAGE = {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {
+            "location": os.path.join(BASE_DIR, MEDIA_ROOT),
+            "base_url": MEDIA_URL,
+        },
+    }
+FOTOS_UPLOAD_DIR = os.getenv(
+    "FOTOS_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "monitorias_fotos")
+)
+FOTOS_TAMANHOS = {"pequena": 64, "media": 256, "grande": 1024}
+FOTOS_WORKERS = int(os.getenv("FOTOS_WORKERS", "2"))
+# Segundos após o upload em que um processamento ainda não concluído é tido
+# como perdido e recuperado pelos processos web (ver
+# photo_service.iniciar_recuperacao), a cada FOTOS_RECUPERACAO_INTERVALO
+# segundos. Cada processo só recupera os uploads gravados no disco da sua
+# máquina, FOTOS_ORIGEM (no Heroku, o nome do dyno, mantido após reinícios).
+FOTOS_PENDENTE_TIMEOUT = int(os.getenv("FOTOS_PENDENTE_TIMEOUT", "600"))
+FOTOS_RECUPERACAO_INTERVALO = float(os.getenv("FOTOS_RECUPERACAO_INTERVALO", "60"))
+FOTOS_ORIGEM = os.getenv("DYNO") or socket.gethostname()
+
+# Códigos enviados por e-mail (ativação e recuperação de senha): validade em
+# segundos e backend (ver accounts.token_store). Com CacheTokenStore os
+# códigos ficam apenas em CACHES, que precisa ser compartilhado entre workers.
+EMAIL_TOKEN_TTL = int(os.getenv("EMAIL_TOKEN_TTL", str(15 * 60)))
+EMAIL_TOKEN_STORE = os.getenv(
+    "EMAIL_TOKEN_STORE", "accounts.token_store.DatabaseTokenStore"
+)
+# Validade, em segundos, dos códigos de primeiro acesso das contas criadas por
+# importação, entregues pela fila de e-mails (ver accounts.import_service).
+IMPORT_TOKEN_TTL = int(os.getenv("IMPORT_TOKEN_TTL", str(7 * 24 * 60 * 60)))
+
+# Validade, em segundos, da autorização assinada que verificar-token devolve
+# para concluir a redefinição de senha em redefinir-senha.
+PASSWORD_RESET_GRANT_TTL = int(os.getenv("PASSWORD_RESET_GRANT_TTL", str(10 * 60)))
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 FIXTURE_DIRS = ["fixtures"]
@@ -186,6 +302,16 @@ ROLLBAR = {
     "suppress_reinit_warning": True,
     "enabled": not DEBUG,
 }
+# Integração com o Zoom (ver forum_amo.zoom): credenciais de um aplicativo
+# servidor-a-servidor e tempo máximo (em segundos) de cada requisição.
+ZOOM = {
+    "account_id": os.getenv("ZOOM_ACCOUNT_ID"),
+    "client_id": os.getenv("ZOOM_CLIENT_ID"),
+    "client_secret": os.getenv("ZOOM_CLIENT_SECRET"),
+    "oauth_url": os.getenv("ZOOM_OAUTH_URL", "https://zoom.us/oauth/token"),
+    "api_url": os.getenv("ZOOM_API_URL", "https://api.zoom.us/v2"),
+    "timeout": float(os.getenv("ZOOM_TIMEOUT", "10")),
+}
 CLOUDINARY_STORAGE = {
     "CLOUD_NAME": f"{os.getenv('CLOUD_NAME')}",
     "API_KEY": f"{os.getenv('API_KEY')}",
@@ -28,6 +28,8 @@ from core.views import (
     CursoViewSet,
     DisciplinaViewSet,
     MonitoresHorarioViewSet,
+    agenda_disciplina,
+    agenda_usuario,
 )
 from forum_amo.views import DuvidaViewSet, RespostaViewSet
 
@@ -49,6 +51,17 @@ urlpatterns = [
     path("usuario/login/", CustomAuthToken.as_view(), name="obtain-api-token"),
     # path("registrar", UserRegistration, name="registrar"),
     path("", include(router.urls)),
+    # Agendas .ics para aplicativos de calendário (ver core.calendar_feed)
+    path(
+        "agenda/usuarios/<int:user_id>/<str:chave>.ics",
+        agenda_usuario,
+        name="agenda-usuario",
+    ),
+    path(
+        "agenda/disciplinas/<int:disciplina_id>/<int:user_id>/<str:chave>.ics",
+        agenda_disciplina,
+        name="agenda-disciplina",
+    ),
     # documentação/drf_spectacular
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "monitorias.settings")
 
 application = get_wsgi_application()
+
+# Os uploads de fotos pendentes ficam no disco da máquina que os recebeu; só
+# os processos web dela podem recuperá-los.
+# pylint: disable=wrong-import-position
+from accounts import photo_service  # noqa: E402
+
+photo_service.iniciar_recuperacao()
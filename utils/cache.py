@@ -0,0 +1,123 @@
+"""Utilitários de cache.
+
+Respostas cacheadas são versionadas por números de geração: cada grupo de
+dados (por exemplo, as dúvidas de uma disciplina) tem um número de geração
+guardado no cache. As chaves das respostas incluem as gerações de que
+dependem; ao alterar os dados basta trocar a geração para que todas as
+respostas antigas deixem de ser encontradas, sem precisar apagá-las (elas
+expiram pelo TTL).
+
+Para dados pequenos e muito lidos há também um cache LRU local ao processo.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIXO_GERACAO = "geracao"
+PREFIXO_RESPOSTA = "resposta"
+
+
+def _chave_geracao(namespace: str) -> str:
+    return f"{PREFIXO_GERACAO}:{namespace}"
+
+
+def _nova_geracao() -> int:
+    # Baseada no relógio, e não em um contador, para que uma geração perdida
+    # por despejo do cache nunca volte a um valor já usado.
+    return time.time_ns() // 1000
+
+
+def get_generations(*namespaces: str) -> list:
+    """Retorna as gerações atuais dos namespaces, criando as que não existem."""
+    chaves = [_chave_geracao(namespace) for namespace in namespaces]
+    atuais = cache.get_many(chaves)
+    faltando = {chave: _nova_geracao() for chave in chaves if chave not in atuais}
+    if faltando:
+        for chave, geracao in faltando.items():
+            # add() não sobrescreve uma geração criada por outro processo.
+            if not cache.add(chave, geracao, timeout=None):
+                geracao = cache.get(chave, geracao)
+            atuais[chave] = geracao
+    return [atuais[chave] for chave in chaves]
+
+
+def bump_generation(namespace: str) -> None:
+    """Invalida as respostas cacheadas que dependem do namespace.
+
+    A geração é trocada imediatamente e de novo após o commit da transação
+    atual: uma requisição que leia o banco antes do commit e grave a resposta
+    com a geração intermediária não será reaproveitada depois dele.
+    """
+    chave = _chave_geracao(namespace)
+    cache.set(chave, _nova_geracao(), timeout=None)
+    transaction.on_commit(lambda: cache.set(chave, _nova_geracao(), timeout=None))
+
+
+def response_cache_key(request, namespaces, generations) -> str:
+    """Monta a chave de uma resposta a partir da URL e das gerações."""
+    parametros = sorted(request.query_params.lists())
+    assinatura = repr(
+        (request.get_host(), request.path, parametros, list(generations))
+    ).encode()
+    return (
+        f"{PREFIXO_RESPOSTA}:{':'.join(namespaces)}:"
+        f"{hashlib.sha256(assinatura).hexdigest()}"
+    )
+
+
+class LRUCache:
+    """Cache LRU local ao processo, com limite de itens e tempo de vida.
+
+    Serve para dados pequenos e muito lidos, em que evitar a ida ao banco (ou
+    ao cache compartilhado) compensa. Como cada worker tem a sua cópia, o TTL
+    limita por quanto tempo uma alteração feita em outro processo fica
+    invisível; no próprio processo, ``invalidate`` remove a entrada na hora.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, chaves) -> dict:
+        """Retorna as entradas válidas dentre as chaves informadas."""
+        agora = time.monotonic()
+        encontrados = {}
+        with self._lock:
+            for chave in chaves:
+                item = self._itens.get(chave)
+                if item is None:
+                    continue
+                expira_em, valor = item
+                if expira_em <= agora:
+                    del self._itens[chave]
+                    continue
+                self._itens.move_to_end(chave)
+                encontrados[chave] = valor
+        return encontrados
+
+    def set_many(self, valores: dict) -> None:
+        """Grava as entradas, descartando as menos usadas se preciso."""
+        expira_em = time.monotonic() + self.ttl
+        with self._lock:
+            for chave, valor in valores.items():
+                self._itens[chave] = (expira_em, valor)
+                self._itens.move_to_end(chave)
+            while len(self._itens) > self.maxsize:
+                self._itens.popitem(last=False)
+
+    def invalidate(self, *chaves) -> None:
+        """Remove as entradas informadas."""
+        with self._lock:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._itens.clear()
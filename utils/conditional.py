@@ -0,0 +1,162 @@
+"""Requisições GET condicionais (ETag / Last-Modified) para os ViewSets.
+
+Os validadores são montados a partir de gerações por modelo (ver utils.cache),
+trocadas por sinais a cada escrita nos modelos de ``MODELOS_MONITORADOS``.
+Assim, responder ``304 Not Modified`` não exige consultar o banco nem rodar os
+serializers. Escritas feitas com ``QuerySet.update``/``bulk_update`` não
+disparam sinais e devem chamar ``bump_model_generation`` explicitamente.
+
+Só o ETag decide o ``304``: o Last-Modified tem resolução de um segundo, e
+duas escritas no mesmo segundo produziriam o mesmo valor.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from utils import cache as cache_utils
+
+# Modelos dos quais dependem as respostas com validadores, isto é, todos os
+# que aparecem em algum ConditionalGetMixin.conditional_models.
+MODELOS_MONITORADOS = (
+    "accounts.CustomUser",
+    "accounts.Perfil",
+    "auth.Group",
+    "core.Curso",
+    "core.Disciplinas",
+    "forum_amo.Duvida",
+    "forum_amo.Resposta",
+    "forum_amo.VotoDuvida",
+)
+
+
+def _namespace(label: str) -> str:
+    return f"modelo:{label.lower()}"
+
+
+def bump_model_generation(model) -> None:
+    """Invalida os validadores das respostas que dependem do modelo."""
+    cache_utils.bump_generation(_namespace(model._meta.label))
+
+
+def _modelo_alterado(sender, update_fields=None, **kwargs):  # pylint: disable=W0613
+    # O login só atualiza last_login, que não aparece em nenhuma resposta.
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    bump_model_generation(sender)
+
+
+def _relacao_alterada(
+    sender, instance, model, action, **kwargs
+):  # pylint: disable=W0613
+    if not action.startswith("post_"):
+        return
+    for modelo in (type(instance), model):
+        if modelo._meta.label in MODELOS_MONITORADOS:
+            bump_model_generation(modelo)
+
+
+def conectar_sinais() -> None:
+    """Conecta os receptores aos modelos monitorados e às suas relações m2m.
+
+    Chamado em CoreConfig.ready, depois de todos os modelos carregados.
+    """
+    for label in MODELOS_MONITORADOS:
+        modelo = apps.get_model(label)
+        uid = f"conditional:{label}"
+        post_save.connect(_modelo_alterado, sender=modelo, dispatch_uid=uid)
+        post_delete.connect(_modelo_alterado, sender=modelo, dispatch_uid=uid)
+        for campo in modelo._meta.many_to_many:
+            through = campo.remote_field.through
+            m2m_changed.connect(
+                _relacao_alterada,
+                sender=through,
+                dispatch_uid=f"conditional:{through._meta.label}",
+            )
+
+
+class NotModified(Exception):
+    """Interrompe a view quando o cliente já tem a versão atual do recurso."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Adiciona ETag e Last-Modified a ``list`` e ``retrieve`` de um ViewSet.
+
+    ``conditional_models`` lista os modelos (``"app.Modelo"``) dos quais a
+    representação depende. Quando a representação varia com o usuário (por
+    exemplo, o campo "votou" das dúvidas), ``conditional_per_user`` inclui o
+    usuário no ETag.
+    """
+
+    conditional_actions = ("list", "retrieve")
+    conditional_models = ()
+    conditional_per_user = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        faltando = set(cls.conditional_models) - set(MODELOS_MONITORADOS)
+        if faltando:
+            raise ImproperlyConfigured(
+                f"{cls.__name__}.conditional_models usa modelos fora de "
+                f"MODELOS_MONITORADOS: {', '.join(sorted(faltando))}"
+            )
+
+    def get_conditional_validators(self, request):
+        """Retorna o par (etag, last_modified) da requisição atual."""
+        geracoes = cache_utils.get_generations(
+            *[_namespace(label) for label in self.conditional_models]
+        )
+        assinatura = repr(
+            (
+                request.get_full_path(),
+                request.accepted_media_type,
+                request.user.pk if self.conditional_per_user else None,
+                geracoes,
+            )
+        ).encode()
+        etag = quote_etag(hashlib.sha256(assinatura).hexdigest())
+        # As gerações são instantes em microssegundos.
+        last_modified = datetime.fromtimestamp(max(geracoes) / 1e6, tz=timezone.utc)
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validadores = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        if self.action not in self.conditional_actions:
+            return
+        etag, last_modified = self.get_conditional_validators(request)
+        self.validadores = etag, last_modified
+        # Sem last_modified, If-Modified-Since sozinho nunca resulta em 304.
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is not None:
+            raise NotModified(resposta)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            self._aplicar_validadores(exc.response)
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == 200:
+            self._aplicar_validadores(response)
+        return response
+
+    def _aplicar_validadores(self, response):
+        validadores = getattr(self, "validadores", None)
+        if validadores is None:
+            return
+        etag, last_modified = validadores
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ["Accept", "Authorization"])
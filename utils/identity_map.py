@@ -0,0 +1,87 @@
+"""Mapa de identidade por requisição.
+
+Guarda as linhas já carregadas durante uma requisição para que a view, as
+condições das access policies e os serviços compartilhem a mesma instância,
+em vez de buscar a mesma linha várias vezes.
+"""
+
+
+class IdentityMap:
+    """Instâncias de modelos já carregadas, indexadas por (modelo, campo, valor)."""
+
+    def __init__(self):
+        self._objetos = {}
+
+    @staticmethod
+    def _chave(model, campo, valor):
+        return (model._meta.label, campo, str(valor))
+
+    def get(self, model, valor, campo="pk"):
+        """Retorna a instância carregada, ou None."""
+        return self._objetos.get(self._chave(model, campo, valor))
+
+    def add(self, obj, valor=None, campo="pk"):
+        """Registra uma instância carregada."""
+        valor = obj.pk if valor is None else valor
+        self._objetos[self._chave(type(obj), campo, valor)] = obj
+        if campo != "pk":
+            self._objetos[self._chave(type(obj), "pk", obj.pk)] = obj
+
+    def discard(self, obj):
+        """Esquece uma instância (por exemplo, após removê-la)."""
+        self._objetos = {
+            chave: atual for chave, atual in self._objetos.items() if atual is not obj
+        }
+
+
+def identity_map(request) -> IdentityMap:
+    """Retorna o mapa de identidade da requisição (HttpRequest ou Request do DRF)."""
+    http_request = getattr(request, "_request", request)
+    mapa = getattr(http_request, "_identity_map", None)
+    if mapa is None:
+        mapa = http_request._identity_map = IdentityMap()
+    return mapa
+
+
+def get_object(request, queryset, valor, campo="pk"):
+    """Busca uma linha usando o mapa de identidade da requisição.
+
+    Raises:
+        queryset.model.DoesNotExist: a linha não existe.
+    """
+    model = queryset.model
+    if request is None:
+        return queryset.get(**{campo: valor})
+    mapa = identity_map(request)
+    obj = mapa.get(model, valor, campo)
+    if obj is None:
+        obj = queryset.get(**{campo: valor})
+        mapa.add(obj, valor, campo)
+    return obj
+
+
+class IdentityMapMixin:
+    """Faz ``get_object`` carregar o objeto da view uma única vez por requisição.
+
+    As condições das access policies que chamam ``view.get_object()`` e a
+    própria ação passam a receber a mesma instância. As permissões de objeto
+    continuam sendo verificadas a cada chamada.
+    """
+
+    def get_object(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        valor = self.kwargs[lookup_url_kwarg]
+        queryset = self.queryset if self.queryset is not None else self.get_queryset()
+        model = queryset.model
+        mapa = identity_map(self.request)
+        obj = mapa.get(model, valor, self.lookup_field)
+        if obj is None:
+            obj = super().get_object()
+            mapa.add(obj, valor, self.lookup_field)
+        else:
+            self.check_object_permissions(self.request, obj)
+        return obj
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        identity_map(self.request).discard(instance)
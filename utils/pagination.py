@@ -0,0 +1,201 @@
+"""Paginação por cursor (keyset) para as listagens mais acessadas da API."""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginação por cursor baseada nos campos de ordenação da view.
+
+    O cursor guarda os valores de ordenação do último item entregue (com o id
+    como desempate) e a página seguinte é buscada com uma comparação sobre
+    esses valores, sem ``OFFSET`` nem ``COUNT(*)``. Assim o custo de uma
+    página não cresce com a profundidade e inserções concorrentes não
+    deslocam os itens das páginas seguintes.
+
+    Clientes que precisam do total ou de acessar uma página específica
+    continuam usando ``?page=N``, tratado pela PageNumberPagination. O mesmo
+    acontece quando a ordenação não é feita apenas por campos do modelo (por
+    exemplo, por relevância da busca).
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = "Cursor de paginação."
+    page_query_param = "page"
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = "Cursor inválido."
+
+    def __init__(self):
+        self.request = None
+        self.fallback = None
+        self.next_position = None
+        self.previous_position = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordenacao = self.get_ordering(queryset)
+        if self.page_query_param in request.query_params or ordenacao is None:
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        reverso, posicao = self.decode_cursor(request, ordenacao)
+        if posicao is not None:
+            queryset = queryset.filter(self._apos(ordenacao, posicao, reverso))
+        if reverso:
+            ordenacao_consulta = [(campo, not desc) for campo, desc in ordenacao]
+        else:
+            ordenacao_consulta = ordenacao
+        queryset = queryset.order_by(
+            *[
+                f"-{campo.attname}" if desc else campo.attname
+                for campo, desc in ordenacao_consulta
+            ]
+        )
+
+        itens = list(queryset[: self.page_size + 1])
+        ha_mais = len(itens) > self.page_size
+        itens = itens[: self.page_size]
+        if reverso:
+            itens.reverse()
+
+        tem_proxima = ha_mais if not reverso else posicao is not None
+        tem_anterior = ha_mais if reverso else posicao is not None
+        self.next_position = (
+            self._posicao(itens[-1], ordenacao) if itens and tem_proxima else None
+        )
+        self.previous_position = (
+            self._posicao(itens[0], ordenacao) if itens and tem_anterior else None
+        )
+        return itens
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(
+            {
+                "next": self.get_link(self.next_position, reverso=False),
+                "previous": self.get_link(self.previous_position, reverso=True),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        parametros = PageNumberPagination().get_schema_operation_parameters(view)
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.cursor_query_description,
+                "schema": {"type": "string"},
+            },
+            *parametros,
+        ]
+
+    def get_ordering(self, queryset):
+        """Retorna a ordenação como uma lista de (campo, decrescente).
+
+        Retorna None quando algum critério não é um campo concreto do modelo
+        (anotações, relacionamentos ou expressões), caso em que a paginação
+        por página é usada.
+        """
+        opts = queryset.model._meta
+        criterios = list(queryset.query.order_by or opts.ordering or ["pk"])
+        ordenacao = []
+        for criterio in criterios:
+            if not isinstance(criterio, str) or "__" in criterio:
+                return None
+            desc = criterio.startswith("-")
+            nome = criterio.lstrip("-")
+            try:
+                campo = opts.pk if nome == "pk" else opts.get_field(nome)
+            except FieldDoesNotExist:
+                return None
+            if not campo.concrete or campo.null or campo.many_to_many:
+                return None
+            ordenacao.append((campo, desc))
+
+        if opts.pk not in [campo for campo, _ in ordenacao]:
+            ordenacao.append((opts.pk, ordenacao[-1][1] if ordenacao else False))
+        return ordenacao
+
+    def decode_cursor(self, request, ordenacao):
+        """Decodifica o cursor da requisição em (reverso, posição)."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            valores = dados["p"]
+            if len(valores) != len(ordenacao):
+                raise ValueError
+            posicao = [
+                campo.to_python(valor) for (campo, _), valor in zip(ordenacao, valores)
+            ]
+            return bool(dados.get("r")), posicao
+        except (
+            binascii.Error,
+            KeyError,
+            TypeError,
+            ValueError,
+            UnicodeEncodeError,
+            ValidationError,
+        ) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def encode_cursor(self, posicao, reverso):
+        """Codifica uma posição em um cursor opaco para a URL."""
+        dados = {"p": posicao, "r": int(reverso)}
+        return base64.urlsafe_b64encode(
+            json.dumps(dados, separators=(",", ":")).encode()
+        ).decode("ascii")
+
+    def get_link(self, posicao, reverso):
+        """Monta o link para a página anterior ou seguinte."""
+        if posicao is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(posicao, reverso)
+        )
+
+    @staticmethod
+    def _posicao(item, ordenacao):
+        return [campo.value_to_string(item) for campo, _ in ordenacao]
+
+    @staticmethod
+    def _apos(ordenacao, posicao, reverso):
+        """Filtro que seleciona os itens depois (ou antes) da posição informada.
+
+        Para a ordenação (a, b, id) equivale a
+        ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)``,
+        com ``<`` nos campos decrescentes (e o inverso ao voltar páginas).
+        """
+        filtro = Q()
+        iguais = Q()
+        for (campo, desc), valor in zip(ordenacao, posicao):
+            operador = "lt" if desc != reverso else "gt"
+            filtro |= iguais & Q(**{f"{campo.attname}__{operador}": valor})
+            iguais &= Q(**{campo.attname: valor})
+        return filtro
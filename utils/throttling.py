@@ -0,0 +1,155 @@
+"""Limite de requisições por janela deslizante para os endpoints públicos.
+
+Cada limite conta as requisições da janela atual e da anterior no cache
+compartilhado entre os workers e estima o total dos últimos ``período``
+segundos ponderando a janela anterior pela fração ainda coberta. São duas
+leituras e um incremento por requisição, independente do volume de tráfego.
+
+Os limites ficam em ``settings.RATE_LIMITS``, por escopo e por tipo de
+identificador (IP ou e-mail). As views informam o escopo em
+``throttle_scope`` e usam ``ThrottleFirstMixin`` para que a verificação rode
+antes da autenticação e das permissões, ou seja, antes de qualquer acesso ao
+banco.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PREFIXO_LIMITE = "limite"
+
+_UNIDADES = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_FORMATO_LIMITE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+
+
+def parse_rate(limite: str) -> tuple:
+    """Converte um limite como ``"5/m"`` ou ``"10/15m"`` em (quantidade, segundos).
+
+    Raises:
+        ValueError: o limite não está no formato esperado.
+    """
+    encontrado = _FORMATO_LIMITE.match(limite.replace(" ", ""))
+    if encontrado is None:
+        raise ValueError(f"Limite de requisições inválido: {limite!r}")
+    quantidade, multiplicador, unidade = encontrado.groups()
+    return int(quantidade), int(multiplicador or 1) * _UNIDADES[unidade]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Limite por janela deslizante de um tipo de identificador.
+
+    As subclasses definem ``tipo`` (a chave em ``settings.RATE_LIMITS``) e,
+    para limitar por outro identificador que não o endereço do cliente,
+    sobrescrevem ``get_ident_value``. Requisições sem identificador não são
+    limitadas.
+    """
+
+    tipo = None
+
+    def __init__(self):
+        self.espera = None
+
+    def get_ident_value(self, request):
+        """Retorna o identificador a limitar, ou None; por padrão, o IP."""
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        scope = getattr(view, "throttle_scope", None)
+        limite = settings.RATE_LIMITS.get(scope, {}).get(self.tipo)
+        identificador = self.get_ident_value(request)
+        if limite is None or not identificador:
+            return True
+
+        quantidade, periodo = parse_rate(limite)
+        resumo = hashlib.sha256(identificador.encode()).hexdigest()[:32]
+        agora = time.time()
+        janela, decorrido = divmod(agora, periodo)
+        chave_atual = f"{PREFIXO_LIMITE}:{scope}:{self.tipo}:{resumo}:{int(janela)}"
+        chave_anterior = (
+            f"{PREFIXO_LIMITE}:{scope}:{self.tipo}:{resumo}:{int(janela) - 1}"
+        )
+
+        contagens = cache.get_many([chave_atual, chave_anterior])
+        atual = contagens.get(chave_atual, 0)
+        anterior = contagens.get(chave_anterior, 0)
+        fracao = decorrido / periodo
+        if anterior * (1 - fracao) + atual >= quantidade:
+            self.espera = self._calcular_espera(
+                quantidade, periodo, atual, anterior, decorrido
+            )
+            return False
+
+        # add() cria o contador sem sobrescrever o de outro worker.
+        if not cache.add(chave_atual, 1, timeout=2 * periodo):
+            try:
+                cache.incr(chave_atual)
+            except ValueError:
+                # O contador expirou entre o add() e o incr().
+                cache.set(chave_atual, 1, timeout=2 * periodo)
+        return True
+
+    @staticmethod
+    def _calcular_espera(quantidade, periodo, atual, anterior, decorrido) -> float:
+        restante = periodo - decorrido
+        if atual >= quantidade or not anterior:
+            # Só a virada da janela libera uma nova requisição.
+            return restante
+        # A janela anterior perde peso até a estimativa ficar abaixo do limite.
+        liberacao = (1 - (quantidade - atual) / anterior) * periodo
+        return max(0.0, min(restante, liberacao - decorrido))
+
+    def wait(self):
+        return self.espera
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """Limita as requisições por endereço IP do cliente.
+
+    O endereço vem de ``get_ident`` do DRF, que só confia no X-Forwarded-For
+    até a quantidade de proxies em ``REST_FRAMEWORK["NUM_PROXIES"]``; sem essa
+    configuração, o cabeçalho inteiro, escolhido pelo cliente, seria a chave.
+    """
+
+    tipo = "ip"
+
+
+class EmailRateThrottle(SlidingWindowThrottle):
+    """Limita as requisições por e-mail informado no corpo da requisição."""
+
+    tipo = "email"
+    campos = ("email", "username")
+
+    def get_ident_value(self, request):
+        try:
+            dados = request.data
+        except Exception:  # pylint: disable=broad-except
+            # Corpo inválido: a própria view responde com o erro de parsing.
+            return None
+        for campo in self.campos:
+            valor = dados.get(campo) if hasattr(dados, "get") else None
+            if isinstance(valor, str) and valor.strip():
+                return valor.strip().lower()
+        return None
+
+
+class ThrottleFirstMixin:
+    """Verifica os limites de requisições antes da autenticação e das permissões.
+
+    O DRF só verifica os limites depois de autenticar o usuário e checar as
+    permissões, o que pode consultar o banco. Aqui a verificação é antecipada,
+    para que requisições em excesso recebam 429 sem nenhum acesso ao banco.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self.check_throttles(request)
+        self._limites_verificados = True
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        if not getattr(self, "_limites_verificados", False):
+            super().check_throttles(request)